@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Offline load generator: drives all modules with a synthetic message firehose.
+
+Builds the bot with fake Discord objects (guilds, channels, members, messages)
+instead of a gateway connection, feeds it a stream of trigger hits, misses and
+!commands, and reports throughput and per-listener latency. Replies are
+captured in memory and external APIs (OpenWeatherMap, Yahoo Finance,
+DuckDuckGo, OpenAI) are replaced by local stubs, so nothing leaves the machine.
+
+Runs in a temporary directory, so data/ and config.json are not touched.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --guilds 50 --channels 10 --messages 50000
+    python benchmark.py --hit-ratio 0.5 --command-ratio 0.05 --trace-memory
+    python benchmark.py --config bench.json  # e.g. {"state_backend": "sqlite"}
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import random
+import shutil
+import asyncio
+import argparse
+import logging
+import tempfile
+import functools
+import itertools
+import tracemalloc
+from collections import Counter, defaultdict
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+import discord
+# Loaded before the commands package, whose modules use discord.ext.commands
+import discord.ext.commands  # noqa: F401
+from commands.send_queue import QueuedContext
+
+# Snowflake-like IDs for fake objects
+next_id = itertools.count(100000000000000000).__next__
+
+TRIGGER_MESSAGES = [
+    'nice', 'that is so nice', 'NICE one', 'go eagles!', 'eagles win',
+    'fuck dallas', 'shut up', 'oh shut up already',
+]
+MISS_MESSAGES = [
+    'hello everyone', 'what time is the game', 'lol', 'anyone around?',
+    'I just got back from the store', 'good morning', 'brb', 'see you later',
+]
+COMMAND_MESSAGES = [
+    '!count', '!count today', '!count week', '!count trend', '!count top',
+    '!quote', '!quote 3', '!quote life', '!weather 19103', '!forecast 19103',
+    '!stock AAPL', '!stock MSFT', '!search discord bots', '!chat tell me a joke',
+    '!friday', '!triggers', '!bartender',
+]
+
+
+# --- Fake Discord transport -------------------------------------------------
+
+class FakeRole:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeUser:
+    """Member (or the bot's own user)."""
+
+    def __init__(self, name: str, admin: bool = False, bot: bool = False):
+        self.id = next_id()
+        self.name = name
+        self.display_name = name
+        self.global_name = name
+        self.mention = f'<@{self.id}>'
+        self.bot = bot
+        self.admin = admin
+        self.roles = [FakeRole('Trusted')]
+
+    def __str__(self):
+        return self.name
+
+
+class FakeGuild:
+    def __init__(self, name: str, shard_id: int = 0):
+        self.id = next_id()
+        self.name = name
+        self.shard_id = shard_id
+        self.channels = []
+        self.members = {}
+
+    def get_channel(self, channel_id):
+        return next((channel for channel in self.channels if channel.id == channel_id), None)
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+    async def fetch_member(self, member_id):
+        return self.members.get(member_id)
+
+
+class FakeMessage:
+    # Connection state of the bot under test (commands.Context reads it)
+    _state = None
+
+    def __init__(self, content: str, author: FakeUser, channel, embed=None):
+        self.id = next_id()
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.embeds = [embed] if embed else []
+        self.attachments = []
+        self.reference = None
+        self.created_at = discord.utils.utcnow()
+
+    async def edit(self, content=None, embed=None, **kwargs):
+        self.channel.outbox.record(self.channel, content, embed, edit=True)
+        return self
+
+
+class FakeChannel:
+    """Text channel whose sends are captured in an Outbox instead of going to Discord."""
+
+    type = discord.ChannelType.text
+
+    def __init__(self, name: str, guild: FakeGuild, outbox):
+        self.id = next_id()
+        self.name = name
+        self.guild = guild
+        self.outbox = outbox
+        self.messages = {}
+
+    def permissions_for(self, member):
+        return discord.Permissions.all() if getattr(member, 'admin', False) else discord.Permissions.text()
+
+    async def send(self, content=None, *, embed=None, **kwargs):
+        self.outbox.record(self, content, embed)
+        return FakeMessage(content or '', self.outbox.bot_user, self, embed)
+
+    async def fetch_message(self, message_id):
+        if message_id not in self.messages:
+            raise discord.NotFound(types.SimpleNamespace(status=404, reason='Not Found'), 'Unknown Message')
+        return self.messages[message_id]
+
+
+class FakeContext(QueuedContext):
+    """Context that replies through the fake channel instead of the HTTP API."""
+
+    async def deliver(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class Outbox:
+    """Counts everything the bot sends or edits."""
+
+    def __init__(self, bot_user: FakeUser):
+        self.bot_user = bot_user
+        self.sends = 0
+        self.edits = 0
+        self.per_channel = Counter()
+
+    def record(self, channel, content, embed, edit: bool = False):
+        if edit:
+            self.edits += 1
+        else:
+            self.sends += 1
+            self.per_channel[channel.id] += 1
+
+
+# --- Local stand-ins for external APIs ----------------------------------------
+
+def install_api_stubs(modules: dict, api_latency: float):
+    """Replace outbound calls of loaded modules with local stubs that answer after api_latency seconds."""
+    weather = modules.get('weather')
+    if weather:
+        current = {
+            'name': 'Philadelphia',
+            'main': {'temp': 68.2, 'feels_like': 67.1, 'humidity': 55, 'pressure': 1015},
+            'weather': [{'main': 'Clouds', 'description': 'scattered clouds', 'icon': '03d'}],
+            'wind': {'speed': 8.1, 'deg': 240},
+            'visibility': 10000,
+        }
+        now = int(time.time())
+        forecast = {
+            'city': {'name': 'Philadelphia'},
+            'list': [
+                {'dt': now + hour * 3600, 'main': {'temp': 60 + hour % 12},
+                 'weather': [{'main': 'Clear', 'description': 'clear sky', 'icon': '01d'}]}
+                for hour in range(0, 120, 3)
+            ],
+        }
+
+        async def fetch_weather(zip_code, country_code='US'):
+            await asyncio.sleep(api_latency)
+            return current, None
+
+        async def fetch_forecast(zip_code, country_code='US'):
+            await asyncio.sleep(api_latency)
+            return forecast, None
+
+        weather.fetch_weather = fetch_weather
+        weather.fetch_forecast = fetch_forecast
+
+    stock = modules.get('stock')
+    if stock:
+        async def fetch_stock_data(ticker):
+            await asyncio.sleep(api_latency)
+            return {
+                'symbol': ticker, 'name': f'{ticker} Inc.', 'current_price': 187.5,
+                'previous_close': 185.0, 'open': 185.5, 'day_high': 188.0, 'day_low': 184.9,
+                'volume': 51234567, 'market_cap': 2_900_000_000_000, 'currency': 'USD',
+                'change': 2.5, 'change_percent': 1.35,
+            }, None
+
+        stock.fetch_stock_data = fetch_stock_data
+
+    # The search module imports ddgs on first use
+    class DDGS:
+        def text(self, query, max_results=5):
+            time.sleep(api_latency)
+            return [
+                {'title': f'Result {i} for {query}', 'href': f'https://example.com/{i}', 'body': 'Lorem ipsum ' * 5}
+                for i in range(max_results)
+            ]
+
+    sys.modules['ddgs'] = types.SimpleNamespace(DDGS=DDGS)
+
+    chatgpt = modules.get('chatgpt')
+    if chatgpt:
+        def create(**kwargs):
+            time.sleep(api_latency)
+            message = types.SimpleNamespace(content='Why did the bot cross the road? To get to the other shard.')
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+        completions = types.SimpleNamespace(create=create)
+        chatgpt.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+        sys.modules[type(chatgpt).__module__].OPENAI_AVAILABLE = True
+
+
+# --- Load generation ------------------------------------------------------------
+
+def seed_data(quote_count: int):
+    """Create data files the modules read at startup (run inside the temp directory)."""
+    os.makedirs('data', exist_ok=True)
+    quotes = [
+        {
+            'id': i,
+            'quote': f'"Quote number {i} about life and football" - Person {i % 17}',
+            'author': {'id': '1', 'username': 'seed'},
+            'created_at': '2024-01-01T00:00:00Z',
+        }
+        for i in range(1, quote_count + 1)
+    ]
+    with open(os.path.join('data', 'quotes.json'), 'w', encoding='utf-8') as f:
+        json.dump(quotes, f)
+
+    eagles_path = os.path.join(REPO_DIR, 'eagles_responses.json')
+    if os.path.exists(eagles_path):
+        shutil.copy(eagles_path, 'eagles_responses.json')
+
+
+def build_messages(args, guilds: list, members: list, bot) -> list:
+    """Generate the message stream up front, so generation cost isn't measured."""
+    rng = random.Random(args.seed)
+    commands_available = [
+        text for text in COMMAND_MESSAGES if bot.get_command(text[1:].split()[0])
+    ]
+    channels = [channel for guild in guilds for channel in guild.channels]
+
+    messages = []
+    for _ in range(args.messages):
+        roll = rng.random()
+        if roll < args.command_ratio and commands_available:
+            content = rng.choice(commands_available)
+        elif roll < args.command_ratio + args.hit_ratio:
+            content = rng.choice(TRIGGER_MESSAGES)
+        else:
+            content = rng.choice(MISS_MESSAGES)
+        messages.append(FakeMessage(content, rng.choice(members), rng.choice(channels)))
+    return messages
+
+
+class ListenerTimer:
+    """Records the duration (and optionally net memory) of every listener call and command."""
+
+    def __init__(self, bot, trace_memory: bool):
+        self.durations = defaultdict(list)
+        self.memory = defaultdict(int)
+        self.trace_memory = trace_memory
+        self.original_run_event = bot._run_event
+        self.original_invoke = bot.invoke
+        bot._run_event = self.run_event
+        bot.invoke = self.invoke
+
+    async def measure(self, name: str, coro):
+        memory_before = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+        start = time.perf_counter()
+        await coro
+        self.durations[name].append(time.perf_counter() - start)
+        if self.trace_memory:
+            self.memory[name] += tracemalloc.get_traced_memory()[0] - memory_before
+
+    async def run_event(self, coro, event_name, *args, **kwargs):
+        listener_name = getattr(coro, '__qualname__', event_name)
+        await self.measure(listener_name, self.original_run_event(coro, event_name, *args, **kwargs))
+
+    async def invoke(self, ctx):
+        # Commands run inside the on_message listener, so they are also part of its time
+        if ctx.command is None:
+            return await self.original_invoke(ctx)
+        await self.measure(f'!{ctx.command.qualified_name}', self.original_invoke(ctx))
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run(args):
+    import discord_bot
+
+    config = {
+        'enabled_modules': list(discord_bot.MODULE_MAP),
+        'weather_api_key': 'benchmark',
+        'openai_api_key': 'benchmark',
+        'dropbox_backup_enabled': False,
+        'quote_add_roles': ['Trusted'],
+    }
+    if args.config:
+        with open(args.config, 'r') as f:
+            config.update(json.load(f))
+
+    bot = discord_bot.bot = discord_bot.create_bot(config)
+    bot.loop = asyncio.get_running_loop()
+    bot_user = FakeUser('NiceBot', bot=True)
+    bot._connection.user = bot_user
+    FakeMessage._state = bot._connection
+    bot.get_context = functools.partial(bot.get_context, cls=FakeContext)
+
+    await discord_bot.setup_modules(config)
+    deferred_load_task = getattr(bot, 'deferred_load_task', None)
+    if deferred_load_task:
+        await deferred_load_task
+    install_api_stubs(discord_bot.loaded_modules, args.api_latency / 1000)
+
+    outbox = Outbox(bot_user)
+    guilds = []
+    for g in range(args.guilds):
+        guild = FakeGuild(f'guild-{g}', shard_id=g % args.shards)
+        guild.channels = [FakeChannel(f'channel-{c}', guild, outbox) for c in range(args.channels)]
+        guilds.append(guild)
+    members = [FakeUser(f'user-{u}', admin=(u == 0)) for u in range(args.users)]
+    for guild in guilds:
+        guild.members = {member.id: member for member in members}
+
+    messages = build_messages(args, guilds, members, bot)
+    mix = Counter(
+        'command' if message.content.startswith('!')
+        else 'trigger' if message.content in TRIGGER_MESSAGES else 'miss'
+        for message in messages
+    )
+
+    timer = ListenerTimer(bot, args.trace_memory)
+    if args.overload:
+        bot.start_overload_controller()
+    if args.trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    for offset in range(0, len(messages), args.batch):
+        before = asyncio.all_tasks()
+        for message in messages[offset:offset + args.batch]:
+            bot.dispatch('message', message)
+        pending = asyncio.all_tasks() - before
+        if pending:
+            await asyncio.gather(*pending)
+    # Include the bus subscribers' work (e.g. counting) in the timing
+    await bot.events.drain()
+    elapsed = time.perf_counter() - start
+
+    # Let queued trigger responses go out (they may wait for the coalesce window)
+    if bot.send_queue:
+        await bot.send_queue.drain()
+
+    shed_counts = {}
+    if bot.overload:
+        shed_counts = bot.overload.shed_counts
+        bot.overload.stop()
+
+    snapshot = tracemalloc.take_snapshot() if args.trace_memory else None
+    if args.trace_memory:
+        tracemalloc.stop()
+
+    await discord_bot.teardown_modules()
+
+    # Report
+    print(f'\n{args.messages:,} messages over {args.guilds} guild(s) x {args.channels} channel(s), '
+          f'{args.users} user(s)')
+    print(f'Mix: {mix["trigger"]:,} trigger hits, {mix["miss"]:,} misses, {mix["command"]:,} commands')
+    print(f'Throughput: {args.messages / elapsed:,.0f} messages/sec ({elapsed:.2f}s)')
+    print(f'Captured: {outbox.sends:,} sends, {outbox.edits:,} edits '
+          f'(busiest channel: {max(outbox.per_channel.values(), default=0):,} sends)')
+    if bot.send_queue:
+        print(f'Send queue: {bot.send_queue.coalesced:,} trigger responses coalesced')
+    if args.overload:
+        shed = ', '.join(f'{stage} {name}: {count:,}' for (stage, name), count in sorted(shed_counts.items()))
+        print(f'Load shedding: {shed or "nothing shed"}')
+
+    header = f'\n{"Listener / command":<40} {"calls":>8} {"p50 ms":>8} {"p99 ms":>8} {"max ms":>8}'
+    if args.trace_memory:
+        header += f' {"net B/call":>11}'
+    print(header)
+    for listener_name, durations in sorted(timer.durations.items(), key=lambda item: -sum(item[1])):
+        durations.sort()
+        line = (f'{listener_name:<40} {len(durations):>8,} {percentile(durations, 0.5) * 1000:>8.3f} '
+                f'{percentile(durations, 0.99) * 1000:>8.3f} {durations[-1] * 1000:>8.3f}')
+        if args.trace_memory:
+            line += f' {timer.memory[listener_name] / len(durations):>11,.0f}'
+        print(line)
+
+    if snapshot:
+        print('\nTop memory still allocated after the run:')
+        filters = [
+            tracemalloc.Filter(True, os.path.join(REPO_DIR, '*')),
+            tracemalloc.Filter(False, os.path.abspath(__file__)),  # the generated messages
+        ]
+        for stat in snapshot.filter_traces(filters).statistics('lineno')[:10]:
+            frame = stat.traceback[0]
+            print(f'  {os.path.relpath(frame.filename, REPO_DIR)}:{frame.lineno}: '
+                  f'{stat.size / 1024:,.1f} KiB in {stat.count:,} block(s)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the bot with a synthetic message stream (offline)')
+    parser.add_argument('--guilds', type=int, default=10, help='number of fake guilds (default: 10)')
+    parser.add_argument('--channels', type=int, default=5, help='channels per guild (default: 5)')
+    parser.add_argument('--users', type=int, default=200, help='number of fake members (default: 200)')
+    parser.add_argument('--shards', type=int, default=1, help='spread guilds over this many shard IDs')
+    parser.add_argument('--messages', type=int, default=10000, help='messages to send (default: 10000)')
+    parser.add_argument('--hit-ratio', type=float, default=0.3, help='share of trigger hits (default: 0.3)')
+    parser.add_argument('--command-ratio', type=float, default=0.05, help='share of !commands (default: 0.05)')
+    parser.add_argument('--batch', type=int, default=100, help='messages dispatched before waiting for listeners')
+    parser.add_argument('--api-latency', type=float, default=0, help='simulated external API latency in ms')
+    parser.add_argument('--quotes', type=int, default=500, help='quotes to seed (default: 500)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the message stream')
+    parser.add_argument('--config', help='JSON file with config overrides (e.g. state_backend)')
+    parser.add_argument('--overload', action='store_true', help='run the overload controller and report what it shed')
+    parser.add_argument('--trace-memory', action='store_true', help='track net memory per listener (slower; approximate for calls that await)')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary data directory')
+    parser.add_argument('--verbose', action='store_true', help='show module log output')
+    args = parser.parse_args()
+    if args.config:
+        args.config = os.path.abspath(args.config)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(levelname)-8s | %(name)s | %(message)s')
+    if not args.verbose:
+        # Skip discord.py's "voice will NOT be supported" warnings
+        logging.getLogger('discord.client').setLevel(logging.ERROR)
+
+    # Work in a scratch directory so the real data/ and config.json are never touched
+    work_dir = tempfile.mkdtemp(prefix='nicebot-bench-')
+    original_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        seed_data(args.quotes)
+        asyncio.run(run(args))
+    finally:
+        os.chdir(original_dir)
+        if args.keep:
+            print(f'\nData left in {work_dir}')
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,13 +4,197 @@ Each module can be independently enabled/disabled via config.
 """
 
 from abc import ABC, abstractmethod
+import os
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import discord
 import logging
+from .shard_stats import shard_id_for
+from .metrics import NULL_REGISTRY
+
+# Data files are written by one background thread, in the order they were saved
+_file_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='nicebot-writer')
+_pending_writes = {}  # {path: newest serialized data (str or bytes) not yet written}
+_pending_lock = threading.Lock()
+# While writes are deferred (the bot is overloaded): {path: (logger, metrics)} held back, else None
+_deferred_writes = None
+
+
+def write_json_file(path, data, logger=None, metrics=NULL_REGISTRY, **dump_kwargs):
+    """
+    Queue data to be saved as a JSON file by the background writer thread.
+
+    See BaseModule.write_json, which is what modules use.
+
+    Args:
+        path: File to write
+        data: JSON-serializable data
+        logger: Logger for write errors
+        metrics: Metrics registry for persistence metrics
+        **dump_kwargs: Passed to json.dumps (e.g., indent=2)
+    """
+    write_file(path, json.dumps(data, **dump_kwargs), logger, metrics)
+
+
+def write_file(path, content, logger=None, metrics=NULL_REGISTRY):
+    """
+    Queue already serialized content (str or bytes) for the background writer thread.
+
+    Args:
+        path: File to write
+        content: Text, or bytes for a binary file
+        logger: Logger for write errors
+        metrics: Metrics registry for persistence metrics
+    """
+    path = os.fspath(path)
+
+    with _pending_lock:
+        already_queued = path in _pending_writes
+        _pending_writes[path] = content
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        _file_writer.submit(_flush_write, path, logger, metrics).result()
+        return
+
+    if already_queued:
+        return
+    with _pending_lock:
+        deferred = _deferred_writes is not None
+        if deferred:
+            _deferred_writes[path] = (logger, metrics)
+    if deferred:
+        if metrics.enabled:
+            metrics.counter(
+                'nicebot_overload_shed_total', 'Work shed or deferred under load, by stage', ('stage', 'name')
+            ).inc('write', os.path.basename(path))
+        return
+    _file_writer.submit(_flush_write, path, logger, metrics)
+
+
+def defer_writes():
+    """
+    Hold queued data file writes back until resume_writes() (while the bot is overloaded).
+
+    Nothing is dropped: the newest data of each file stays queued, and saves
+    made meanwhile replace it. Writes outside the event loop still happen at once.
+    """
+    global _deferred_writes
+    with _pending_lock:
+        if _deferred_writes is None:
+            _deferred_writes = {}
+
+
+def resume_writes() -> int:
+    """Hand the writes held back by defer_writes() to the writer thread; returns how many."""
+    global _deferred_writes
+    with _pending_lock:
+        deferred, _deferred_writes = _deferred_writes or {}, None
+    for path, (logger, metrics) in deferred.items():
+        _file_writer.submit(_flush_write, path, logger, metrics)
+    return len(deferred)
+
+
+def _flush_write(path: str, logger, metrics):
+    """Write the newest queued data for path (runs on the writer thread)."""
+    with _pending_lock:
+        content = _pending_writes.pop(path, None)
+    if content is None:
+        # An earlier queued write already wrote the newest data
+        return
+
+    start = time.perf_counter()
+    try:
+        # Write a temp file and swap it in, so readers (and backups) never see a partial file
+        temp_path = path + '.tmp'
+        if isinstance(content, bytes):
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+        else:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        os.replace(temp_path, path)
+    except Exception as e:
+        (logger or logging.getLogger(__name__)).error(f'Error writing {path}: {e}')
+        return
+
+    if metrics.enabled:
+        file_name = os.path.basename(path)
+        metrics.counter(
+            'nicebot_persistence_writes_total', 'Data file writes', ('file',)
+        ).inc(file_name)
+        metrics.counter(
+            'nicebot_persistence_write_bytes_total', 'Bytes written to data files', ('file',)
+        ).inc(file_name, amount=len(content))
+        metrics.histogram(
+            'nicebot_persistence_write_duration_seconds', 'Time to write a data file', ('file',)
+        ).observe(time.perf_counter() - start, file_name)
+
+
+# State store writes nobody waits for go through one background thread too,
+# so they are applied in order without blocking the loop
+_store_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='nicebot-store')
+
+
+def queue_store_write(method, *args, logger=None):
+    """
+    Queue a state store write (a bound store method and its arguments) for the store writer thread.
+
+    See BaseModule.store_write, which is what modules use. Outside the event
+    loop the write happens at once.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        method(*args)
+        return
+    _store_writer.submit(_store_write, method, args, logger)
+
+
+def flush_store_writes():
+    """Wait until the queued state store writes are done (before the store is closed)."""
+    _store_writer.submit(lambda: None).result()
+
+
+def _store_write(method, args, logger):
+    try:
+        method(*args)
+    except Exception as e:
+        (logger or logging.getLogger(__name__)).error(f'Error writing to the state store ({method.__name__}): {e}')
+
+
+class DeferredReply:
+    """
+    Stands in for the placeholder message of a deferred slash command.
+
+    The first edit() sends the reply as the interaction's follow-up (which
+    replaces Discord's "thinking..." indicator); later edits edit that reply.
+    """
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.message = None
+
+    async def edit(self, content=None, embed=None, **kwargs):
+        if self.message is None:
+            self.message = await self.ctx.send(content, embed=embed, **kwargs)
+        else:
+            await self.message.edit(content=content, embed=embed, **kwargs)
+        return self.message
 
 
 class BaseModule(ABC):
     """Base class for all bot command modules."""
 
+    # Attributes holding in-memory state that is handed over on hot reload
+    state_attributes = ()
+    # Commands that wait on an outside service; turned away while the bot is overloaded
+    slow_commands = ()
+
     def __init__(self, bot: discord.ext.commands.Bot, config: dict, data_dir: str = "data"):
         """
         Initialize the module.
@@ -25,6 +209,12 @@ class BaseModule(ABC):
         self.data_dir = data_dir
         # Create logger using module's name
         self.logger = logging.getLogger(self.__class__.__module__)
+        # Shared state backend in cluster mode (None means per-process JSON files)
+        self.state_store = getattr(bot, 'state_store', None)
+        # Metrics registry (a no-op registry when metrics are disabled)
+        self.metrics = getattr(bot, 'metrics', NULL_REGISTRY)
+        # Event bus shared by all modules (see publish() and subscribe())
+        self.events = self.event_bus()
 
     @property
     @abstractmethod
@@ -52,3 +242,299 @@ class BaseModule(ABC):
         Called when the module is unloaded (optional override).
         """
         pass
+
+    def shard_id(self, guild) -> int:
+        """
+        Return the shard serving a guild, for partitioning or labeling per-shard state.
+
+        Args:
+            guild: Discord guild, or None for DMs
+
+        Returns:
+            Shard ID (always 0 when the bot is not sharded)
+        """
+        return shard_id_for(guild)
+
+    async def store_call(self, method: str, *args):
+        """
+        Call a state store method in a worker thread, so a slow store doesn't block the loop.
+
+        Usage:
+            zip_code = await self.store_call('hget', 'user_locations', user_id)
+        """
+        return await asyncio.to_thread(getattr(self.state_store, method), *args)
+
+    def store_write(self, method: str, *args):
+        """
+        Queue a state store write whose result isn't needed; writes are applied in order.
+
+        Usage:
+            self.store_write('hset', 'friday_schedules', guild_id, spec)
+        """
+        queue_store_write(getattr(self.state_store, method), *args, logger=self.logger)
+
+    def claim_migration(self, migration_name: str) -> bool:
+        """
+        Claim the one-time import of this module's JSON data into the state store.
+
+        Args:
+            migration_name: Name of the data being imported (e.g., 'nice_counts')
+
+        Returns:
+            True for exactly one process, which should then do the import
+        """
+        return self.state_store.hsetnx('migrations', migration_name, self.state_store.owner)
+
+    async def holds_lease(self, lease_name: str, ttl_seconds: float = 180) -> bool:
+        """
+        Check whether this process should run a cluster-wide singleton job.
+
+        Call this every time the job runs (more often than ttl_seconds) to keep
+        the lease. Without a shared state store there is only one process, so
+        this is always True.
+
+        Args:
+            lease_name: Name of the job (e.g., 'backup')
+            ttl_seconds: How long the lease lasts without being renewed
+
+        Returns:
+            True if this process holds the lease
+        """
+        if self.state_store is None:
+            return True
+        return await self.store_call('acquire_lease', lease_name, ttl_seconds)
+
+    async def send_trigger_response(self, channel, content: str, coalesce_key: str = None):
+        """
+        Send an automatic trigger response at low priority.
+
+        Goes through the bot's send queue when it is enabled, so command
+        replies go first and bursts are merged: responses with the same
+        coalesce_key waiting in one channel become one message ("Nice! ×12").
+        Dropped while the bot is overloaded (see OverloadController).
+
+        Args:
+            channel: Channel to respond in
+            content: Response text
+            coalesce_key: Key for merging repeated responses (e.g., 'nice')
+        """
+        overload = getattr(self.bot, 'overload', None)
+        if overload is not None and overload.shed_trigger(self.name):
+            # The bot is falling behind; cosmetic replies go first
+            return
+        send_queue = getattr(self.bot, 'send_queue', None)
+        if send_queue is None:
+            await channel.send(content)
+            return
+        send_queue.send_trigger(channel, content, coalesce_key=coalesce_key)
+
+    def track_call(self, service: str):
+        """
+        Time an outbound HTTP/SDK call and count its result.
+
+        Usage:
+            with self.track_call('openweathermap') as call:
+                ...
+                call.error = True  # for failures that don't raise
+
+        Args:
+            service: Name of the external service (e.g., 'openai')
+        """
+        return self.metrics.track_call(service)
+
+    async def send_placeholder(self, ctx, content: str):
+        """
+        Acknowledge a slow command before doing the work.
+
+        A slash command is deferred: Discord shows "thinking..." at once and
+        the 3-second deadline for answering no longer applies. A prefix
+        command gets content as a placeholder message instead.
+
+        Usage:
+            reply = await self.send_placeholder(ctx, "🔍 Searching...")
+            ...
+            await reply.edit(content=None, embed=embed)
+
+        Returns:
+            The placeholder message, or a DeferredReply, to edit() with the result
+        """
+        if ctx.interaction is not None:
+            await ctx.defer()
+            return DeferredReply(ctx)
+        return await ctx.send(content)
+
+    def record_cache(self, cache_name: str, hit: bool):
+        """
+        Count a cache lookup as a hit or miss.
+
+        Args:
+            cache_name: Name of the cache (e.g., 'stock')
+            hit: True if the value was found in the cache
+        """
+        self.metrics.counter(
+            'nicebot_cache_requests_total',
+            'Cache lookups by result',
+            ('cache', 'result')
+        ).inc(cache_name, 'hit' if hit else 'miss')
+
+    def write_json(self, path, data, **dump_kwargs):
+        """
+        Save data to a JSON file without blocking the event loop.
+
+        The data is serialized right away (so later changes don't leak into
+        this save), then written by a single background writer thread. Saves
+        to the same file that pile up while the writer is busy are coalesced
+        into one write of the newest data. Called outside the event loop
+        (e.g. while a module is constructed), waits for the write to finish.
+
+        Args:
+            path: File to write
+            data: JSON-serializable data
+            **dump_kwargs: Passed to json.dumps (e.g., indent=2)
+        """
+        write_json_file(path, data, self.logger, self.metrics, **dump_kwargs)
+
+    def write_bytes(self, path, data: bytes):
+        """
+        Save a binary file without blocking the event loop (see write_json).
+
+        Args:
+            path: File to write
+            data: File contents
+        """
+        write_file(path, bytes(data), self.logger, self.metrics)
+
+    def declare_cooldown(self, name: str, seconds: float = 0, per: str = 'channel', reset: str = None,
+                         shared: bool = False):
+        """
+        Declare a cooldown, with defaults that 'cooldowns' in config can override.
+
+        Usage:
+            self.cooldown = self.declare_cooldown('eagles', seconds=600, per='channel')
+            ...
+            if self.cooldown.acquire(message):
+                # not on cooldown, and now it is
+
+        Args:
+            name: Cooldown name, also its key under 'cooldowns' in config
+            seconds: Default length of the cooldown
+            per: Default scope: 'channel', 'user', 'guild' or 'global'
+            reset: 'daily' for a cooldown that lasts until local midnight instead
+            shared: Started with claim(), which holds across processes sharing a state store
+
+        Returns:
+            The Cooldown
+        """
+        service = getattr(self.bot, 'cooldowns', None)
+        if service is None:
+            # No bot-wide service (e.g. a bare bot in a script): keep cooldowns in memory
+            from .cooldowns import CooldownService
+            service = self.bot.cooldowns = CooldownService(self.config)
+        return service.declare(name, seconds=seconds, per=per, reset=reset, shared=shared)
+
+    def declare_responses(self, name: str, categories: dict, mode: str = 'random'):
+        """
+        Declare a pool of responses from the shared catalog (eagles_responses.json).
+
+        Usage:
+            self.responses = self.declare_responses('eagles', {'eagles': 1, 'anti-dallas': 1}, mode='shuffle')
+            ...
+            response = self.responses.pick(message.channel)
+
+        Args:
+            name: Pool name, also its key under 'responses' in config
+            categories: Default {category: weight}
+            mode: Default mode: 'random' (weighted) or 'shuffle' (no repeats per channel)
+
+        Returns:
+            The ResponsePool
+        """
+        catalog = getattr(self.bot, 'response_catalog', None)
+        if catalog is None:
+            # No bot-wide catalog (e.g. a bare bot in a script)
+            from .responses import ResponseCatalog
+            catalog = self.bot.response_catalog = ResponseCatalog(self.config)
+        return catalog.declare(name, categories, mode=mode)
+
+    def event_bus(self):
+        """Return the bot's event bus (creating one if the bot has none, e.g. a bare bot in a script)."""
+        bus = getattr(self.bot, 'events', None)
+        if bus is None:
+            from .events import EventBus
+            bus = self.bot.events = EventBus(self.metrics)
+        return bus
+
+    def publish(self, event):
+        """
+        Publish an event to the modules subscribed to its type (never blocks).
+
+        Usage:
+            self.publish(QuoteAdded(quote))
+
+        Returns:
+            Number of subscriptions the event was queued for
+        """
+        return self.events.publish(event)
+
+    def subscribe(self, event_type, handler, **options):
+        """
+        Subscribe a handler to an event type; call from setup() and pass the
+        result to `await self.events.unsubscribe(...)` in teardown().
+
+        Usage:
+            self.nice_subscription = self.subscribe(NiceDetected, self.on_nice, batch_size=500)
+
+        Args:
+            event_type: Event class to receive
+            handler: Function or coroutine function taking an event (a list of events when batched)
+            **options: batch_size, batch_interval, max_pending or name (see EventBus.subscribe)
+
+        Returns:
+            The Subscription
+        """
+        return self.events.subscribe(event_type, handler, **options)
+
+    def add_message_listener(self, listener):
+        """
+        Receive messages in the channels where this module is enabled; call
+        from setup() and remove_message_listener() in teardown().
+
+        Usage:
+            self.add_message_listener(self.on_message)
+
+        The bot's on_message runs the listener only where the guild hasn't
+        turned the module off (!modules) and 'module_channels' allows it.
+        """
+        router = getattr(self.bot, 'router', None)
+        if router is None:
+            # A bare bot (e.g. in a script) has no routing; deliver every message
+            self.bot.add_listener(listener, 'on_message')
+            return
+        router.add_listener(self.name, listener)
+
+    def remove_message_listener(self, listener):
+        router = getattr(self.bot, 'router', None)
+        if router is None:
+            self.bot.remove_listener(listener, 'on_message')
+            return
+        router.remove_listener(self.name, listener)
+
+    def export_state(self) -> dict:
+        """
+        Export in-memory state so a reloaded copy of this module can take over.
+
+        Returns:
+            Dictionary of state, by default the attributes in state_attributes
+        """
+        return {attr: getattr(self, attr) for attr in self.state_attributes}
+
+    def import_state(self, state: dict):
+        """
+        Take over state exported by the previous instance of this module.
+        Called on the new instance before setup().
+
+        Args:
+            state: Dictionary returned by export_state()
+        """
+        for attr, value in state.items():
+            setattr(self, attr, value)
@@ -1,23 +1,30 @@
-"""Backup module - Automatic Dropbox backups for bot data."""
+"""Backup module - Automatic local and Dropbox backups for bot data."""
 
 import os
-import json
-import zipfile
+import time
+import asyncio
 import tempfile
-from datetime import datetime, timedelta
+from datetime import datetime
 from discord.ext import commands, tasks
 from . import BaseModule
+from .events import BackupFinished
+from .state_store import SQLiteStateStore
+from .backup_targets import (
+    DropboxTarget,
+    LocalDirectoryTarget,
+    TIMESTAMP_FORMAT,
+)
 
 try:
     import dropbox
-    from dropbox.exceptions import ApiError, AuthError
+    from dropbox.exceptions import AuthError
     DROPBOX_AVAILABLE = True
 except ImportError:
     DROPBOX_AVAILABLE = False
 
 
 class BackupModule(BaseModule):
-    """Module for automatic Dropbox backups of bot data."""
+    """Module for automatic backups of bot data to one or more backup targets."""
 
     def __init__(self, bot, config: dict, data_dir: str):
         super().__init__(bot, config, data_dir)
@@ -30,8 +37,15 @@ class BackupModule(BaseModule):
         self.backup_interval_hours = config.get('dropbox_backup_interval_hours', 6)
         self.backup_on_startup = config.get('dropbox_backup_on_startup', True)
         self.retention_days = config.get('dropbox_retention_days', 30)
+        self.local_backup_enabled = config.get('local_backup_enabled', False)
+        self.local_backup_dir = config.get('local_backup_dir', 'backups')
+        self.local_backup_interval_minutes = config.get('local_backup_interval_minutes', 15)
+        self.local_retention_days = config.get('local_backup_retention_days', self.retention_days)
         self.dbx = None
+        self.targets = []
         self.last_backup_time = None
+        self.restored_backup_times = {}  # {target_name: datetime} handed over on reload
+        self.backup_lock = asyncio.Lock()  # One backup at a time (scheduled or manual)
         self.config = config
         self.config_path = "config.json"
 
@@ -41,20 +55,63 @@ class BackupModule(BaseModule):
 
     @property
     def description(self) -> str:
-        return "Automatic Dropbox backups (!backup)"
+        return "Automatic local and Dropbox backups (!backup)"
 
     async def setup(self):
         """Set up the backup module."""
-        if not DROPBOX_AVAILABLE:
-            self.logger.error("Dropbox library not installed. Run: pip install dropbox")
+        self.targets = []
+        if self.local_backup_enabled:
+            self.targets.append(LocalDirectoryTarget(
+                self.logger,
+                self.local_backup_dir,
+                interval_seconds=self.local_backup_interval_minutes * 60,
+                retention_days=self.local_retention_days,
+            ))
+            self.logger.info(
+                f"✓ Local backups enabled: {self.local_backup_dir} "
+                f"(interval: {self.local_backup_interval_minutes}m)"
+            )
+
+        # Dropbox authentication is a blocking network call
+        await asyncio.get_running_loop().run_in_executor(None, self.setup_dropbox)
+
+        if not self.targets:
             return
 
+        # Create backup command
+        @commands.hybrid_command(name='backup', description='Back up the bot data now (admin only)')
+        @commands.has_permissions(administrator=True)
+        async def backup_cmd(ctx):
+            await self.manual_backup_command(ctx)
+
+        self.bot.add_command(backup_cmd)
+
+        # The scheduled task's first iteration runs immediately, which is the
+        # startup backup; without it (or after a reload), wait out the interval
+        for target in self.targets:
+            if target.name in self.restored_backup_times:
+                target.last_backup_time = self.restored_backup_times[target.name]
+            elif not self.backup_on_startup:
+                target.last_backup_time = datetime.now()
+
+        # Start scheduled backup task
+        self.scheduled_backup.start()
+        target_names = ', '.join(target.name for target in self.targets)
+        self.logger.info(f"✓ Loaded module: {self.name} (targets: {target_names})")
+
+    def setup_dropbox(self):
+        """Initialize the Dropbox client and add it as a backup target if configured."""
         if not self.backup_enabled:
-            self.logger.info("✓ Loaded module: backup (disabled)")
+            self.logger.info("Dropbox backups disabled")
             return
 
         if not self.dropbox_token and not self.dropbox_refresh_token:
-            self.logger.warning("✓ Loaded module: backup (no access token or refresh token configured)")
+            if not self.targets:
+                self.logger.warning("✓ Loaded module: backup (no access token or refresh token configured)")
+            return
+
+        if not DROPBOX_AVAILABLE:
+            self.logger.error("Dropbox library not installed. Run: pip install dropbox")
             return
 
         # Initialize Dropbox client with refresh token support
@@ -72,11 +129,12 @@ class BackupModule(BaseModule):
                 self.dbx = dropbox.Dropbox(self.dropbox_token)
                 self.logger.info("✓ Dropbox initialized with access token (no auto-refresh)")
             else:
-                self.logger.warning("✓ Loaded module: backup (insufficient credentials)")
+                self.logger.warning("Dropbox backups skipped (insufficient credentials)")
                 return
 
             # Test authentication
-            self.dbx.users_get_current_account()
+            with self.track_call('dropbox'):
+                self.dbx.users_get_current_account()
             self.logger.info("✓ Dropbox authentication successful")
         except AuthError as e:
             self.logger.error(f"Dropbox authentication failed: {e}")
@@ -87,22 +145,20 @@ class BackupModule(BaseModule):
             self.dbx = None
             return
 
-        # Create backup command
-        @commands.command(name='backup')
-        @commands.has_permissions(administrator=True)
-        async def backup_cmd(ctx):
-            await self.manual_backup_command(ctx)
-
-        self.bot.add_command(backup_cmd)
-
-        # Start scheduled backup task
-        if self.dbx:
-            self.scheduled_backup.start()
-            self.logger.info(f"✓ Loaded module: {self.name} (interval: {self.backup_interval_hours}h)")
-
-            # Perform initial backup if configured
-            if self.backup_on_startup:
-                self.bot.loop.create_task(self.perform_backup())
+        self.targets.append(DropboxTarget(
+            self.logger,
+            self.dbx,
+            self.backup_folder,
+            interval_seconds=self.backup_interval_hours * 3600,
+            retention_days=self.retention_days,
+        ))
+
+    def export_state(self) -> dict:
+        """Export last backup times so a reload doesn't trigger an immediate backup."""
+        return {
+            'last_backup_time': self.last_backup_time,
+            'restored_backup_times': {target.name: target.last_backup_time for target in self.targets},
+        }
 
     async def teardown(self):
         """Clean up the backup module."""
@@ -110,123 +166,139 @@ class BackupModule(BaseModule):
             self.scheduled_backup.cancel()
         self.bot.remove_command('backup')
 
-    @tasks.loop(hours=1)
+    @tasks.loop(minutes=1)
     async def scheduled_backup(self):
-        """Scheduled task that checks if it's time to backup."""
-        if not self.dbx or not self.backup_enabled:
+        """Scheduled task that backs up to every target whose interval has elapsed."""
+        # In cluster mode only one worker process runs scheduled backups
+        if not await self.holds_lease('backup'):
             return
 
-        # Check if enough time has passed since last backup
-        if self.last_backup_time:
-            time_since_backup = datetime.now() - self.last_backup_time
-            if time_since_backup.total_seconds() < (self.backup_interval_hours * 3600):
-                return
-
-        await self.perform_backup()
-
-    async def perform_backup(self):
-        """Perform a backup of all data files to Dropbox."""
-        if not self.dbx:
-            self.logger.error("Cannot perform backup: Dropbox not initialized")
+        now = datetime.now()
+        due_targets = [target for target in self.targets if target.is_due(now)]
+        if due_targets:
+            await self.perform_backup(due_targets)
+
+    def collect_backup_files(self, temp_dir: str) -> list:
+        """
+        Collect the files that make up a snapshot.
+
+        Args:
+            temp_dir: Directory for copies made just for this snapshot (the
+                SQLite state store), removed once the targets are done
+
+        Returns:
+            List of (source_path, arcname) tuples
+        """
+        files = []
+        local_backup_dir = os.path.abspath(self.local_backup_dir)
+
+        # The SQLite state store is copied through SQLite, never file by file
+        store_path = None
+        if isinstance(self.state_store, SQLiteStateStore):
+            store_path = os.path.abspath(self.state_store.path)
+            if os.path.commonpath([store_path, os.path.abspath(self.data_dir)]) == os.path.abspath(self.data_dir):
+                arcname = os.path.relpath(self.state_store.path, os.path.dirname(self.data_dir))
+            else:
+                arcname = os.path.basename(store_path)
+            snapshot_path = os.path.join(temp_dir, os.path.basename(store_path))
+            self.state_store.backup_to(snapshot_path)
+            files.append((snapshot_path, arcname))
+
+        # Backup all files in data directory
+        if os.path.exists(self.data_dir):
+            for root, dirs, filenames in os.walk(self.data_dir):
+                # Never back up the local snapshot directory into itself
+                dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != local_backup_dir]
+                for file in filenames:
+                    # Skip data files that are being written right now, and
+                    # SQLite's journal files (the database copy includes them)
+                    if file.endswith(('.tmp', '-wal', '-shm', '-journal')):
+                        continue
+                    file_path = os.path.join(root, file)
+                    if os.path.abspath(file_path) == store_path:
+                        continue
+                    arcname = os.path.relpath(file_path, os.path.dirname(self.data_dir))
+                    files.append((file_path, arcname))
+
+        # Backup config.json (with all API tokens)
+        if os.path.exists(self.config_path):
+            files.append((self.config_path, "config.json"))
+
+        # Backup eagles_responses.json
+        eagles_path = "eagles_responses.json"
+        if os.path.exists(eagles_path):
+            files.append((eagles_path, "eagles_responses.json"))
+
+        return files
+
+    async def perform_backup(self, targets: list = None) -> bool:
+        """
+        Take one snapshot of all data files and store it in each target.
+
+        Targets are processed in order, and a target that returns stored copies
+        (the local snapshot) feeds those copies to the next target, so every
+        target receives the same point-in-time snapshot.
+
+        Args:
+            targets: Targets to back up to (defaults to all configured targets)
+
+        Returns:
+            True if every target succeeded, False otherwise
+        """
+        if targets is None:
+            targets = self.targets
+
+        if not targets:
+            self.logger.error("Cannot perform backup: no backup targets configured")
             return False
 
+        # Copying, zipping and uploading are all blocking, so back up in a thread
+        async with self.backup_lock:
+            started = time.perf_counter()
+            success = await asyncio.get_running_loop().run_in_executor(None, self.backup_to_targets, targets)
+        self.publish(BackupFinished(success, [target.name for target in targets], time.perf_counter() - started))
+        return success
+
+    def backup_to_targets(self, targets: list) -> bool:
+        """
+        Snapshot the data files into each target (blocking, runs in a worker thread).
+
+        Returns:
+            True if every target succeeded, False otherwise
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            return self._backup_to_targets(targets, temp_dir)
+
+    def _backup_to_targets(self, targets: list, temp_dir: str) -> bool:
+        timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
         try:
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            backup_filename = f"nicebot_backup_{timestamp}.zip"
-
-            # Create temporary ZIP file
-            with tempfile.NamedTemporaryFile(mode='w+b', suffix='.zip', delete=False) as tmp_file:
-                temp_path = tmp_file.name
-
-                try:
-                    with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                        # Backup all files in data directory
-                        if os.path.exists(self.data_dir):
-                            for root, dirs, files in os.walk(self.data_dir):
-                                for file in files:
-                                    file_path = os.path.join(root, file)
-                                    arcname = os.path.relpath(file_path, os.path.dirname(self.data_dir))
-                                    zipf.write(file_path, arcname)
-                                    self.logger.debug(f"Added to backup: {arcname}")
-
-                        # Backup config.json (with all API tokens)
-                        config_path = "config.json"
-                        if os.path.exists(config_path):
-                            zipf.write(config_path, "config.json")
-                            self.logger.debug("Added to backup: config.json")
-
-                        # Backup eagles_responses.json
-                        eagles_path = "eagles_responses.json"
-                        if os.path.exists(eagles_path):
-                            zipf.write(eagles_path, "eagles_responses.json")
-                            self.logger.debug("Added to backup: eagles_responses.json")
-
-                    # Upload to Dropbox
-                    with open(temp_path, 'rb') as f:
-                        dropbox_path = f"{self.backup_folder}/{backup_filename}"
-                        self.dbx.files_upload(f.read(), dropbox_path, mode=dropbox.files.WriteMode.overwrite)
-
-                    self.logger.info(f"✓ Backup successful: {backup_filename} uploaded to Dropbox")
-                    self.last_backup_time = datetime.now()
-
-                    # Clean up old backups
-                    await self.cleanup_old_backups()
-
-                    return True
-
-                finally:
-                    # Clean up temporary file
-                    if os.path.exists(temp_path):
-                        os.unlink(temp_path)
-
-        except ApiError as e:
-            self.logger.error(f"Dropbox API error during backup: {e}")
-            return False
+            files = self.collect_backup_files(temp_dir)
         except Exception as e:
-            self.logger.error(f"Error during backup: {e}")
+            self.logger.error(f"Error collecting backup files: {e}")
             return False
+        success = True
 
-    async def cleanup_old_backups(self):
-        """Delete backups older than retention period."""
-        try:
-            # List all files in backup folder
-            result = self.dbx.files_list_folder(self.backup_folder)
-
-            cutoff_date = datetime.now() - timedelta(days=self.retention_days)
-            deleted_count = 0
-
-            for entry in result.entries:
-                if isinstance(entry, dropbox.files.FileMetadata):
-                    # Check if file is older than retention period
-                    if entry.server_modified < cutoff_date:
-                        self.dbx.files_delete_v2(entry.path_display)
-                        deleted_count += 1
-                        self.logger.debug(f"Deleted old backup: {entry.name}")
-
-            if deleted_count > 0:
-                self.logger.info(f"✓ Cleaned up {deleted_count} old backup(s)")
-
-        except ApiError as e:
-            if e.error.is_path() and e.error.get_path().is_not_found():
-                # Backup folder doesn't exist yet, create it
-                try:
-                    self.dbx.files_create_folder_v2(self.backup_folder)
-                    self.logger.info(f"Created backup folder: {self.backup_folder}")
-                except Exception as create_error:
-                    self.logger.error(f"Error creating backup folder: {create_error}")
-            else:
-                self.logger.error(f"Error cleaning up old backups: {e}")
-        except Exception as e:
-            self.logger.error(f"Error cleaning up old backups: {e}")
+        for target in targets:
+            try:
+                with self.track_call(target.name):
+                    stored = target.store(files, timestamp)
+                if stored is not None:
+                    files = stored
+                target.last_backup_time = datetime.now()
+                self.last_backup_time = target.last_backup_time
+
+                # Clean up old backups
+                target.cleanup()
+            except Exception as e:
+                self.logger.error(f"Error during {target.name} backup: {e}")
+                success = False
+
+        return success
 
     async def manual_backup_command(self, ctx):
         """Handle manual backup command."""
-        if not self.dbx:
-            await ctx.send("❌ Dropbox backup is not configured or initialized.")
-            return
-
-        if not self.backup_enabled:
-            await ctx.send("❌ Backup is currently disabled in config.")
+        if not self.targets:
+            await ctx.send("❌ No backup target is configured or initialized.")
             return
 
         await ctx.send("⏳ Starting manual backup...")
@@ -235,6 +307,7 @@ class BackupModule(BaseModule):
 
         if success:
             backup_info = f"Last backup: {self.last_backup_time.strftime('%Y-%m-%d %H:%M:%S')}"
-            await ctx.send(f"✅ Backup completed successfully!\n{backup_info}")
+            target_names = ', '.join(target.name for target in self.targets)
+            await ctx.send(f"✅ Backup completed successfully! ({target_names})\n{backup_info}")
         else:
             await ctx.send("❌ Backup failed. Check bot logs for details.")
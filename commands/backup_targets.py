@@ -0,0 +1,247 @@
+"""Backup targets - destinations that the backup module writes snapshots to."""
+
+import os
+import shutil
+import zipfile
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+try:
+    import dropbox
+    from dropbox.exceptions import ApiError
+    DROPBOX_AVAILABLE = True
+except ImportError:
+    DROPBOX_AVAILABLE = False
+
+# Shared prefix and timestamp format for snapshot directories and ZIP files
+BACKUP_PREFIX = "nicebot_backup_"
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+
+class BackupTarget(ABC):
+    """Base class for a place backups are stored (local directory, Dropbox, ...)."""
+
+    def __init__(self, logger, interval_seconds: float, retention_days: int):
+        """
+        Initialize the target.
+
+        Args:
+            logger: Logger of the owning module
+            interval_seconds: Seconds between scheduled backups to this target
+            retention_days: Days to keep old backups before cleanup
+        """
+        self.logger = logger
+        self.interval_seconds = interval_seconds
+        self.retention_days = retention_days
+        self.last_backup_time = None
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Return the target name used in logs and command output."""
+        pass
+
+    @abstractmethod
+    def store(self, files: list, timestamp: str):
+        """
+        Store a snapshot of the given files.
+
+        Args:
+            files: List of (source_path, arcname) tuples making up the snapshot
+            timestamp: Snapshot timestamp formatted with TIMESTAMP_FORMAT
+
+        Returns:
+            Optional list of (path, arcname) tuples pointing at the stored copies,
+            so later targets can be fed from the same point-in-time snapshot
+        """
+        pass
+
+    @abstractmethod
+    def cleanup(self):
+        """Delete backups older than the retention period."""
+        pass
+
+    def is_due(self, now: datetime) -> bool:
+        """Check if enough time has passed since the last backup to this target."""
+        if not self.last_backup_time:
+            return True
+        return (now - self.last_backup_time).total_seconds() >= self.interval_seconds
+
+
+class LocalDirectoryTarget(BackupTarget):
+    """
+    Snapshot backups into a local directory, rsync --link-dest style.
+
+    Each snapshot is a full directory tree, but files that are unchanged since
+    the previous snapshot are hardlinked instead of copied, so frequent
+    snapshots cost almost nothing in disk space or I/O.
+    """
+
+    def __init__(self, logger, backup_dir: str, interval_seconds: float, retention_days: int):
+        super().__init__(logger, interval_seconds, retention_days)
+        self.backup_dir = backup_dir
+
+    @property
+    def name(self) -> str:
+        return "local"
+
+    def list_snapshots(self) -> list:
+        """Return completed snapshot directory names, oldest first."""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        return sorted(
+            entry for entry in os.listdir(self.backup_dir)
+            if entry.startswith(BACKUP_PREFIX)
+            and not entry.endswith('.partial')
+            and os.path.isdir(os.path.join(self.backup_dir, entry))
+        )
+
+    def store(self, files: list, timestamp: str) -> list:
+        """Write a hardlinked snapshot directory and return paths to its files."""
+        os.makedirs(self.backup_dir, exist_ok=True)
+
+        snapshots = self.list_snapshots()
+        previous_dir = os.path.join(self.backup_dir, snapshots[-1]) if snapshots else None
+
+        snapshot_name = f"{BACKUP_PREFIX}{timestamp}"
+        snapshot_dir = os.path.join(self.backup_dir, snapshot_name)
+        # Build into a .partial directory so an interrupted snapshot is never
+        # mistaken for a complete one (or used as the next link source)
+        partial_dir = snapshot_dir + '.partial'
+        if os.path.exists(partial_dir):
+            shutil.rmtree(partial_dir)
+
+        stored = []
+        linked_count = 0
+        for source_path, arcname in files:
+            dest_path = os.path.join(partial_dir, arcname)
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+            previous_path = os.path.join(previous_dir, arcname) if previous_dir else None
+            if previous_path and self._is_unchanged(source_path, previous_path):
+                try:
+                    os.link(previous_path, dest_path)
+                    linked_count += 1
+                    stored.append((dest_path, arcname))
+                    continue
+                except OSError as e:
+                    self.logger.debug(f"Hardlink failed for {arcname}, copying instead: {e}")
+
+            # copy2 preserves mtime, which the next snapshot compares against
+            shutil.copy2(source_path, dest_path)
+            stored.append((dest_path, arcname))
+
+        os.rename(partial_dir, snapshot_dir)
+
+        # Point the returned paths at the final directory name
+        stored = [
+            (os.path.join(snapshot_dir, os.path.relpath(path, partial_dir)), arcname)
+            for path, arcname in stored
+        ]
+
+        self.logger.info(
+            f"✓ Local snapshot: {snapshot_name} "
+            f"({len(files) - linked_count} copied, {linked_count} hardlinked)"
+        )
+        return stored
+
+    def _is_unchanged(self, source_path: str, previous_path: str) -> bool:
+        """rsync-style quick check: same size and modification time."""
+        try:
+            source_stat = os.stat(source_path)
+            previous_stat = os.stat(previous_path)
+        except OSError:
+            return False
+        return (source_stat.st_size == previous_stat.st_size
+                and source_stat.st_mtime_ns == previous_stat.st_mtime_ns)
+
+    def cleanup(self):
+        """Delete snapshot directories older than the retention period (always keeps the newest)."""
+        cutoff_date = datetime.now() - timedelta(days=self.retention_days)
+        snapshots = self.list_snapshots()
+        deleted_count = 0
+
+        for snapshot_name in snapshots[:-1]:
+            try:
+                snapshot_date = datetime.strptime(snapshot_name[len(BACKUP_PREFIX):], TIMESTAMP_FORMAT)
+            except ValueError:
+                continue
+
+            if snapshot_date < cutoff_date:
+                shutil.rmtree(os.path.join(self.backup_dir, snapshot_name), ignore_errors=True)
+                deleted_count += 1
+                self.logger.debug(f"Deleted old local snapshot: {snapshot_name}")
+
+        if deleted_count > 0:
+            self.logger.info(f"✓ Cleaned up {deleted_count} old local snapshot(s)")
+
+
+class DropboxTarget(BackupTarget):
+    """Upload each snapshot to Dropbox as a single ZIP file."""
+
+    def __init__(self, logger, dbx, backup_folder: str, interval_seconds: float, retention_days: int):
+        super().__init__(logger, interval_seconds, retention_days)
+        self.dbx = dbx
+        self.backup_folder = backup_folder
+
+    @property
+    def name(self) -> str:
+        return "dropbox"
+
+    def store(self, files: list, timestamp: str):
+        """Zip the snapshot files and upload the archive to Dropbox."""
+        backup_filename = f"{BACKUP_PREFIX}{timestamp}.zip"
+
+        with tempfile.NamedTemporaryFile(mode='w+b', suffix='.zip', delete=False) as tmp_file:
+            temp_path = tmp_file.name
+
+        try:
+            with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                for source_path, arcname in files:
+                    zipf.write(source_path, arcname)
+                    self.logger.debug(f"Added to backup: {arcname}")
+
+            with open(temp_path, 'rb') as f:
+                dropbox_path = f"{self.backup_folder}/{backup_filename}"
+                self.dbx.files_upload(f.read(), dropbox_path, mode=dropbox.files.WriteMode.overwrite)
+
+            self.logger.info(f"✓ Backup successful: {backup_filename} uploaded to Dropbox")
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+        return None
+
+    def cleanup(self):
+        """Delete Dropbox backups older than the retention period."""
+        try:
+            # List all files in backup folder
+            result = self.dbx.files_list_folder(self.backup_folder)
+
+            cutoff_date = datetime.now() - timedelta(days=self.retention_days)
+            deleted_count = 0
+
+            for entry in result.entries:
+                if isinstance(entry, dropbox.files.FileMetadata):
+                    # Check if file is older than retention period
+                    if entry.server_modified < cutoff_date:
+                        self.dbx.files_delete_v2(entry.path_display)
+                        deleted_count += 1
+                        self.logger.debug(f"Deleted old backup: {entry.name}")
+
+            if deleted_count > 0:
+                self.logger.info(f"✓ Cleaned up {deleted_count} old backup(s)")
+
+        except ApiError as e:
+            if e.error.is_path() and e.error.get_path().is_not_found():
+                # Backup folder doesn't exist yet, create it
+                try:
+                    self.dbx.files_create_folder_v2(self.backup_folder)
+                    self.logger.info(f"Created backup folder: {self.backup_folder}")
+                except Exception as create_error:
+                    self.logger.error(f"Error creating backup folder: {create_error}")
+            else:
+                self.logger.error(f"Error cleaning up old backups: {e}")
+        except Exception as e:
+            self.logger.error(f"Error cleaning up old backups: {e}")
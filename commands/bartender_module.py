@@ -20,7 +20,7 @@ class BartenderModule(BaseModule):
         """Set up the bartender module."""
 
         # Create wrapper function for the command
-        @commands.command(name='bartender')
+        @commands.hybrid_command(name='bartender', description='Bartender song on YouTube')
         async def bartender_cmd(ctx):
             await self.bartender_command(ctx)
 
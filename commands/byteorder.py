@@ -0,0 +1,25 @@
+"""Byte order - integer arrays in the little-endian order of the binary snapshots.
+
+The nice history and leaderboard snapshots store arrays of unsigned ints
+little-endian, so a snapshot written on one machine loads on any other.
+"""
+
+import sys
+from array import array
+
+
+def to_little_endian(values: array) -> bytes:
+    """Return an array's bytes in little-endian order."""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def from_little_endian(typecode: str, data: bytes) -> array:
+    """Return the array of the given typecode stored little-endian in data."""
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
@@ -5,9 +5,11 @@ from discord.ext import commands
 import asyncio
 import json
 import os
+import time
 from pathlib import Path
 from datetime import datetime
 from . import BaseModule
+from .events import ChatCompleted
 
 try:
     from openai import OpenAI
@@ -20,6 +22,9 @@ except ImportError:
 class ChatGPTModule(BaseModule):
     """Module for the !chat command using OpenAI ChatGPT."""
 
+    state_attributes = ('conversation_history',)
+    slow_commands = ('chat',)
+
     def __init__(self, bot, config: dict, data_dir: str = "data"):
         super().__init__(bot, config, data_dir)
         self.api_key = config.get('openai_api_key')
@@ -27,7 +32,8 @@ class ChatGPTModule(BaseModule):
         self.max_history = config.get('chatgpt_max_history', 10)  # Max message pairs per user
         self.system_message = config.get('chatgpt_system_message', "You are a helpful assistant.")
 
-        # Channel whitelist - empty list means all channels allowed
+        # Channel whitelist - empty list means all channels allowed (the bot's
+        # module routing keeps !chat out of the other channels)
         self.allowed_channels = config.get('chatgpt_channels', [])
 
         # Path to store conversation history
@@ -88,8 +94,7 @@ class ChatGPTModule(BaseModule):
             # Ensure data directory exists
             self.history_file.parent.mkdir(parents=True, exist_ok=True)
 
-            with open(self.history_file, 'w') as f:
-                json.dump(self.conversation_history, f, indent=2)
+            self.write_json(self.history_file, self.conversation_history, indent=2)
         except Exception as e:
             self.logger.error(f"Error saving conversation history: {e}")
 
@@ -135,7 +140,7 @@ class ChatGPTModule(BaseModule):
         """Set up the chatgpt module."""
 
         # Create wrapper function for the command
-        @commands.command(name='chat')
+        @commands.hybrid_command(name='chat', description='Ask ChatGPT (reset clears your history)')
         async def chat_cmd(ctx, *, prompt: str = None):
             await self.chat_command(ctx, prompt=prompt)
 
@@ -151,11 +156,6 @@ class ChatGPTModule(BaseModule):
 
     async def chat_command(self, ctx, *, prompt: str = None):
         """Ask ChatGPT a question and return the response."""
-        # Check if command is allowed in this channel
-        if self.allowed_channels and ctx.channel.name not in self.allowed_channels:
-            # Silently ignore if not in allowed channels
-            return
-
         if not prompt:
             await ctx.send("Please provide a prompt. Example: `!chat What is the capital of France?`\n\n"
                           "**Special commands:**\n"
@@ -205,7 +205,7 @@ class ChatGPTModule(BaseModule):
             return
 
         # Send a "thinking" message
-        thinking_msg = await ctx.send(f"🤖 Thinking...")
+        thinking_msg = await self.send_placeholder(ctx, "🤖 Thinking...")
 
         try:
             # Add user message to history
@@ -216,15 +216,17 @@ class ChatGPTModule(BaseModule):
 
             # Call OpenAI API in a thread to avoid blocking
             loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=messages,
-                    max_tokens=1000,
-                    temperature=0.7
+            started = time.perf_counter()
+            with self.track_call('openai'):
+                response = await loop.run_in_executor(
+                    None,
+                    lambda: self.client.chat.completions.create(
+                        model="gpt-4o-mini",
+                        messages=messages,
+                        max_tokens=1000,
+                        temperature=0.7
+                    )
                 )
-            )
 
             # Extract the response text
             response_text = response.choices[0].message.content
@@ -236,6 +238,7 @@ class ChatGPTModule(BaseModule):
 
             # Add assistant response to history
             self._add_message(user_id, "assistant", response_text)
+            self.publish(ChatCompleted(user_id, "gpt-4o-mini", time.perf_counter() - started))
 
             # Truncate response if too long for Discord (2000 char limit)
             if len(response_text) > 1900:
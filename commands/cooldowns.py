@@ -0,0 +1,337 @@
+"""Cooldowns - shared per-channel/user/guild cooldowns with heap-driven expiry.
+
+Modules declare named cooldowns (with defaults that 'cooldowns' in config can
+override) and ask them whether a message or command may go ahead. A check is
+one dict lookup. Every active cooldown also sits in a min-heap ordered by
+expiry, so expired entries are dropped a few at a time as they run out instead
+of by scanning everything on each save. The live entries are saved as a
+periodic snapshot rather than on every hit.
+
+A cooldown declared shared is started with claim() instead, which with a
+state store also claims the entry there in one atomic step, so several
+processes serving the same channels (gateway workers and slash command
+endpoints) can't both start it. The store is the record of those entries,
+so they are left out of the snapshot.
+"""
+
+import os
+import json
+import time
+import heapq
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from . import queue_store_write, write_json_file
+from .metrics import NULL_REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ('channel', 'user', 'guild', 'global')
+
+
+def next_midnight(now: float) -> float:
+    """Return the timestamp of the next local midnight after now."""
+    tomorrow = date.fromtimestamp(now) + timedelta(days=1)
+    return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+
+class Cooldown:
+    """A named cooldown declared by a module."""
+
+    def __init__(self, service, name: str, seconds: float, per: str, reset: str = None):
+        if per not in SCOPES:
+            raise ValueError(f"Cooldown {name}: 'per' must be one of {', '.join(SCOPES)}, not {per!r}")
+        if reset not in (None, 'daily'):
+            raise ValueError(f"Cooldown {name}: 'reset' must be 'daily' or unset, not {reset!r}")
+        self.service = service
+        self.name = name
+        self.seconds = seconds
+        self.per = per
+        self.reset = reset
+
+    def key_for(self, source) -> str:
+        """
+        Return the cooldown key for a message or command context.
+
+        Args:
+            source: Message or Context (or an explicit key, e.g. a channel ID)
+        """
+        if isinstance(source, (int, str)):
+            return str(source)
+        if self.per == 'channel':
+            return str(source.channel.id)
+        if self.per == 'user':
+            return str(source.author.id)
+        if self.per == 'guild':
+            # DMs have no guild; the DM channel stands in for it
+            guild = source.guild
+            return str(guild.id if guild is not None else source.channel.id)
+        return 'global'
+
+    def expires_at(self, now: float) -> float:
+        """Return when a cooldown started now runs out."""
+        if self.reset == 'daily':
+            return next_midnight(now)
+        return now + self.seconds
+
+    def remaining(self, source) -> float:
+        """Return the seconds left on the cooldown for source (0 if it's not on cooldown)."""
+        return self.service.remaining(self.name, self.key_for(source))
+
+    def acquire(self, source) -> bool:
+        """
+        Start the cooldown for source unless it is already running.
+
+        Returns:
+            True if source was not on cooldown (go ahead), False otherwise
+        """
+        now = time.time()
+        return self.service.acquire(self.name, self.key_for(source), self.expires_at(now), now)
+
+    async def claim(self, source) -> bool:
+        """Like acquire(), but across processes for a shared cooldown (see CooldownService.claim)."""
+        return (await self.claim_many([source]))[0]
+
+    async def claim_many(self, sources: list) -> list:
+        """
+        claim() for several sources at once (one state store round trip).
+
+        Returns:
+            [True if source was not on cooldown], in the order of sources
+        """
+        now = time.time()
+        return await self.service.claim(self.name, [self.key_for(source) for source in sources], self.expires_at(now), now)
+
+    def set(self, source, expires_at: float):
+        """Put source on cooldown until the given timestamp (e.g. when importing old data)."""
+        self.service.set(self.name, self.key_for(source), expires_at)
+
+    def clear(self, source):
+        """Take source off cooldown."""
+        self.service.clear(self.name, self.key_for(source))
+
+
+class CooldownService:
+    """Holds every active cooldown of the bot and snapshots them to disk or the state store."""
+
+    def __init__(self, config: dict, data_dir: str = None, state_store=None, metrics=NULL_REGISTRY):
+        """
+        Initialize the service and load the last snapshot.
+
+        Args:
+            config: Configuration dictionary ('cooldowns', 'cooldown_snapshot_seconds')
+            data_dir: Directory for the snapshot file (None keeps cooldowns in memory only)
+            state_store: Shared state store to snapshot into instead of a file
+            metrics: Metrics registry
+        """
+        self.config = config
+        self.overrides = config.get('cooldowns', {})
+        self.snapshot_interval = config.get('cooldown_snapshot_seconds', 60)
+        self.snapshot_file = os.path.join(data_dir, 'cooldowns.json') if data_dir else None
+        self.state_store = state_store
+        self.cooldowns = {}  # {name: Cooldown}
+        self.shared = set()  # Names of shared cooldowns, whose entries live in the state store
+        self.expiries = {}  # {(name, key): expiry timestamp}
+        self.heap = []  # [(expiry, name, key)], may hold stale entries for cleared keys
+        self.changed = set()  # (name, key) set or cleared since the last snapshot
+        self.snapshot_task = None
+        self.checks_total = metrics.counter(
+            'nicebot_cooldown_checks_total', 'Cooldown checks by result', ('cooldown', 'result')
+        )
+        metrics.gauge(
+            'nicebot_cooldown_entries', 'Active cooldown entries'
+        ).set_function(lambda: len(self.expiries))
+        self.load()
+
+    def declare(self, name: str, seconds: float = 0, per: str = 'channel', reset: str = None,
+                shared: bool = False) -> Cooldown:
+        """
+        Declare a cooldown (or update it when a reloaded module declares it again).
+
+        Settings under 'cooldowns' -> name in config take precedence over the
+        defaults given here, e.g. {"cooldowns": {"eagles": {"seconds": 300}}}.
+        A shared cooldown is started with claim().
+        """
+        settings = self.overrides.get(name, {})
+        cooldown = Cooldown(
+            self,
+            name,
+            seconds=settings.get('seconds', seconds),
+            per=settings.get('per', per),
+            reset=settings.get('reset', reset),
+        )
+        if shared:
+            self.shared.add(name)
+        else:
+            self.shared.discard(name)
+        self.cooldowns[name] = cooldown
+        return cooldown
+
+    def remaining(self, name: str, key: str, now: float = None) -> float:
+        """Return the seconds left on a cooldown entry (0 if there is none)."""
+        expiry = self.expiries.get((name, key))
+        if expiry is None:
+            return 0.0
+        return max(0.0, expiry - (now if now is not None else time.time()))
+
+    def acquire(self, name: str, key: str, expires_at: float, now: float = None) -> bool:
+        """
+        Start a cooldown entry unless it is already running.
+
+        Returns:
+            True if the entry was started, False if it was still on cooldown
+        """
+        now = now if now is not None else time.time()
+        self.expire(now)
+        if self.expiries.get((name, key), 0) > now:
+            self.checks_total.inc(name, 'limited')
+            return False
+        self.set(name, key, expires_at)
+        self.checks_total.inc(name, 'allowed')
+        return True
+
+    async def claim(self, name: str, keys: list, expires_at: float, now: float = None) -> list:
+        """
+        Start cooldown entries unless they are already running, in this
+        process and, for a shared cooldown, in the state store.
+
+        Returns:
+            [True if the entry was started], in the order of keys
+        """
+        now = now if now is not None else time.time()
+        self.expire(now)
+        started = [self.expiries.get((name, key), 0) <= now for key in keys]
+        free = [key for key, start in zip(keys, started) if start]
+        if free and self.state_store and name in self.shared:
+            claimed = iter(await asyncio.to_thread(
+                self.state_store.hset_if_expired_many, 'cooldowns', [f'{name}:{key}' for key in free], expires_at, now
+            ))
+            started = [start and next(claimed) for start in started]
+        for key, start in zip(keys, started):
+            if start:
+                self.remember(name, key, expires_at)
+            self.checks_total.inc(name, 'allowed' if start else 'limited')
+        return started
+
+    def set(self, name: str, key: str, expires_at: float):
+        """Put a key on cooldown until expires_at."""
+        if self.state_store and name in self.shared:
+            queue_store_write(self.state_store.hset, 'cooldowns', f'{name}:{key}', expires_at, logger=logger)
+        self.remember(name, key, expires_at)
+
+    def remember(self, name: str, key: str, expires_at: float):
+        """Put a key on cooldown in this process until expires_at."""
+        self.expiries[(name, key)] = expires_at
+        heapq.heappush(self.heap, (expires_at, name, key))
+        self.changed.add((name, key))
+
+    def clear(self, name: str, key: str):
+        """Take a key off cooldown (its heap entry is skipped when it comes up)."""
+        if self.expiries.pop((name, key), None) is not None:
+            self.changed.add((name, key))
+
+    def expire(self, now: float = None) -> int:
+        """
+        Drop the entries that have run out, oldest first.
+
+        Each entry is popped once, so this costs O(log n) per expired entry
+        no matter how many cooldowns are active.
+
+        Returns:
+            Number of entries removed
+        """
+        now = now if now is not None else time.time()
+        removed = 0
+        while self.heap and self.heap[0][0] <= now:
+            expiry, name, key = heapq.heappop(self.heap)
+            # Skip stale heap entries for keys that were cleared or set again
+            if self.expiries.get((name, key)) == expiry:
+                del self.expiries[(name, key)]
+                self.changed.add((name, key))
+                removed += 1
+        return removed
+
+    def load(self):
+        """Load the last snapshot, dropping entries that ran out meanwhile."""
+        now = time.time()
+        if self.state_store:
+            stored = self.state_store.hgetall('cooldowns')
+            entries = []
+            for field, expiry in stored.items():
+                name, _, key = field.partition(':')
+                entries.append((name, key, float(expiry)))
+        elif self.snapshot_file and os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, 'r') as f:
+                    data = json.load(f)
+                entries = [
+                    (name, key, float(expiry))
+                    for name, keys in data.items()
+                    for key, expiry in keys.items()
+                ]
+            except Exception as e:
+                logger.warning(f'Error loading cooldowns: {e}')
+                return
+        else:
+            return
+
+        for name, key, expiry in entries:
+            if expiry > now:
+                self.expiries[(name, key)] = expiry
+                self.heap.append((expiry, name, key))
+        heapq.heapify(self.heap)
+        logger.info(f'  Loaded {len(self.expiries)} active cooldowns')
+
+    def snapshot(self):
+        """Save the active cooldowns if anything changed since the last snapshot."""
+        self.expire()
+        if not self.changed:
+            return
+        changed, self.changed = self.changed, set()
+
+        if self.state_store:
+            # Only the entries that changed; expired and cleared ones are deleted
+            updated = {}
+            removed = []
+            for name, key in changed:
+                if name in self.shared:
+                    # Kept in the store by claim(); another process may hold a newer claim
+                    continue
+                field = f'{name}:{key}'
+                expiry = self.expiries.get((name, key))
+                if expiry is None:
+                    removed.append(field)
+                else:
+                    updated[field] = expiry
+            if updated:
+                queue_store_write(self.state_store.hset_many, 'cooldowns', updated, logger=logger)
+            if removed:
+                queue_store_write(self.state_store.hdel, 'cooldowns', *removed, logger=logger)
+        elif self.snapshot_file:
+            data = {}
+            for (name, key), expiry in self.expiries.items():
+                data.setdefault(name, {})[key] = expiry
+            write_json_file(self.snapshot_file, data, logger, indent=2)
+
+    async def run_snapshots(self):
+        """Snapshot the cooldowns every snapshot_interval seconds."""
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                self.snapshot()
+            except Exception as e:
+                logger.error(f'Error saving cooldowns: {e}')
+
+    def start(self):
+        """Start the periodic snapshot task on the running loop."""
+        self.snapshot_task = asyncio.create_task(self.run_snapshots())
+
+    def stop(self):
+        """Stop the snapshot task and save a final snapshot."""
+        if self.snapshot_task and not self.snapshot_task.done():
+            self.snapshot_task.cancel()
+        self.snapshot_task = None
+        try:
+            self.snapshot()
+        except Exception as e:
+            logger.error(f'Error saving cooldowns: {e}')
@@ -1,20 +1,62 @@
-"""Count command module - display nice count statistics."""
+"""Count command module - keeps the nice counts and displays the statistics."""
 
 import os
 import json
+import asyncio
 import discord
-from discord.ext import commands
-from collections import defaultdict
+from collections import Counter
+from discord.ext import commands, tasks
 from . import BaseModule
+from .events import NiceBackfilled, NiceDetected
+from .nice_counts import NiceCounter
+from .nice_history import GUILD, NiceHistory, load_history, sparkline
+from .leaderboard import Leaderboards, load_leaderboards
+
+# Most NiceDetected events applied per batch (and per counts file write)
+NICE_BATCH_SIZE = 500
 
 
 class CountModule(BaseModule):
-    """Module for the !count command to display nice statistics."""
+    """
+    Module for the !count command to display nice statistics.
+
+    It is the only writer of the nice counts, the hourly/daily history and the
+    per-user leaderboards, which it updates from the NiceDetected events that
+    nice_trigger publishes, a batch at a time, and from the NiceBackfilled
+    totals that nice_backfill finds in channel history.
+    """
+
+    state_attributes = ('nice_counts', 'nice_history', 'leaderboards', 'synced_guilds', 'synced_leaderboards')
 
     def __init__(self, bot: commands.Bot, config: dict, data_dir: str = "data"):
         super().__init__(bot, config, data_dir)
-        self.nice_counts = defaultdict(lambda: defaultdict(int))
+        self.nice_counts = NiceCounter()
         self.counts_file = os.path.join(data_dir, 'nice_counts.json')
+        # An --interactions endpoint gets no NiceDetected events (the gateway
+        # process counts into the shared state store), so it re-reads what a
+        # command shows every time: only the guild's or channel's entries
+        self.reread_per_command = config.get('interactions_endpoint', False)
+        self.synced_guilds = set()  # Guilds whose counts were read from the state store
+        self.load_counts()
+        # Hourly/daily counts for !count today/week/trend, saved every few minutes
+        self.history_file = os.path.join(data_dir, 'nice_history.bin')
+        self.history_snapshot_minutes = config.get('nice_history_snapshot_minutes', 5)
+        self.nice_history = (
+            NiceHistory() if self.reread_per_command
+            else load_history(self.history_file, self.state_store, self.logger)
+        )
+        # Per-user counts for !count top, saved with the history
+        self.leaderboards_file = os.path.join(data_dir, 'nice_users.bin')
+        self.leaderboards = (
+            Leaderboards() if self.state_store
+            else load_leaderboards(self.leaderboards_file, self.logger)
+        )
+        self.synced_leaderboards = set()  # Guilds whose user counts were read from the state store
+        # Store reads and writes take turns, so a slow read never overwrites newer counts
+        self.store_lock = asyncio.Lock()
+        self.top_cache = {}  # {server_id: (leaderboard, version, rendered lines)}
+        self.nice_subscription = None
+        self.backfill_subscription = None
 
     @property
     def name(self) -> str:
@@ -22,63 +64,263 @@ class CountModule(BaseModule):
 
     @property
     def description(self) -> str:
-        return "Display nice count statistics (!count)"
+        return "Display nice count statistics (!count, !count today/week/trend/top)"
 
     async def setup(self):
         """Set up the count module."""
-        self.load_counts()
-
         # Create wrapper function for the command
-        @commands.command(name='count')
-        async def count_cmd(ctx):
-            await self.count_command(ctx)
+        @commands.hybrid_command(name='count', description='Nice statistics: today, week, trend or top')
+        async def count_cmd(ctx, period: str = None):
+            if period is None:
+                await self.count_command(ctx)
+            elif period.lower() == 'top':
+                await self.top_command(ctx)
+            else:
+                await self.period_command(ctx, period.lower())
 
         # Add command to bot
         self.bot.add_command(count_cmd)
 
+        self.nice_subscription = self.subscribe(
+            NiceDetected, self.count_nice, batch_size=NICE_BATCH_SIZE, name='count.nice'
+        )
+        self.backfill_subscription = self.subscribe(
+            NiceBackfilled, self.count_backfill, batch_size=NICE_BATCH_SIZE, name='count.backfill'
+        )
+        self.save_snapshots.change_interval(minutes=self.history_snapshot_minutes)
+        self.save_snapshots.start()
+
         self.logger.info(f"✓ Loaded module: {self.name}")
 
     async def teardown(self):
         """Clean up the count module."""
+        if self.nice_subscription:
+            # Count the events still queued before saving
+            await self.events.unsubscribe(self.nice_subscription)
+            self.nice_subscription = None
+        if self.backfill_subscription:
+            await self.events.unsubscribe(self.backfill_subscription)
+            self.backfill_subscription = None
+        if self.save_snapshots.is_running():
+            self.save_snapshots.cancel()
         self.save_counts()
+        self.save_history()
+        self.save_leaderboards()
         self.bot.remove_command('count')
 
+    async def count_nice(self, events: list):
+        """Apply a batch of NiceDetected events to the counts, history and leaderboards."""
+        channel_hits = Counter()
+        user_hits = Counter()
+        for event in events:
+            self.nice_history.record(event.server_id, event.channel_id, now=event.timestamp)
+            channel_hits[(event.server_id, event.channel_id)] += 1
+            if event.server_id != 'DM':
+                user_hits[(event.server_id, event.user_id)] += 1
+
+        await self.add_counts(channel_hits, user_hits)
+
+    async def count_backfill(self, events: list):
+        """
+        Add a batch of NiceBackfilled totals to the counts and leaderboards.
+
+        Backfilled messages are spread over the channel's whole past, so the
+        hourly/daily history is left as is.
+        """
+        channel_hits = Counter()
+        user_hits = Counter()
+        for event in events:
+            channel_hits[(event.server_id, event.channel_id)] += event.count
+            for user_id, amount in event.user_counts.items():
+                user_hits[(event.server_id, user_id)] += amount
+        await self.add_counts(channel_hits, user_hits)
+
+    async def add_counts(self, channel_hits: Counter, user_hits: Counter):
+        """Add to the channel counts and leaderboards, and save the counts once."""
+        if self.state_store:
+            async with self.store_lock:
+                await self.add_store_counts(channel_hits, user_hits)
+            return
+
+        for (server_id, channel_id), amount in channel_hits.items():
+            self.nice_counts.increment(server_id, channel_id, amount)
+        for server_id, amounts in self.by_guild(user_hits).items():
+            self.leaderboards.add_counts(server_id, amounts)
+        # One write per batch
+        self.save_counts()
+
+    async def add_store_counts(self, channel_hits: Counter, user_hits: Counter):
+        """
+        Add a batch to the state store, in a worker thread and one round trip,
+        and keep the counts in memory in step with the values it returns.
+        """
+        unsynced = sorted({server_id for server_id, _ in channel_hits} - self.synced_guilds)
+        unsynced_users = sorted({server_id for server_id, _ in user_hits} - self.synced_leaderboards)
+        increments = [
+            (f'nice_counts:{server_id}', channel_id, amount) for (server_id, channel_id), amount in channel_hits.items()
+        ] + [
+            (f'nice_users:{server_id}', str(user_id), amount) for (server_id, user_id), amount in user_hits.items()
+        ]
+
+        def write():
+            # Guilds seen for the first time are read before the increments apply
+            stored = self.state_store.hgetall_many(
+                [f'nice_counts:{server_id}' for server_id in unsynced]
+                + [f'nice_users:{server_id}' for server_id in unsynced_users]
+            )
+            return stored, self.state_store.hincrby_many(increments)
+
+        stored, values = await asyncio.to_thread(write)
+
+        for server_id, counts in zip(unsynced, stored):
+            self.load_counts_of(server_id, counts)
+        for server_id, counts in zip(unsynced_users, stored[len(unsynced):]):
+            self.leaderboards.load_guild(server_id, counts)
+            self.synced_leaderboards.add(server_id)
+        values = iter(values)
+        for (server_id, channel_id), count in zip(channel_hits, values):
+            self.nice_counts.set_count(server_id, channel_id, count)
+        user_counts = dict(zip(user_hits, values))
+        for server_id, counts in self.by_guild(user_counts).items():
+            self.leaderboards.guild(server_id).set_counts(counts)
+
+    @staticmethod
+    def by_guild(user_hits: dict) -> dict:
+        """Group {(server_id, user_id): n} into {server_id: {user_id: n}}."""
+        grouped = {}
+        for (server_id, user_id), amount in user_hits.items():
+            grouped.setdefault(server_id, {})[user_id] = amount
+        return grouped
+
+    def load_counts_of(self, server_id: str, stored: dict):
+        """Set a guild's channel counts to the fields of the state store hash nice_counts:<server_id>."""
+        for channel_id, count in stored.items():
+            self.nice_counts.set_count(server_id, channel_id, int(count))
+        self.synced_guilds.add(server_id)
+
+    async def sync_counts(self, server_id: str, reread: bool = False):
+        """
+        Read a guild's channel counts from the state store, once (or again with reread).
+
+        A guild is only served by one worker process at a time, so after that
+        the values returned by each increment keep them current.
+        """
+        if server_id in self.synced_guilds and not reread:
+            return
+        async with self.store_lock:
+            if server_id not in self.synced_guilds or reread:
+                self.load_counts_of(server_id, await self.store_call('hgetall', f'nice_counts:{server_id}'))
+
+    async def sync_leaderboard(self, server_id: str, reread: bool = False):
+        """Read a guild's user counts from the state store, once or again (see sync_counts)."""
+        if server_id in self.synced_leaderboards and not reread:
+            return
+        async with self.store_lock:
+            if server_id not in self.synced_leaderboards or reread:
+                self.leaderboards.load_guild(server_id, await self.store_call('hgetall', f'nice_users:{server_id}'))
+                self.synced_leaderboards.add(server_id)
+
+    async def refresh_counts(self, server_id: str):
+        """Bring a guild's channel counts up to date before a command shows them."""
+        if self.state_store:
+            await self.sync_counts(server_id, reread=self.reread_per_command)
+
+    async def refresh_history(self, server_id: str, channel_id: str):
+        """
+        In endpoint mode, read the rings a command shows (the channel's and its
+        guild's) again, as of the counting process' last snapshot.
+        """
+        if self.reread_per_command and self.state_store:
+            fields = [f'{server_id}:{channel_id}', f'{server_id}:{GUILD}']
+            values = await self.store_call('hmget', 'nice_history', fields)
+            self.nice_history.load_store_fields(dict(zip(fields, values)))
+
+    async def refresh_leaderboard(self, server_id: str):
+        """Bring a guild's user counts up to date before a command shows them."""
+        if self.state_store:
+            await self.sync_leaderboard(server_id, reread=self.reread_per_command)
+
+    @tasks.loop(minutes=5)
+    async def save_snapshots(self):
+        """Periodically save the hourly/daily history and the leaderboards."""
+        self.save_history()
+        self.save_leaderboards()
+
     def load_counts(self):
-        """Load counts from file if it exists."""
+        """Load counts from file if it exists (or import it into the state store once)."""
+        if self.state_store:
+            # Counts are read from the state store per guild, on first use
+            self.migrate_counts()
+            return
+
         try:
             if os.path.exists(self.counts_file):
                 with open(self.counts_file, 'r') as f:
-                    data = json.load(f)
-                    # Convert string keys back to proper format
-                    self.nice_counts = defaultdict(lambda: defaultdict(int))
-                    for server_id, channels in data.items():
-                        for channel_id, count in channels.items():
-                            self.nice_counts[server_id][channel_id] = count
+                    self.nice_counts = NiceCounter.from_dict(json.load(f))
                 self.logger.info(f'Loaded counts from {self.counts_file}')
         except Exception as e:
             self.logger.warning(f'Error loading counts: {e}')
 
+    def migrate_counts(self):
+        """Add counts from the JSON file to the state store (first process to start only)."""
+        if not os.path.exists(self.counts_file) or not self.claim_migration('nice_counts'):
+            return
+        try:
+            with open(self.counts_file, 'r') as f:
+                data = json.load(f)
+            # Add rather than set, so counts made meanwhile by other workers are kept
+            for server_id, channels in data.items():
+                for channel_id, count in channels.items():
+                    self.state_store.hincrby(f'nice_counts:{server_id}', channel_id, count)
+            self.logger.info(f'Imported counts from {self.counts_file} into the state store')
+        except Exception as e:
+            self.logger.warning(f'Error importing counts: {e}')
+
     def save_counts(self):
         """Save counts to file."""
+        if self.state_store:
+            # Counts are written to the state store as they happen
+            return
+
         try:
-            with open(self.counts_file, 'w') as f:
-                json.dump(self.nice_counts, f, indent=2)
+            self.write_json(self.counts_file, self.nice_counts.to_dict(), indent=2)
         except Exception as e:
             self.logger.error(f'Error saving counts: {e}')
 
-    def increment_count(self, server_id: str, channel_id: str):
-        """Increment the nice count for a given server and channel."""
-        self.nice_counts[server_id][channel_id] += 1
-        self.save_counts()
+    def save_history(self):
+        """Save the history rings that changed since the last snapshot."""
+        if not self.nice_history.dirty:
+            return
+        dirty, self.nice_history.dirty = self.nice_history.dirty, set()
+        try:
+            if self.state_store:
+                self.store_write('hset_many', 'nice_history', self.nice_history.to_store_fields(dirty))
+            else:
+                self.write_bytes(self.history_file, self.nice_history.to_bytes())
+        except Exception as e:
+            self.logger.error(f'Error saving nice history: {e}')
+
+    def save_leaderboards(self):
+        """Save the per-user counts if they changed since the last snapshot."""
+        if self.state_store or not self.leaderboards.dirty:
+            # In the state store, user counts are written as they happen
+            return
+        self.leaderboards.dirty = False
+        try:
+            self.write_bytes(self.leaderboards_file, self.leaderboards.to_bytes())
+        except Exception as e:
+            self.logger.error(f'Error saving leaderboards: {e}')
 
     async def count_command(self, ctx):
         """Display nice count statistics for the current server and channel."""
         server_id = str(ctx.guild.id) if ctx.guild else 'DM'
         channel_id = str(ctx.channel.id)
 
-        # Get counts
-        channel_count = self.nice_counts[server_id][channel_id]
-        server_count = sum(self.nice_counts[server_id].values())
+        await self.refresh_counts(server_id)
+
+        # Get counts (kept up to date on every increment)
+        channel_count = self.nice_counts.count(server_id, channel_id)
+        server_count = self.nice_counts.total(server_id)
 
         # Create embed for nice formatting
         embed = discord.Embed(
@@ -100,16 +342,16 @@ class CountModule(BaseModule):
             )
 
             # Add breakdown by channel if there are multiple channels
-            if len(self.nice_counts[server_id]) > 1:
+            channels_counted = self.nice_counts.channel_count(server_id)
+            if channels_counted > 1:
+                # Top 10 channels
                 channel_breakdown = []
-                for ch_id, count in sorted(self.nice_counts[server_id].items(), key=lambda x: x[1], reverse=True):
+                for ch_id, count in self.nice_counts.top(server_id):
                     channel = ctx.guild.get_channel(int(ch_id))
                     channel_name = channel.name if channel else f"Channel {ch_id}"
                     channel_breakdown.append(f"#{channel_name}: {count}")
 
-                # Limit to top 10 channels
-                if len(channel_breakdown) > 10:
-                    channel_breakdown = channel_breakdown[:10]
+                if channels_counted > len(channel_breakdown):
                     channel_breakdown.append("...")
 
                 embed.add_field(
@@ -119,3 +361,103 @@ class CountModule(BaseModule):
                 )
 
         await ctx.send(embed=embed)
+
+    def format_change(self, current: int, previous: int) -> str:
+        """Describe the change from previous to current, e.g. '▲ 25% vs last week'."""
+        if previous == 0:
+            return "new this week" if current else "no change"
+        change = (current - previous) * 100 / previous
+        arrow = '▲' if change > 0 else '▼' if change < 0 else '='
+        return f"{arrow} {abs(change):.0f}% vs last week"
+
+    async def period_command(self, ctx, period: str):
+        """Handle !count today, !count week and !count trend."""
+        server_id = str(ctx.guild.id) if ctx.guild else 'DM'
+        channel_id = str(ctx.channel.id)
+        await self.refresh_history(server_id, channel_id)
+        history = self.nice_history
+
+        if period == 'today':
+            embed = discord.Embed(title="📊 Nice Statistics - Today", color=discord.Color.blue())
+            channel_today = history.today(server_id, channel_id)
+            embed.add_field(name="This Channel", value=f"**{channel_today}** nice{'s' if channel_today != 1 else ''}")
+            if ctx.guild:
+                server_today = history.today(server_id)
+                embed.add_field(name="This Server", value=f"**{server_today}** nice{'s' if server_today != 1 else ''}")
+            embed.set_footer(text="Since midnight")
+
+        elif period == 'week':
+            embed = discord.Embed(title="📊 Nice Statistics - Last 7 Days", color=discord.Color.blue())
+            scopes = [("This Channel", channel_id)]
+            if ctx.guild:
+                scopes.append(("This Server", GUILD))
+            for label, scope_id in scopes:
+                this_week, last_week = history.week(server_id, scope_id)
+                embed.add_field(
+                    name=label,
+                    value=f"**{this_week}** nice{'s' if this_week != 1 else ''}\n{self.format_change(this_week, last_week)}"
+                )
+
+        elif period == 'trend':
+            # The whole server in a guild, the channel itself in DMs
+            scope_id = GUILD if ctx.guild else channel_id
+            hours = history.hourly(server_id, scope_id, hours=24)
+            days = history.daily(server_id, scope_id, days=14)
+            embed = discord.Embed(
+                title="📈 Nice Trend" + (" - This Server" if ctx.guild else ""),
+                color=discord.Color.blue()
+            )
+            embed.add_field(
+                name=f"Last 24 hours ({sum(hours)} total, peak {max(hours)}/hour)",
+                value=f"`{sparkline(hours)}`",
+                inline=False
+            )
+            embed.add_field(
+                name=f"Last 14 days ({sum(days)} total, peak {max(days)}/day)",
+                value=f"`{sparkline(days)}`",
+                inline=False
+            )
+            embed.set_footer(text="Oldest on the left, now on the right")
+
+        else:
+            await ctx.send("❌ Usage: `!count`, `!count today`, `!count week`, `!count trend` or `!count top`")
+            return
+
+        await ctx.send(embed=embed)
+
+    def render_top(self, guild, board) -> list:
+        """Render the top users of a guild, reusing the last rendering until the top changes."""
+        server_id = str(guild.id)
+        cached = self.top_cache.get(server_id)
+        if cached and cached[0] is board and cached[1] == board.version:
+            return cached[2]
+
+        medals = {1: '🥇', 2: '🥈', 3: '🥉'}
+        lines = []
+        for user_id, count, rank in board.top():
+            member = guild.get_member(user_id)
+            name = member.display_name if member else f"User {user_id}"
+            lines.append(f"{medals.get(rank, f'**{rank}.**')} {name}: {count}")
+        self.top_cache[server_id] = (board, board.version, lines)
+        return lines
+
+    async def top_command(self, ctx):
+        """Handle !count top - the server's nice leaderboard and the caller's rank."""
+        if not ctx.guild:
+            await ctx.send("❌ The leaderboard only works in a server.")
+            return
+
+        server_id = str(ctx.guild.id)
+        await self.refresh_leaderboard(server_id)
+
+        board = self.leaderboards.guild(server_id)
+        lines = self.render_top(ctx.guild, board)
+
+        embed = discord.Embed(title="🏆 Nice Leaderboard", color=discord.Color.gold())
+        embed.description = "\n".join(lines) if lines else "Nobody has said nice yet!"
+
+        position = board.rank(ctx.author.id)
+        if position:
+            rank, count = position
+            embed.set_footer(text=f"You: #{rank} of {len(board)} with {count} nice{'s' if count != 1 else ''}")
+        await ctx.send(embed=embed)
@@ -0,0 +1,397 @@
+"""Custom triggers module - per-guild trigger rules that guild admins manage with !trigger."""
+
+import os
+import json
+import time
+import random
+import asyncio
+from discord.ext import commands
+from . import BaseModule
+from .state_versions import StateVersions
+from .trigger_matcher import TriggerMatcher, TriggerRule
+
+# Longest pattern, in characters
+MAX_PATTERN_LENGTH = 100
+# Discord's message length limit
+MAX_RESPONSE_LENGTH = 2000
+# Rules shown per page of !trigger list
+LIST_PAGE_SIZE = 15
+
+USAGE = (
+    "**Custom triggers** (Manage Server permission to change):\n"
+    "`!trigger add <pattern> => <response> | <response> ...` - Add a trigger\n"
+    "`!trigger remove <id>` - Remove a trigger\n"
+    "`!trigger cooldown <id> <seconds>` - Seconds between responses per channel\n"
+    "`!trigger channels <id> #channel ... | all` - Channels the trigger works in\n"
+    "`!trigger list [page]` - List this server's triggers"
+)
+
+
+class CustomTriggersModule(BaseModule):
+    """
+    Module for guild-defined triggers: a pattern, responses to pick from, a
+    cooldown and the channels it applies to.
+
+    Each guild's rules are compiled into one TriggerMatcher, so a message is
+    checked against all of them in a single pass. When a guild gets a new
+    pattern, its matcher is rebuilt in a worker thread and swapped in when
+    ready; other edits and removals update the current matcher in place.
+
+    Rule IDs are never reused within a guild, so a new rule doesn't inherit
+    the cooldowns of a removed one.
+    """
+
+    # Compiled matchers survive a reload, so triggers keep working through it
+    state_attributes = ('rules', 'next_ids', 'matchers', 'versions')
+
+    def __init__(self, bot, config: dict, data_dir: str = "data"):
+        super().__init__(bot, config, data_dir)
+        self.rules_file = os.path.join(data_dir, 'custom_triggers.json')
+        self.max_rules = config.get('custom_triggers_max_rules', 5000)
+        self.default_cooldown = config.get('custom_triggers_default_cooldown', 30)
+        self.rules = {}  # {server_id: {rule_id: TriggerRule}}
+        self.next_ids = {}  # {server_id: last rule ID handed out} (JSON mode; the state store keeps its own)
+        self.matchers = {}  # {server_id: TriggerMatcher}, replaced whole when rules change
+        self.versions = StateVersions(self.state_store, config)  # Of the guild rules read from the state store
+        self.stale_guilds = set()  # Guilds whose matcher needs a rebuild
+        self.compiling = None  # Guild whose matcher is being rebuilt
+        self.rebuild_task = None
+        # Rebuild a guild once removed rules' patterns outnumber the live ones
+        self.max_dead_ratio = 1
+        # Per rule and channel; each rule brings its own length
+        self.cooldown = self.declare_cooldown('custom_trigger', per='channel')
+        self.rebuilds_total = self.metrics.counter(
+            'nicebot_custom_trigger_rebuilds_total', 'Custom trigger matcher rebuilds'
+        )
+        self.rebuild_duration = self.metrics.histogram(
+            'nicebot_custom_trigger_rebuild_seconds', 'Time to compile a guild\'s custom triggers',
+            buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+        )
+        if not self.state_store:
+            self.load_rules()
+
+    @property
+    def name(self) -> str:
+        return "custom_triggers"
+
+    @property
+    def description(self) -> str:
+        return "Per-guild custom triggers (!trigger add/remove/list)"
+
+    async def setup(self):
+        """Set up the custom triggers module."""
+
+        @commands.hybrid_command(name='trigger', description="Manage this server's custom triggers")
+        async def trigger_cmd(ctx, action: str = None, *, args: str = None):
+            await self.trigger_command(ctx, (action or '').lower(), args or '')
+
+        self.bot.add_command(trigger_cmd)
+        self.add_message_listener(self.on_message)
+
+        # Matchers carried over by a reload are current; compile the rest
+        for server_id in self.rules:
+            if server_id not in self.matchers:
+                self.schedule_rebuild(server_id)
+
+        self.logger.info(f"✓ Loaded module: {self.name}")
+
+    async def teardown(self):
+        """Clean up the custom triggers module."""
+        self.remove_message_listener(self.on_message)
+        self.bot.remove_command('trigger')
+        if self.rebuild_task and not self.rebuild_task.done():
+            # Let the rebuild in flight finish, so its matcher isn't lost
+            await self.rebuild_task
+
+    async def on_message(self, message):
+        """Respond to the first custom trigger of the guild the message hits."""
+        if message.author == self.bot.user or message.guild is None:
+            return
+
+        server_id = str(message.guild.id)
+        await self.refresh_rules(server_id)
+        matcher = self.matchers.get(server_id)
+        if matcher is None:
+            return
+
+        channel_id = str(message.channel.id)
+        for rule in matcher.matches(message.content.lower()):
+            if not rule.applies_in(channel_id):
+                continue
+            if rule.cooldown and not self.cooldown.service.acquire(
+                self.cooldown.name, f'{rule.rule_id}:{channel_id}', time.time() + rule.cooldown
+            ):
+                continue
+            await self.send_trigger_response(
+                message.channel, random.choice(rule.responses), coalesce_key=f'custom:{rule.rule_id}'
+            )
+            return
+
+    # --- Compiling --------------------------------------------------------
+
+    def schedule_rebuild(self, server_id: str):
+        """Recompile a guild's matcher in the background (changes made meanwhile are picked up too)."""
+        self.stale_guilds.add(server_id)
+        if self.rebuild_task is None or self.rebuild_task.done():
+            self.rebuild_task = asyncio.create_task(self.rebuild_stale())
+
+    async def rebuild_stale(self):
+        """Compile the matchers of stale guilds one at a time, off the event loop."""
+        while self.stale_guilds:
+            server_id = self.stale_guilds.pop()
+            rules = list(self.rules.get(server_id, {}).values())
+            if not rules:
+                self.matchers.pop(server_id, None)
+                continue
+            start = time.perf_counter()
+            self.compiling = server_id
+            try:
+                matcher = await asyncio.to_thread(TriggerMatcher, rules)
+            except Exception as e:
+                self.logger.error(f'Error compiling custom triggers of guild {server_id}: {e}')
+                continue
+            finally:
+                self.compiling = None
+            self.rebuild_duration.observe(time.perf_counter() - start)
+            self.rebuilds_total.inc()
+            if server_id in self.stale_guilds:
+                # Changed again while compiling; the newer rules are compiled next
+                continue
+            self.matchers[server_id] = matcher
+
+    def update_matcher(self, server_id: str, rule_id: int, rule: TriggerRule = None):
+        """
+        Apply one rule change to a guild's matcher.
+
+        Removals and edits that keep the pattern reuse the compiled automaton;
+        anything else (or a guild that is already being rebuilt) schedules a
+        rebuild.
+        """
+        matcher = self.matchers.get(server_id)
+        if matcher is None or server_id in self.stale_guilds or server_id == self.compiling:
+            self.schedule_rebuild(server_id)
+            return
+        if server_id not in self.rules:
+            del self.matchers[server_id]
+            return
+        if rule is None:
+            matcher = matcher.without_rule(rule_id)
+            if matcher.dead_patterns > len(matcher) * self.max_dead_ratio:
+                self.schedule_rebuild(server_id)
+            self.matchers[server_id] = matcher
+            return
+        try:
+            self.matchers[server_id] = matcher.with_rule(rule)
+        except ValueError:
+            # New rule or new pattern
+            self.schedule_rebuild(server_id)
+
+    # --- Storage ----------------------------------------------------------
+
+    def load_rules(self):
+        """Load every guild's rules from custom_triggers.json."""
+        try:
+            if os.path.exists(self.rules_file):
+                with open(self.rules_file, 'r') as f:
+                    data = json.load(f)
+                for server_id, guild_data in data.items():
+                    # Older files map rule IDs to rules directly, without the ID counter
+                    rules = guild_data['rules'] if 'rules' in guild_data else guild_data
+                    self.rules[server_id] = {
+                        int(rule_id): TriggerRule.from_dict(int(rule_id), rule) for rule_id, rule in rules.items()
+                    }
+                    self.next_ids[server_id] = guild_data.get('next_id', max(self.rules[server_id], default=0))
+        except Exception as e:
+            self.logger.warning(f'Error loading custom triggers: {e}')
+
+    async def refresh_rules(self, server_id: str):
+        """
+        Read a guild's rules from the state store on first use, and again
+        once another process (e.g. a slash command endpoint) changed them.
+        """
+        key = f'custom_triggers:{server_id}'
+        if not self.versions.due(key):
+            return
+        try:
+            if await self.versions.changed(key):
+                await self.sync_rules(server_id)
+        except Exception as e:
+            self.logger.warning(f'Error loading custom triggers of guild {server_id}: {e}')
+
+    async def sync_rules(self, server_id: str):
+        """Read a guild's rules from the state store and apply the rules that differ."""
+        stored = await self.store_call('hgetall', f'custom_triggers:{server_id}')
+        rules = {int(rule_id): TriggerRule.from_dict(int(rule_id), json.loads(rule)) for rule_id, rule in stored.items()}
+        current = self.rules.get(server_id, {})
+        changed = [
+            rule_id for rule_id in current.keys() | rules.keys()
+            if rule_id not in current or rule_id not in rules or current[rule_id].to_dict() != rules[rule_id].to_dict()
+        ]
+        if rules:
+            self.rules[server_id] = rules
+        else:
+            self.rules.pop(server_id, None)
+        for rule_id in changed:
+            self.update_matcher(server_id, rule_id, rules.get(rule_id))
+
+    async def new_rule_id(self, server_id: str) -> int:
+        """Hand out the next rule ID of a guild (IDs of removed rules aren't reused)."""
+        highest = max(self.rules.get(server_id, {}), default=0)
+        if not self.state_store:
+            rule_id = max(self.next_ids.get(server_id, 0), highest) + 1
+            self.next_ids[server_id] = rule_id
+            return rule_id
+        rule_id = await self.store_call('hincrby', 'custom_trigger_ids', server_id, 1)
+        if rule_id <= highest:
+            # Rules stored before the counter existed
+            rule_id = await self.store_call('hincrby', 'custom_trigger_ids', server_id, highest + 1 - rule_id)
+        return rule_id
+
+    def save_rule(self, server_id: str, rule_id: int, rule: TriggerRule = None):
+        """Set (or with rule None, remove) one rule, in memory and in storage, and update the guild's matcher."""
+        rules = self.rules.setdefault(server_id, {})
+        if rule is None:
+            rules.pop(rule_id, None)
+        else:
+            rules[rule_id] = rule
+        if not rules:
+            del self.rules[server_id]
+
+        if self.state_store:
+            if rule is None:
+                self.store_write('hdel', f'custom_triggers:{server_id}', str(rule_id))
+            else:
+                self.store_write('hset', f'custom_triggers:{server_id}', str(rule_id), json.dumps(rule.to_dict()))
+            self.versions.bump(f'custom_triggers:{server_id}')
+        else:
+            try:
+                # Guilds without rules left keep their counter
+                self.write_json(self.rules_file, {
+                    guild_id: {
+                        'next_id': max(self.next_ids.get(guild_id, 0), max(self.rules.get(guild_id, {}), default=0)),
+                        'rules': {str(rule_id): rule.to_dict() for rule_id, rule in self.rules.get(guild_id, {}).items()},
+                    }
+                    for guild_id in self.rules.keys() | self.next_ids.keys()
+                }, indent=2)
+            except Exception as e:
+                self.logger.error(f'Error saving custom triggers: {e}')
+        self.update_matcher(server_id, rule_id, rule)
+
+    # --- Commands ---------------------------------------------------------
+
+    async def trigger_command(self, ctx, action: str, args: str):
+        """Handle !trigger add/remove/cooldown/channels/list."""
+        if not ctx.guild:
+            await ctx.send("❌ Custom triggers only work in a server.")
+            return
+        server_id = str(ctx.guild.id)
+        await self.refresh_rules(server_id)
+
+        if action == 'list':
+            await self.list_command(ctx, server_id, args)
+            return
+        if action not in ('add', 'remove', 'cooldown', 'channels'):
+            await ctx.send(USAGE)
+            return
+        if not ctx.channel.permissions_for(ctx.author).manage_guild:
+            await ctx.send("❌ You need the Manage Server permission to change custom triggers.")
+            return
+
+        if action == 'add':
+            await self.add_command(ctx, server_id, args)
+            return
+
+        rule_id, _, rest = args.strip().partition(' ')
+        rule = self.rules.get(server_id, {}).get(int(rule_id)) if rule_id.isdigit() else None
+        if rule is None:
+            await ctx.send(f"❌ There's no trigger `{rule_id or '?'}` in this server. See `!trigger list`.")
+            return
+
+        if action == 'remove':
+            self.save_rule(server_id, rule.rule_id)
+            await ctx.send(f"✅ Removed trigger `{rule.rule_id}` (**{rule.pattern}**).")
+        elif action == 'cooldown':
+            try:
+                seconds = float(rest)
+            except ValueError:
+                await ctx.send("❌ Usage: `!trigger cooldown <id> <seconds>`")
+                return
+            if seconds < 0:
+                await ctx.send("❌ The cooldown can't be negative.")
+                return
+            self.save_rule(server_id, rule.rule_id, TriggerRule(
+                rule.rule_id, rule.pattern, rule.responses, seconds, rule.channels
+            ))
+            await ctx.send(f"✅ Trigger `{rule.rule_id}` responds at most every **{seconds:g}s** per channel.")
+        else:
+            channels = parse_channels(rest)
+            if channels is None:
+                await ctx.send("❌ Usage: `!trigger channels <id> #channel ...` or `!trigger channels <id> all`")
+                return
+            self.save_rule(server_id, rule.rule_id, TriggerRule(
+                rule.rule_id, rule.pattern, rule.responses, rule.cooldown, channels
+            ))
+            where = ', '.join(f'<#{channel_id}>' for channel_id in channels) if channels else 'every channel'
+            await ctx.send(f"✅ Trigger `{rule.rule_id}` works in {where}.")
+
+    async def add_command(self, ctx, server_id: str, args: str):
+        """Handle !trigger add <pattern> => <response> | <response> ..."""
+        pattern, arrow, responses_text = args.partition('=>')
+        pattern = ' '.join(pattern.split()).lower()
+        responses = [response.strip() for response in responses_text.split('|') if response.strip()]
+        if not arrow or not pattern or not responses:
+            await ctx.send("❌ Usage: `!trigger add <pattern> => <response> | <response> ...`")
+            return
+        if len(pattern) > MAX_PATTERN_LENGTH:
+            await ctx.send(f"❌ Patterns can be at most {MAX_PATTERN_LENGTH} characters.")
+            return
+        if any(len(response) > MAX_RESPONSE_LENGTH for response in responses):
+            await ctx.send(f"❌ Responses can be at most {MAX_RESPONSE_LENGTH} characters.")
+            return
+
+        rules = self.rules.get(server_id, {})
+        if len(rules) >= self.max_rules:
+            await ctx.send(f"❌ This server already has {len(rules)} triggers (the most allowed).")
+            return
+        rule_id = await self.new_rule_id(server_id)
+        self.save_rule(server_id, rule_id, TriggerRule(rule_id, pattern, responses, self.default_cooldown))
+        await ctx.send(
+            f"✅ Added trigger `{rule_id}`: **{pattern}** → {len(responses)} response{'s' if len(responses) != 1 else ''}"
+            f" ({self.default_cooldown:g}s cooldown per channel)."
+        )
+
+    async def list_command(self, ctx, server_id: str, args: str):
+        """Handle !trigger list [page]."""
+        rules = sorted(self.rules.get(server_id, {}).values(), key=lambda rule: rule.rule_id)
+        if not rules:
+            await ctx.send("This server has no custom triggers yet. Add one with `!trigger add <pattern> => <response>`.")
+            return
+        pages = (len(rules) + LIST_PAGE_SIZE - 1) // LIST_PAGE_SIZE
+        page = min(max(int(args) if args.strip().isdigit() else 1, 1), pages)
+        lines = [f"**Custom triggers** ({len(rules)}, page {page}/{pages}):"]
+        for rule in rules[(page - 1) * LIST_PAGE_SIZE:page * LIST_PAGE_SIZE]:
+            where = f" in {len(rule.channels)} channel{'s' if len(rule.channels) != 1 else ''}" if rule.channels else ''
+            lines.append(
+                f"`{rule.rule_id}` **{rule.pattern}** → {len(rule.responses)} response"
+                f"{'s' if len(rule.responses) != 1 else ''}, {rule.cooldown:g}s{where}"
+            )
+        await ctx.send('\n'.join(lines))
+
+
+def parse_channels(text: str):
+    """
+    Parse channel mentions or IDs ('all' for every channel).
+
+    Returns:
+        A list of channel IDs (empty for 'all'), or None if text isn't valid
+    """
+    words = text.split()
+    if words == ['all']:
+        return []
+    channels = []
+    for word in words:
+        channel_id = word.removeprefix('<#').removesuffix('>')
+        if not channel_id.isdigit():
+            return None
+        channels.append(channel_id)
+    return channels or None
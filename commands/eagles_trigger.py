@@ -3,7 +3,6 @@
 import os
 import json
 import time
-import random
 from . import BaseModule
 
 
@@ -12,12 +11,12 @@ class EaglesTriggerModule(BaseModule):
 
     def __init__(self, bot, config: dict, data_dir: str = "data"):
         super().__init__(bot, config, data_dir)
-        self.last_eagles_response = {}  # Dictionary: {channel_id: timestamp}
-        self.eagles_file = os.path.join(data_dir, 'eagles_timestamp.json')
-        self.responses_file = 'eagles_responses.json'  # In root directory
-        self.cooldown = config.get('eagles_cooldown', 600)  # Default 10 minutes
-        self.cleanup_days = config.get('eagles_cleanup_days', 7)  # Clean up after 7 days
-        self.eagles_responses = self.load_responses()
+        self.eagles_file = os.path.join(data_dir, 'eagles_timestamp.json')  # Before shared cooldowns
+        # Per-channel cooldown, default 10 minutes ('cooldowns' -> 'eagles' in config)
+        self.cooldown = self.declare_cooldown('eagles', seconds=config.get('eagles_cooldown', 600), per='channel')
+        # Both chant categories, dealt per channel without back-to-back repeats
+        self.responses = self.declare_responses('eagles', {'eagles': 1, 'anti-dallas': 1}, mode='shuffle')
+        self.import_legacy_timestamps()
 
     @property
     def name(self) -> str:
@@ -27,110 +26,37 @@ class EaglesTriggerModule(BaseModule):
     def description(self) -> str:
         return "Responds to 'eagles' with random Eagles chants (10-min cooldown)"
 
-    def load_responses(self) -> list:
-        """Load Eagles responses from JSON file in root directory."""
-        try:
-            if os.path.exists(self.responses_file):
-                with open(self.responses_file, 'r') as f:
-                    data = json.load(f)
-                    responses = [item['text'] for item in data.get('responses', [])]
-                    if responses:
-                        self.logger.info(f'Loaded {len(responses)} Eagles responses from {self.responses_file}')
-                        return responses
-        except Exception as e:
-            self.logger.warning(f'Error loading Eagles responses: {e}')
-
-        # Fallback to default responses if file doesn't exist or has errors
-        print(f'  Using default Eagles responses')
-        return [
-            'Go Birds!',
-            'da birds!',
-            'E.A.G.L.E.S',
-            'E-A-G-L-E-S EAGLES!',
-            'Fly Eagles Fly!',
-            'Bleed green!',
-            'Go Birds.',
-            'Bird Gang!',
-            'Gang Green!',
-            'Let\'s go Birds!',
-            'In Jalen we trust!',
-            'Philly Special!',
-            'It\'s a Philly thing!',
-            '🦅🦅🦅',
-            'Fuck Dallas!',
-            'Dallas sucks!',
-            'Cowgirls!',
-            'America\'s most overrated team!',
-            'Rent free in Dallas!',
-            'How bout them Cowboys? HAHAHAHA',
-            'Dallas ain\'t shit!',
-            'Poverty franchise!',
-            'BOOOO DALLAS!',
-        ]
-
     async def setup(self):
         """Set up the eagles trigger module."""
-        self.load_timestamp()
-        self.bot.add_listener(self.on_message, 'on_message')
+        self.add_message_listener(self.on_message)
         self.logger.info(f"✓ Loaded module: {self.name}")
 
     async def teardown(self):
         """Clean up the eagles trigger module."""
-        self.save_timestamp()
-        self.bot.remove_listener(self.on_message, 'on_message')
+        self.remove_message_listener(self.on_message)
 
-    def load_timestamp(self):
-        """Load eagles response timestamps from file if it exists."""
+    def import_legacy_timestamps(self):
+        """Carry over cooldowns still running from the old eagles_timestamp.json (or state store hash)."""
         try:
-            if os.path.exists(self.eagles_file):
+            if self.state_store:
+                stored = self.state_store.hgetall('eagles_cooldowns')
+            elif os.path.exists(self.eagles_file):
                 with open(self.eagles_file, 'r') as f:
-                    data = json.load(f)
-
-                    # Backward compatibility: detect old format {"last_response": timestamp}
-                    if 'last_response' in data and isinstance(data.get('last_response'), (int, float)):
-                        # Old global format - migrate to new format (empty dict)
-                        self.last_eagles_response = {}
-                        print(f'  Migrated eagles timestamp from global to per-channel format')
-                    else:
-                        # New per-channel format: {channel_id: timestamp}
-                        # Convert string keys back to integers
-                        self.last_eagles_response = {int(k): v for k, v in data.items()}
-                        print(f'  Loaded eagles timestamps for {len(self.last_eagles_response)} channels')
+                    stored = json.load(f)
+            else:
+                return
         except Exception as e:
             self.logger.warning(f'Error loading eagles timestamp: {e}')
-            self.last_eagles_response = {}
-
-    def cleanup_old_channels(self):
-        """Remove channel timestamps older than cleanup_days to prevent unbounded growth."""
-        current_time = time.time()
-        max_age_seconds = self.cleanup_days * 24 * 60 * 60
-
-        # Find channels to remove
-        channels_to_remove = [
-            channel_id for channel_id, timestamp in self.last_eagles_response.items()
-            if current_time - timestamp > max_age_seconds
-        ]
-
-        # Remove old channels
-        for channel_id in channels_to_remove:
-            del self.last_eagles_response[channel_id]
-
-        if channels_to_remove:
-            print(f'  Cleaned up {len(channels_to_remove)} old channel timestamps')
-
-    def save_timestamp(self):
-        """Save eagles response timestamps to file (per-channel format)."""
-        try:
-            # Clean up old channels before saving
-            self.cleanup_old_channels()
-
-            # Convert integer keys to strings for JSON serialization
-            data_to_save = {str(k): v for k, v in self.last_eagles_response.items()}
+            return
 
-            with open(self.eagles_file, 'w') as f:
-                json.dump(data_to_save, f, indent=2)
-        except Exception as e:
-            self.logger.error(f'Error saving eagles timestamp: {e}')
+        now = time.time()
+        for channel_id, timestamp in stored.items():
+            # The old global format {"last_response": timestamp} has no channels to carry over
+            if not channel_id.isdigit():
+                continue
+            expires_at = float(timestamp) + self.cooldown.seconds
+            if expires_at > now and not self.cooldown.remaining(channel_id):
+                self.cooldown.set(channel_id, expires_at)
 
     async def on_message(self, message):
         """Handle messages containing 'eagles' with per-channel cooldown."""
@@ -140,18 +66,8 @@ class EaglesTriggerModule(BaseModule):
 
         message_lower = message.content.lower()
 
-        # Check if the message contains "eagles" (case-insensitive)
-        if 'eagles' in message_lower:
-            current_time = time.time()
-            channel_id = message.channel.id
-
-            # Get last response time for this specific channel (default to 0 if never responded)
-            last_response_time = self.last_eagles_response.get(channel_id, 0)
-            time_since_last_response = current_time - last_response_time
-
-            # Only respond if cooldown has passed for this channel
-            if time_since_last_response >= self.cooldown:
-                self.last_eagles_response[channel_id] = current_time
-                self.save_timestamp()
-                response = random.choice(self.eagles_responses)
-                await message.channel.send(response)
+        # Respond to "eagles" (case-insensitive) once the channel's cooldown has passed
+        if 'eagles' in message_lower and self.cooldown.acquire(message):
+            response = self.responses.pick(message.channel)
+            if response:
+                await self.send_trigger_response(message.channel, response)
@@ -0,0 +1,248 @@
+"""Events - a typed in-process event bus for modules to cooperate through.
+
+Modules used to cooperate by sharing their mutable state (nice_trigger handed
+its counts to the count module, and both saved them). With the bus, a module
+publishes what happened (e.g. NiceDetected) and the module that owns the
+affected state subscribes to it, so every piece of state has one writer.
+
+publish() never awaits: the event is appended to each subscriber's queue and
+every subscription has its own task delivering its events in order. A
+subscriber can ask for batches, receiving lists of events instead of single
+events (whatever is queued when it runs, up to batch_size, optionally after
+waiting batch_interval seconds for more), so e.g. a counter can apply many
+events per write.
+"""
+
+import time
+import asyncio
+import inspect
+import logging
+from collections import deque
+from .metrics import NULL_REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class Event:
+    """Base class of bus events. Subscribers to an event class also receive its subclasses."""
+
+    __slots__ = ('timestamp',)
+
+    def __init__(self, timestamp: float = None):
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def __repr__(self):
+        fields = ', '.join(
+            f'{slot}={getattr(self, slot)!r}'
+            for cls in reversed(type(self).__mro__) for slot in getattr(cls, '__slots__', ())
+        )
+        return f'{type(self).__name__}({fields})'
+
+
+class NiceDetected(Event):
+    """A message containing 'nice' was seen."""
+
+    __slots__ = ('server_id', 'channel_id', 'user_id')
+
+    def __init__(self, server_id: str, channel_id: str, user_id: int, timestamp: float = None):
+        super().__init__(timestamp)
+        self.server_id = server_id  # Guild ID, or 'DM'
+        self.channel_id = channel_id
+        self.user_id = user_id
+
+
+class NiceBackfilled(Event):
+    """Nice messages found in a chunk of a channel's history by !backfill."""
+
+    __slots__ = ('server_id', 'channel_id', 'count', 'user_counts')
+
+    def __init__(self, server_id: str, channel_id: str, count: int, user_counts: dict, timestamp: float = None):
+        super().__init__(timestamp)
+        self.server_id = server_id
+        self.channel_id = channel_id
+        self.count = count
+        self.user_counts = user_counts  # {user_id: nice messages}
+
+
+class QuoteAdded(Event):
+    """A quote was added to the collection."""
+
+    __slots__ = ('quote',)
+
+    def __init__(self, quote: dict, timestamp: float = None):
+        super().__init__(timestamp)
+        self.quote = quote
+
+
+class ChatCompleted(Event):
+    """A !chat prompt got a reply from OpenAI."""
+
+    __slots__ = ('user_id', 'model', 'duration')
+
+    def __init__(self, user_id: str, model: str, duration: float, timestamp: float = None):
+        super().__init__(timestamp)
+        self.user_id = user_id
+        self.model = model
+        self.duration = duration  # Seconds spent waiting for the API
+
+
+class BackupFinished(Event):
+    """A backup run finished (scheduled or !backup)."""
+
+    __slots__ = ('success', 'targets', 'duration')
+
+    def __init__(self, success: bool, targets: list, duration: float, timestamp: float = None):
+        super().__init__(timestamp)
+        self.success = success
+        self.targets = targets  # Names of the targets backed up to
+        self.duration = duration
+
+
+class Subscription:
+    """One handler subscribed to one event type, with its own queue and delivery task."""
+
+    def __init__(self, bus, event_type: type, handler, name: str, batch_size: int,
+                 batch_interval: float, max_pending: int):
+        self.bus = bus
+        self.event_type = event_type
+        self.handler = handler
+        self.name = name
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.wakeup = asyncio.Event()
+        self.idle = asyncio.Event()  # Set while nothing is queued or being delivered
+        self.idle.set()
+        self.dropped = 0
+        self.task = None
+
+    def put(self, event: Event):
+        if self.max_pending and len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            self.bus.dropped_total.inc(self.name)
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f'Event queue of {self.name} is full, dropped {self.dropped} event(s)')
+            return
+        self.pending.append(event)
+        self.idle.clear()
+        self.wakeup.set()
+
+    async def run(self):
+        """Deliver queued events to the handler, in order, until cancelled."""
+        while True:
+            if not self.pending:
+                self.idle.set()
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            if self.batch_size:
+                if self.batch_interval and len(self.pending) < self.batch_size:
+                    await asyncio.sleep(self.batch_interval)
+                count = min(self.batch_size, len(self.pending))
+                await self.deliver([self.pending.popleft() for _ in range(count)])
+            else:
+                await self.deliver(self.pending.popleft())
+
+    async def deliver(self, item):
+        try:
+            result = self.handler(item)
+            if inspect.isawaitable(result):
+                await result
+        except Exception:
+            self.bus.errors_total.inc(self.name)
+            logger.exception(f'Error in event handler {self.name}')
+
+
+class EventBus:
+    """Delivers published events to the handlers subscribed to their type."""
+
+    def __init__(self, metrics=NULL_REGISTRY):
+        self.subscriptions = {}  # {event type: [Subscription]}
+        self.published_total = metrics.counter(
+            'nicebot_events_published_total', 'Events published on the event bus', ('event',)
+        )
+        self.errors_total = metrics.counter(
+            'nicebot_event_handler_errors_total', 'Event handler calls that raised', ('subscriber',)
+        )
+        self.dropped_total = metrics.counter(
+            'nicebot_events_dropped_total', 'Events dropped because a subscriber queue was full', ('subscriber',)
+        )
+        metrics.gauge(
+            'nicebot_event_queue_depth', 'Events waiting for delivery, over all subscribers'
+        ).set_function(lambda: sum(len(sub.pending) for sub in self.all_subscriptions()))
+
+    def all_subscriptions(self) -> list:
+        return [sub for subs in self.subscriptions.values() for sub in subs]
+
+    def subscribe(self, event_type: type, handler, batch_size: int = 0, batch_interval: float = 0,
+                  max_pending: int = 10000, name: str = None) -> Subscription:
+        """
+        Subscribe a handler to an event type (and its subclasses). Must be called on the running loop.
+
+        Args:
+            event_type: Event class to receive
+            handler: Function or coroutine function taking an event (or, when
+                batched, a list of events)
+            batch_size: Deliver lists of up to this many events (0 = one event per call)
+            batch_interval: When batched, seconds to wait for more events before
+                delivering a batch that isn't full (0 = deliver what is queued)
+            max_pending: Events that may wait for this handler before new ones are dropped (0 = no limit)
+            name: Name for logs and metrics (defaults to the handler's qualified name)
+
+        Returns:
+            The Subscription, to pass to unsubscribe()
+        """
+        if not (isinstance(event_type, type) and issubclass(event_type, Event)):
+            raise TypeError(f'Can only subscribe to Event subclasses, not {event_type!r}')
+        subscription = Subscription(
+            self, event_type, handler, name or getattr(handler, '__qualname__', repr(handler)),
+            batch_size, batch_interval, max_pending,
+        )
+        subscription.task = asyncio.create_task(subscription.run())
+        self.subscriptions.setdefault(event_type, []).append(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription):
+        """Deliver the subscription's queued events, then stop it."""
+        subs = self.subscriptions.get(subscription.event_type, [])
+        if subscription in subs:
+            subs.remove(subscription)
+        if subscription.task and not subscription.task.done():
+            await subscription.idle.wait()
+            subscription.task.cancel()
+        subscription.task = None
+
+    def publish(self, event: Event) -> int:
+        """
+        Queue an event for every handler subscribed to its type. Never blocks.
+
+        Returns:
+            Number of subscriptions the event was queued for
+        """
+        self.published_total.inc(type(event).__name__)
+        queued = 0
+        for event_type in type(event).__mro__:
+            for subscription in self.subscriptions.get(event_type, ()):
+                subscription.put(event)
+                queued += 1
+            if event_type is Event:
+                break
+        return queued
+
+    async def drain(self):
+        """Wait until every queued event has been delivered (including events published meanwhile)."""
+        while True:
+            busy = [sub for sub in self.all_subscriptions() if not sub.idle.is_set()]
+            if not busy:
+                return
+            await asyncio.gather(*(sub.idle.wait() for sub in busy))
+
+    async def close(self):
+        """Deliver the queued events, then stop every delivery task (later events go nowhere)."""
+        await self.drain()
+        subscriptions = self.all_subscriptions()
+        self.subscriptions = {}
+        for subscription in subscriptions:
+            if subscription.task and not subscription.task.done():
+                subscription.task.cancel()
+            subscription.task = None
@@ -0,0 +1,197 @@
+"""Fan-out - paced delivery of one message to many channels.
+
+A broadcast to thousands of channels can't simply gather() a send per
+channel: discord.py would queue most of them in its rate limiter, Discord
+would start answering 429 Too Many Requests (for every request of the bot,
+including normal replies), and the event loop would be busy with the burst.
+
+FanoutScheduler sends from a small pool of workers, paced by a token bucket
+kept well below Discord's global limit, so normal traffic keeps its share.
+When Discord answers 429 anyway (counted by the send queue's RateLimitCounter
+or raised to us), the rate is halved and then creeps back up. Requests that
+failed for a temporary reason are retried with backoff; permanent failures
+(missing channel or permissions) are reported back to the caller.
+"""
+
+import time
+import asyncio
+import logging
+import discord
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress log lines while a job runs
+PROGRESS_INTERVAL = 10
+
+
+class FanoutResult:
+    """Outcome of one fan-out job."""
+
+    def __init__(self, name: str, total: int):
+        self.name = name
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.started = time.monotonic()
+        self.duration = 0.0
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.failed
+
+    def __str__(self):
+        return (
+            f'{self.name}: {self.sent}/{self.total} sent, {self.failed} failed, '
+            f'{self.retries} retries, {self.rate_limited} rate limited in {self.duration:.1f}s'
+        )
+
+
+class FanoutScheduler:
+    """Sends to many targets with bounded concurrency, adaptive pacing and retries."""
+
+    def __init__(self, metrics, rate_per_second: float = 20, concurrency: int = 8, max_retries: int = 3,
+                 send_queue=None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            metrics: Metrics registry
+            rate_per_second: Highest sends per second (Discord allows 50 per second in total)
+            concurrency: Sends in flight at once
+            max_retries: Attempts per target after the first, for temporary failures
+            send_queue: SendScheduler whose 429 count is watched, if any
+        """
+        self.max_rate = rate_per_second
+        self.rate = rate_per_second
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.send_queue = send_queue
+        self.tokens = 1.0
+        self.refilled_at = time.monotonic()
+        self.seen_rate_limits = 0
+        self.pace_lock = asyncio.Lock()
+        self.sends_total = metrics.counter(
+            'nicebot_fanout_sends_total', 'Fan-out sends by job and result', ('job', 'result')
+        )
+        self.pending_gauge = metrics.gauge(
+            'nicebot_fanout_pending', 'Fan-out targets not yet sent to', ('job',)
+        )
+        self.duration_histogram = metrics.histogram(
+            'nicebot_fanout_duration_seconds', 'Time to finish a fan-out job', ('job',),
+            buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 3600),
+        )
+        self.rate_gauge = metrics.gauge(
+            'nicebot_fanout_rate', 'Current fan-out send rate limit per second'
+        )
+
+    def slow_down(self):
+        """Halve the rate after a 429 (multiplicative decrease)."""
+        self.rate = max(self.max_rate / 16, self.rate / 2)
+        self.rate_gauge.set(self.rate)
+
+    async def pace(self):
+        """Wait for the token bucket to allow one more send."""
+        async with self.pace_lock:
+            if self.send_queue is not None and self.send_queue.rate_limited > self.seen_rate_limits:
+                # Discord answered 429 (to us or anyone else in this process) since the last send
+                self.seen_rate_limits = self.send_queue.rate_limited
+                self.slow_down()
+            while True:
+                now = time.monotonic()
+                self.tokens = min(1.0, self.tokens + (now - self.refilled_at) * self.rate)
+                self.refilled_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    # Additive increase back towards the configured rate
+                    self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        """Return how long to wait before retrying, or None if the error is permanent."""
+        if isinstance(error, (discord.Forbidden, discord.NotFound)):
+            return None
+        if isinstance(error, discord.RateLimited):
+            return error.retry_after
+        if isinstance(error, discord.HTTPException):
+            if error.status == 429:
+                retry_after = error.response.headers.get('Retry-After') if error.response is not None else None
+                return float(retry_after) if retry_after else 2.0 ** attempt
+            if error.status < 500:
+                return None
+        # Server errors, timeouts and connection errors
+        return 2.0 ** attempt
+
+    async def run(self, name: str, targets: list, send, on_failure=None) -> FanoutResult:
+        """
+        Send to every target.
+
+        Args:
+            name: Job name for logs and metrics (e.g. 'friday')
+            targets: Targets to send to (e.g. channels)
+            send: Async function(target) doing one send
+            on_failure: Function(target, error) called for targets that could not be sent to
+
+        Returns:
+            The FanoutResult
+        """
+        result = FanoutResult(name, len(targets))
+        queue = deque(targets)
+        self.pending_gauge.set(len(queue), name)
+        self.rate = self.max_rate
+        self.rate_gauge.set(self.rate)
+        if self.send_queue is not None:
+            self.seen_rate_limits = self.send_queue.rate_limited
+        logger.info(f'Fan-out {name}: sending to {len(targets)} target(s) at up to {self.max_rate:g}/s')
+
+        async def worker():
+            while queue:
+                target = queue.popleft()
+                attempt = 0
+                while True:
+                    await self.pace()
+                    try:
+                        await send(target)
+                    except Exception as e:
+                        delay = self.retry_delay(e, attempt)
+                        if isinstance(e, discord.RateLimited) or getattr(e, 'status', None) == 429:
+                            result.rate_limited += 1
+                            self.slow_down()
+                        if delay is None or attempt >= self.max_retries:
+                            result.failed += 1
+                            self.sends_total.inc(name, 'failed')
+                            if on_failure:
+                                on_failure(target, e)
+                            break
+                        attempt += 1
+                        result.retries += 1
+                        self.sends_total.inc(name, 'retried')
+                        await asyncio.sleep(delay)
+                    else:
+                        result.sent += 1
+                        self.sends_total.inc(name, 'sent')
+                        break
+                self.pending_gauge.set(len(queue), name)
+
+        async def report_progress():
+            while True:
+                await asyncio.sleep(PROGRESS_INTERVAL)
+                logger.info(
+                    f'Fan-out {name}: {result.done}/{result.total} done '
+                    f'({result.failed} failed, rate {self.rate:.1f}/s)'
+                )
+
+        progress = asyncio.create_task(report_progress())
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(targets)))))
+        finally:
+            progress.cancel()
+            result.duration = time.monotonic() - result.started
+            self.pending_gauge.set(len(queue), name)
+            self.duration_histogram.observe(result.duration, name)
+
+        logger.info(f'Fan-out {result}')
+        return result
@@ -2,21 +2,58 @@
 
 import os
 import json
+import time
+import asyncio
+import discord
 from datetime import datetime
-from discord.ext import commands
+from zoneinfo import ZoneInfo
+from discord.ext import commands, tasks
 from . import BaseModule
+from .fanout import FanoutScheduler
+from .state_versions import StateVersions
 
 
 class FridayModule(BaseModule):
-    """Module for the !friday command - only works on Fridays, once per channel."""
+    """
+    Module for the !friday command - only works on Fridays, once per channel.
+
+    With 'friday_broadcast_enabled', channels can also subscribe with
+    !friday subscribe to get the video every Friday at their guild's
+    broadcast time, sent to all of them through a paced fan-out.
+    """
+
+    # A broadcast in progress keeps running through a reload
+    state_attributes = ('subscriptions', 'guild_schedules', 'last_broadcasts', 'versions', 'broadcast_task')
 
     def __init__(self, bot, config: dict, data_dir: str = "data"):
         super().__init__(bot, config, data_dir)
-        self.usage_file = os.path.join(data_dir, 'friday_usage.json')
-        self.usage_data = {}  # {channel_id: "YYYY-MM-DD"}
-        self.cleanup_days = config.get('friday_cleanup_days', 30)
+        self.usage_file = os.path.join(data_dir, 'friday_usage.json')  # Before shared cooldowns
+        # Once per channel until midnight ('cooldowns' -> 'friday' in config), also
+        # across processes (the !friday command and the broadcast may run in different ones)
+        self.cooldown = self.declare_cooldown('friday', per='channel', reset='daily', shared=True)
         self.youtube_url = "https://www.youtube.com/watch?v=kfVsfOSbJY0"
-        self.load_usage()
+        self.import_legacy_usage()
+
+        # Scheduled broadcast (opt-in)
+        self.broadcast_enabled = config.get('friday_broadcast_enabled', False)
+        self.default_schedule = parse_schedule(
+            f"{config.get('friday_broadcast_time', '09:00')} {config.get('friday_broadcast_timezone') or ''}"
+        )
+        self.subscriptions_file = os.path.join(data_dir, 'friday_subscriptions.json')
+        self.subscriptions = {}  # {channel_id: guild_id}
+        self.guild_schedules = {}  # {guild_id: 'HH:MM' or 'HH:MM Area/City'}
+        self.last_broadcasts = {}  # {guild_id: local date of its last broadcast, 'YYYY-MM-DD'}
+        # Subscriptions and schedules can be changed by other processes (e.g. a slash command endpoint)
+        self.versions = StateVersions(self.state_store, config)
+        self.broadcast_task = None
+        self.fanout = FanoutScheduler(
+            self.metrics,
+            rate_per_second=config.get('friday_broadcast_rate', 20),
+            concurrency=config.get('friday_broadcast_concurrency', 8),
+            send_queue=getattr(bot, 'send_queue', None),
+        )
+        if self.broadcast_enabled:
+            self.load_subscriptions()
 
     @property
     def name(self) -> str:
@@ -30,66 +67,45 @@ class FridayModule(BaseModule):
         """Set up the Friday module."""
 
         # Create wrapper function for the command
-        @commands.command(name='friday')
-        async def friday_cmd(ctx):
-            await self.friday_command(ctx)
+        @commands.hybrid_command(name='friday', description="Friday video (Fridays only!), or manage the weekly broadcast")
+        async def friday_cmd(ctx, action: str = None, *, schedule: str = None):
+            if action is None:
+                await self.friday_command(ctx)
+            else:
+                await self.broadcast_command(ctx, action.lower(), schedule or '')
 
         # Add command to bot
         self.bot.add_command(friday_cmd)
 
+        if self.broadcast_enabled:
+            self.check_broadcasts.start()
+
         self.logger.info(f"✓ Loaded module: {self.name}")
 
     async def teardown(self):
         """Clean up the Friday module."""
-        self.save_usage()
+        if self.check_broadcasts.is_running():
+            self.check_broadcasts.cancel()
         self.bot.remove_command('friday')
 
-    def load_usage(self):
-        """Load Friday usage data from file if it exists."""
+    def import_legacy_usage(self):
+        """Carry over today's usage from the old friday_usage.json (or state store hash)."""
         try:
-            if os.path.exists(self.usage_file):
+            if self.state_store:
+                usage_data = self.state_store.hgetall('friday_usage')
+            elif os.path.exists(self.usage_file):
                 with open(self.usage_file, 'r') as f:
-                    self.usage_data = json.load(f)
-                print(f'  Loaded Friday usage data for {len(self.usage_data)} channels')
+                    usage_data = json.load(f)
+            else:
+                return
         except Exception as e:
             self.logger.warning(f'Error loading Friday usage: {e}')
-            self.usage_data = {}
-
-    def save_usage(self):
-        """Save Friday usage data to file."""
-        try:
-            # Clean up old entries before saving
-            self.cleanup_old_usage()
-
-            with open(self.usage_file, 'w') as f:
-                json.dump(self.usage_data, f, indent=2)
-        except Exception as e:
-            self.logger.error(f'Error saving Friday usage: {e}')
-
-    def cleanup_old_usage(self):
-        """Remove usage records older than cleanup_days to prevent unbounded growth."""
-        from datetime import timedelta
-
-        current_date = datetime.now()
-        cutoff_date = current_date - timedelta(days=self.cleanup_days)
-
-        # Find channels to remove
-        channels_to_remove = []
-        for channel_id, date_str in self.usage_data.items():
-            try:
-                usage_date = datetime.strptime(date_str, '%Y-%m-%d')
-                if usage_date < cutoff_date:
-                    channels_to_remove.append(channel_id)
-            except ValueError:
-                # Invalid date format, remove it
-                channels_to_remove.append(channel_id)
-
-        # Remove old channels
-        for channel_id in channels_to_remove:
-            del self.usage_data[channel_id]
+            return
 
-        if channels_to_remove:
-            print(f'  Cleaned up {len(channels_to_remove)} old Friday usage records')
+        today = self.get_friday_date()
+        for channel_id, date_str in usage_data.items():
+            if date_str == today and not self.cooldown.remaining(channel_id):
+                self.cooldown.set(channel_id, self.cooldown.expires_at(time.time()))
 
     def is_friday(self) -> bool:
         """Check if today is Friday."""
@@ -99,16 +115,6 @@ class FridayModule(BaseModule):
         """Get current date as YYYY-MM-DD string."""
         return datetime.now().strftime('%Y-%m-%d')
 
-    def has_used_today(self, channel_id: int) -> bool:
-        """Check if this channel has already used !friday today."""
-        today = self.get_friday_date()
-        return str(channel_id) in self.usage_data and self.usage_data[str(channel_id)] == today
-
-    def mark_used(self, channel_id: int):
-        """Mark this channel as having used !friday today."""
-        self.usage_data[str(channel_id)] = self.get_friday_date()
-        self.save_usage()
-
     def get_days_until_friday(self) -> int:
         """Calculate how many days until the next Friday."""
         current_day = datetime.now().weekday()  # Monday=0, Friday=4
@@ -123,6 +129,15 @@ class FridayModule(BaseModule):
         days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
         return days[datetime.now().weekday()]
 
+    def friday_message(self) -> str:
+        """Return the Friday video post."""
+        return (
+            "🎉 **It's Friday, Friday!** 🎉\n"
+            "Gotta get down on Friday! 🎵\n\n"
+            f"{self.youtube_url}\n\n"
+            "Everybody's lookin' forward to the weekend! 🎊"
+        )
+
     async def friday_command(self, ctx):
         """Handle the !friday command - posts Rebecca Black's Friday video."""
 
@@ -146,10 +161,8 @@ class FridayModule(BaseModule):
             await ctx.send(message)
             return
 
-        # Check if channel has already used it today
-        channel_id = ctx.channel.id
-
-        if self.has_used_today(channel_id):
+        # Check if channel has already used it today (and if not, mark it used)
+        if not await self.cooldown.claim(ctx):
             await ctx.send(
                 "⏸️ Hold up! This channel already got its Friday fix today!\n"
                 "Come back next Friday for more fun, fun, fun, fun! 😄"
@@ -157,13 +170,206 @@ class FridayModule(BaseModule):
             return
 
         # It's Friday and hasn't been used yet - post the video!
-        self.mark_used(channel_id)
+        await ctx.send(self.friday_message())
+
+    # --- Scheduled broadcast -------------------------------------------------
+
+    def load_subscriptions(self):
+        """Load subscribed channels, guild schedules and last broadcast dates."""
+        try:
+            if self.state_store:
+                self.subscriptions = self.state_store.hgetall('friday_subscriptions')
+                self.guild_schedules = self.state_store.hgetall('friday_schedules')
+                self.last_broadcasts = self.state_store.hgetall('friday_broadcasts')
+            elif os.path.exists(self.subscriptions_file):
+                with open(self.subscriptions_file, 'r') as f:
+                    data = json.load(f)
+                self.subscriptions = data.get('channels', {})
+                self.guild_schedules = data.get('schedules', {})
+                self.last_broadcasts = data.get('last_broadcasts', {})
+        except Exception as e:
+            self.logger.warning(f'Error loading Friday subscriptions: {e}')
+
+    async def refresh_subscriptions(self):
+        """Read the subscriptions and schedules again once another process changed them."""
+        if not self.versions.due('friday'):
+            return
+        try:
+            if await self.versions.changed('friday'):
+                self.subscriptions, self.guild_schedules = await self.store_call(
+                    'hgetall_many', ['friday_subscriptions', 'friday_schedules']
+                )
+        except Exception as e:
+            self.logger.warning(f'Error loading Friday subscriptions: {e}')
+
+    def save_subscriptions(self):
+        """Save everything to friday_subscriptions.json (the state store is written per change)."""
+        try:
+            self.write_json(self.subscriptions_file, {
+                'channels': self.subscriptions,
+                'schedules': self.guild_schedules,
+                'last_broadcasts': self.last_broadcasts,
+            }, indent=2)
+        except Exception as e:
+            self.logger.error(f'Error saving Friday subscriptions: {e}')
+
+    def update(self, attribute: str, hash_name: str, key: str, value: str = None):
+        """Set (or with value None, remove) one entry, in memory and in storage."""
+        entries = getattr(self, attribute)
+        if value is None:
+            entries.pop(key, None)
+        else:
+            entries[key] = value
+        if self.state_store:
+            if value is None:
+                self.store_write('hdel', hash_name, key)
+            else:
+                self.store_write('hset', hash_name, key, value)
+            if attribute != 'last_broadcasts':
+                # Broadcast dates only matter to the process serving the guild
+                self.versions.bump('friday')
+        else:
+            self.save_subscriptions()
+
+    def subscribe_channel(self, channel_id: str, guild_id: str):
+        self.update('subscriptions', 'friday_subscriptions', channel_id, guild_id)
+
+    def unsubscribe_channel(self, channel_id: str):
+        self.update('subscriptions', 'friday_subscriptions', channel_id)
+
+    def schedule_for(self, guild_id: str) -> tuple:
+        """Return a guild's (HH:MM, ZoneInfo or None for the bot's local time)."""
+        spec = self.guild_schedules.get(guild_id)
+        return parse_schedule(spec) if spec else self.default_schedule
+
+    def due_guilds(self) -> list:
+        """Return [(guild_id, local date)] of the guilds whose broadcast time has come today."""
+        due = []
+        for guild_id in set(self.subscriptions.values()):
+            # Only guilds this process serves (in cluster mode, each worker sends to its own)
+            if self.bot.get_guild(int(guild_id)) is None:
+                continue
+            broadcast_time, zone = self.schedule_for(guild_id)
+            now = datetime.now(zone)
+            today = now.strftime('%Y-%m-%d')
+            if now.weekday() == 4 and now.strftime('%H:%M') >= broadcast_time and self.last_broadcasts.get(guild_id) != today:
+                due.append((guild_id, today))
+        return due
+
+    @tasks.loop(minutes=1)
+    async def check_broadcasts(self):
+        """Start a broadcast to the guilds whose time has come (one broadcast at a time)."""
+        if self.broadcast_task and not self.broadcast_task.done():
+            return
+        await self.refresh_subscriptions()
+        due = self.due_guilds()
+        if due:
+            self.broadcast_task = asyncio.create_task(self.run_broadcast(due))
+
+    async def run_broadcast(self, due: list):
+        """Send the Friday video to every subscribed channel of the due guilds."""
+        for guild_id, today in due:
+            self.update('last_broadcasts', 'friday_broadcasts', guild_id, today)
+        guild_ids = {guild_id for guild_id, _ in due}
+
+        channels = []
+        for channel_id, guild_id in list(self.subscriptions.items()):
+            if guild_id not in guild_ids:
+                continue
+            channel = self.bot.get_channel(int(channel_id))
+            if channel is None:
+                # The guild is here but the channel is gone
+                self.unsubscribe_channel(channel_id)
+                continue
+            channels.append(channel)
+
+        # Channels that already had their !friday today are left alone (and vice versa)
+        claimed = await self.cooldown.claim_many([str(channel.id) for channel in channels])
+        skipped = claimed.count(False)
+        channels = [channel for channel, claim in zip(channels, claimed) if claim]
+
+        if skipped:
+            self.logger.info(f'Friday broadcast: {skipped} channel(s) already had the video today')
+        if channels:
+            await self.fanout.run('friday', channels, self.send_broadcast, on_failure=self.broadcast_failed)
+
+    async def send_broadcast(self, channel):
+        await channel.send(self.friday_message())
+
+    def broadcast_failed(self, channel, error: Exception):
+        """Unsubscribe channels the bot can no longer post in."""
+        if isinstance(error, (discord.Forbidden, discord.NotFound)):
+            self.unsubscribe_channel(str(channel.id))
+            self.logger.info(f'Unsubscribed #{channel.name} ({channel.id}) from the Friday broadcast: {error}')
+        else:
+            self.logger.warning(f'Friday broadcast to {channel.id} failed: {error}')
+
+    async def broadcast_command(self, ctx, action: str, schedule: str):
+        """Handle !friday subscribe, !friday unsubscribe and !friday time."""
+        if action not in ('subscribe', 'unsubscribe', 'time'):
+            await ctx.send("❌ Usage: `!friday`, `!friday subscribe`, `!friday unsubscribe` or `!friday time HH:MM [timezone]`")
+            return
+        if not self.broadcast_enabled:
+            await ctx.send("❌ The Friday broadcast isn't enabled on this bot.")
+            return
+        if not ctx.guild:
+            await ctx.send("❌ The Friday broadcast only works in a server.")
+            return
+        if not ctx.channel.permissions_for(ctx.author).manage_channels:
+            await ctx.send("❌ You need the Manage Channels permission to change the Friday broadcast.")
+            return
+
+        guild_id = str(ctx.guild.id)
+        channel_id = str(ctx.channel.id)
+        await self.refresh_subscriptions()
+
+        if action == 'time':
+            spec = schedule.strip()
+            try:
+                broadcast_time, zone = parse_schedule(spec)
+            except ValueError as e:
+                await ctx.send(f"❌ {e}\nExample: `!friday time 09:00 America/New_York`")
+                return
+            self.update('guild_schedules', 'friday_schedules', guild_id, spec)
+            await ctx.send(f"✅ The Friday broadcast goes out at **{describe_schedule(broadcast_time, zone)}**.")
+            return
+
+        if action == 'subscribe':
+            self.subscribe_channel(channel_id, guild_id)
+            broadcast_time, zone = self.schedule_for(guild_id)
+            await ctx.send(
+                f"✅ This channel gets the Friday video every Friday at **{describe_schedule(broadcast_time, zone)}**. 🎉"
+            )
+        else:
+            self.unsubscribe_channel(channel_id)
+            await ctx.send("✅ This channel no longer gets the Friday broadcast.")
+
+
+def parse_schedule(spec: str) -> tuple:
+    """
+    Parse 'HH:MM' or 'HH:MM Area/City'.
+
+    Returns:
+        (HH:MM zero-padded, ZoneInfo or None for the bot's local time)
+
+    Raises:
+        ValueError: If the time or timezone is invalid
+    """
+    parts = spec.split()
+    if not parts or len(parts) > 2:
+        raise ValueError("Give a time as HH:MM, optionally followed by a timezone.")
+    try:
+        parsed = datetime.strptime(parts[0], '%H:%M')
+    except ValueError:
+        raise ValueError(f"`{parts[0]}` isn't a time like 09:00.")
+    zone = None
+    if len(parts) == 2:
+        try:
+            zone = ZoneInfo(parts[1])
+        except Exception:
+            raise ValueError(f"`{parts[1]}` isn't a known timezone (e.g. America/New_York).")
+    return parsed.strftime('%H:%M'), zone
 
-        message = (
-            "🎉 **It's Friday, Friday!** 🎉\n"
-            "Gotta get down on Friday! 🎵\n\n"
-            f"{self.youtube_url}\n\n"
-            "Everybody's lookin' forward to the weekend! 🎊"
-        )
 
-        await ctx.send(message)
+def describe_schedule(broadcast_time: str, zone) -> str:
+    return f"{broadcast_time} {zone.key}" if zone else f"{broadcast_time} (bot time)"
@@ -0,0 +1,189 @@
+"""Interactions - serve slash commands from Discord's HTTP interactions endpoint.
+
+Instead of receiving slash commands over the gateway, Discord can POST them to
+an "Interactions Endpoint URL" set in the Developer Portal. Every request is
+signed with the application's Ed25519 key, and the reply goes back in the HTTP
+response or through the REST API, so a process serving them needs no gateway
+connection (and no shards): any number of them can run behind a load
+balancer, sharing state through the state store.
+
+InteractionsServer verifies each request, answers PINGs, acknowledges a
+command at once (Discord shows "thinking...") and hands it to bot.tree, the
+same hybrid command handlers the gateway path runs. Replies then go out as
+follow-up messages.
+"""
+
+import json
+import time
+import logging
+import discord
+from aiohttp import web
+from .metrics import NULL_REGISTRY
+
+logger = logging.getLogger(__name__)
+
+try:
+    from nacl.signing import VerifyKey
+    from nacl.exceptions import BadSignatureError
+    NACL_AVAILABLE = True
+except ImportError:
+    NACL_AVAILABLE = False
+
+# Interaction types Discord sends
+PING = 1
+APPLICATION_COMMAND = 2
+
+# Interaction response types we answer with
+PONG = 1
+DEFERRED_CHANNEL_MESSAGE = 5
+
+# discord.py has no public API for an interaction that arrives over HTTP, so
+# dispatch_deferred() uses two of its internals. This is the newest release
+# interactions_replay.py was run against (requirements.txt pins below the next).
+LATEST_TESTED_DISCORD = (2, 7)
+
+
+def check_discord_support():
+    """
+    Make sure this discord.py has the internals dispatch_deferred() uses.
+
+    Raises:
+        RuntimeError: If they are missing (a discord.py release that changed them)
+    """
+    missing = [
+        name for name, present in (
+            ('InteractionResponse._response_type', '_response_type' in getattr(discord.InteractionResponse, '__slots__', ())),
+            ('CommandTree._from_interaction', hasattr(discord.app_commands.CommandTree, '_from_interaction')),
+        ) if not present
+    ]
+    latest = '.'.join(map(str, LATEST_TESTED_DISCORD))
+    if missing:
+        raise RuntimeError(
+            f"The interactions endpoint doesn't support discord.py {discord.__version__} "
+            f"(missing {', '.join(missing)}); install discord.py {latest}"
+        )
+    if (discord.version_info.major, discord.version_info.minor) > LATEST_TESTED_DISCORD:
+        logger.warning(
+            f'discord.py {discord.__version__} is newer than the interactions endpoint was tested with '
+            f'({latest}); run interactions_replay.py to check it'
+        )
+
+
+def dispatch_deferred(bot, interaction: discord.Interaction):
+    """
+    Run a command interaction that was already deferred in the HTTP response.
+
+    Marks the interaction as answered, so the command's replies become
+    follow-ups, and hands it to bot.tree the way an INTERACTION_CREATE from
+    the gateway is.
+    """
+    interaction.response._response_type = discord.InteractionResponseType.deferred_channel_message
+    bot.tree._from_interaction(interaction)
+
+
+class SignatureVerifier:
+    """Checks the Ed25519 signature Discord puts on every interaction request."""
+
+    def __init__(self, public_key: str, max_age: float = 300):
+        """
+        Initialize the verifier.
+
+        Args:
+            public_key: The application's public key (hex, from the Developer Portal)
+            max_age: Seconds a request's timestamp may be off by before it is
+                rejected as a replay (0 = don't check)
+
+        Raises:
+            RuntimeError: If PyNaCl isn't installed
+            ValueError: If the public key isn't a hex Ed25519 key
+        """
+        if not NACL_AVAILABLE:
+            raise RuntimeError('PyNaCl is required for the interactions endpoint (pip install PyNaCl)')
+        self.key = VerifyKey(bytes.fromhex(public_key))
+        self.max_age = max_age
+
+    def verify(self, signature: str, timestamp: str, body: bytes) -> bool:
+        """Return whether a request (its X-Signature-Ed25519/-Timestamp headers and raw body) is genuine."""
+        if self.max_age:
+            try:
+                if abs(time.time() - int(timestamp)) > self.max_age:
+                    return False
+            except ValueError:
+                return False
+        try:
+            self.key.verify(timestamp.encode() + body, bytes.fromhex(signature))
+        except (BadSignatureError, ValueError):
+            return False
+        return True
+
+
+class InteractionsServer:
+    """Local aiohttp server receiving signed interaction requests for a bot."""
+
+    def __init__(self, bot, public_key: str, host: str = '127.0.0.1', port: int = 8080,
+                 path: str = '/interactions', max_age: float = 300, metrics=NULL_REGISTRY):
+        check_discord_support()
+        self.bot = bot
+        self.verifier = SignatureVerifier(public_key, max_age)
+        self.host = host
+        self.port = port
+        self.path = path
+        self.runner = None
+        self.requests_total = metrics.counter(
+            'nicebot_interactions_total', 'Interaction requests by type and result', ('type', 'result')
+        )
+
+    def app(self) -> web.Application:
+        """Return the aiohttp application (also used to replay recorded requests)."""
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_interaction)
+        return app
+
+    async def start(self):
+        """Start serving the endpoint."""
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info(f'✓ Interactions endpoint listening on http://{self.host}:{self.port}{self.path}')
+
+    async def stop(self):
+        """Stop the server."""
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def handle_interaction(self, request):
+        body = await request.read()
+        signature = request.headers.get('X-Signature-Ed25519', '')
+        timestamp = request.headers.get('X-Signature-Timestamp', '')
+        if not self.verifier.verify(signature, timestamp, body):
+            # Discord sends requests with bad signatures on purpose and expects a 401
+            self.requests_total.inc('unknown', 'rejected')
+            return web.Response(status=401, text='invalid request signature')
+
+        try:
+            payload = json.loads(body)
+            kind = payload['type']
+        except (ValueError, KeyError, TypeError):
+            self.requests_total.inc('unknown', 'invalid')
+            return web.Response(status=400, text='invalid interaction')
+
+        if kind == PING:
+            self.requests_total.inc('ping', 'ok')
+            return web.json_response({'type': PONG})
+
+        if kind == APPLICATION_COMMAND:
+            try:
+                interaction = discord.Interaction(data=payload, state=self.bot._connection)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f'Invalid application command interaction: {e}')
+                self.requests_total.inc('command', 'invalid')
+                return web.Response(status=400, text='invalid interaction')
+            # The deferral goes back in this response
+            dispatch_deferred(self.bot, interaction)
+            self.requests_total.inc('command', 'ok')
+            return web.json_response({'type': DEFERRED_CHANNEL_MESSAGE})
+
+        # Components and autocomplete aren't used by any module
+        self.requests_total.inc(str(kind), 'unsupported')
+        return web.Response(status=400, text='unsupported interaction type')
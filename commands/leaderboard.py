@@ -0,0 +1,261 @@
+"""Leaderboard - per-user nice counts per guild, ranked as they change.
+
+A guild can have hundreds of thousands of members, so users are kept in flat
+integer arrays instead of dicts of objects (about 32 bytes per user). Users
+are held in an array ordered by count, highest first. Users with the same count
+form a contiguous block, and because counts mostly go up by one, a user moves
+up by swapping places with the first user of their block.
+
+Costs, for a guild of n users:
+- a count going up by one, a rank lookup and a top-N read are constant time
+  (plus an O(log n) bisect to find the user)
+- a user's first count inserts them into the sorted ID arrays, O(n) (a
+  memmove of the arrays, which stays cheap for a few hundred thousand users)
+- a rise of k <= TOP_N is k steps; a bigger jump (a backfilled chunk, or a
+  count read from the state store) re-sorts the guild once, O(n log n)
+"""
+
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from .byteorder import from_little_endian, to_little_endian
+
+# Users shown by !count top; increments inside the top change the leaderboard version
+TOP_N = 10
+
+SNAPSHOT_MAGIC = b'NLBD'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sHI')  # magic, version, guild count
+GUILD_HEADER = struct.Struct('<HI')  # length of server ID, user count
+
+
+class Leaderboard:
+    """Nice counts of the users of one guild, with ranks."""
+
+    def __init__(self):
+        self.ids = array('Q')  # {slot: user ID}
+        self.counts = array('I')  # {slot: count}
+        self.order = array('I')  # Slots by count, highest first
+        self.pos = array('I')  # {slot: position in order}
+        self.sorted_ids = array('Q')  # User IDs in ascending order, for bisect lookups
+        self.sorted_slots = array('I')  # Slot of each user ID in sorted_ids
+        self.block_start = {}  # {count: position in order of the first user with that count}
+        # Bumped whenever the top TOP_N changes, so a rendered leaderboard can be cached
+        self.version = 0
+
+    @classmethod
+    def from_counts(cls, counts: dict):
+        """Build a leaderboard from {user_id: count}."""
+        board = cls()
+        for user_id in sorted(counts):
+            board.ids.append(user_id)
+            board.counts.append(counts[user_id])
+        board.sorted_ids = array('Q', board.ids)
+        board.sorted_slots = array('I', range(len(board.ids)))
+        board.rebuild()
+        return board
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def slot(self, user_id: int, create: bool = False):
+        """Return a user's slot (adding the user with a count of 0 if create is set)."""
+        i = bisect_left(self.sorted_ids, user_id)
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == user_id:
+            return self.sorted_slots[i]
+        if not create:
+            return None
+
+        slot = len(self.ids)
+        self.ids.append(user_id)
+        self.counts.append(0)
+        self.sorted_ids.insert(i, user_id)
+        self.sorted_slots.insert(i, slot)
+        # Count 0 sorts last
+        if 0 not in self.block_start:
+            self.block_start[0] = len(self.order)
+        self.pos.append(len(self.order))
+        self.order.append(slot)
+        return slot
+
+    def count(self, user_id: int) -> int:
+        slot = self.slot(user_id)
+        return self.counts[slot] if slot is not None else 0
+
+    def increment(self, user_id: int, amount: int = 1) -> int:
+        """Add to a user's count and return the new count."""
+        slot = self.slot(user_id, create=True)
+        self.set_count(user_id, self.counts[slot] + amount)
+        return self.counts[slot]
+
+    def set_count(self, user_id: int, count: int):
+        """Set a user's count (e.g. the value the shared state store returned)."""
+        self.set_counts({user_id: count})
+
+    def add_counts(self, amounts: dict):
+        """Add to the counts of several users at once ({user_id: amount})."""
+        self.set_counts({user_id: self.count(user_id) + amount for user_id, amount in amounts.items()})
+
+    def set_counts(self, counts: dict):
+        """
+        Set the counts of several users at once ({user_id: count}).
+
+        Small rises step users up their blocks; if any count jumps by more
+        than TOP_N (a backfilled chunk, say) or goes down, all are set and the
+        leaderboard is re-sorted once instead.
+        """
+        slots = {user_id: self.slot(user_id, create=True) for user_id in counts}
+        if all(0 <= count - self.counts[slots[user_id]] <= TOP_N for user_id, count in counts.items()):
+            for user_id, count in counts.items():
+                slot = slots[user_id]
+                for _ in range(count - self.counts[slot]):
+                    self.step(slot)
+            return
+        for user_id, count in counts.items():
+            self.counts[slots[user_id]] = count
+        self.rebuild()
+
+    def step(self, slot: int):
+        """Add one to a slot's count, moving it to the front of its count block."""
+        count = self.counts[slot]
+        position = self.pos[slot]
+        start = self.block_start[count]
+
+        # Swap with the first user of the block
+        other = self.order[start]
+        self.order[start] = slot
+        self.order[position] = other
+        self.pos[slot] = start
+        self.pos[other] = position
+
+        # The old block now starts one later (or is gone)
+        if start + 1 < len(self.order) and self.counts[self.order[start + 1]] == count:
+            self.block_start[count] = start + 1
+        else:
+            del self.block_start[count]
+
+        # The user now ends the block of count + 1, which sits just before
+        self.counts[slot] = count + 1
+        if count + 1 not in self.block_start:
+            self.block_start[count + 1] = start
+
+        if start < TOP_N:
+            self.version += 1
+
+    def rank(self, user_id: int):
+        """
+        Return a user's (rank, count); users with the same count share a rank.
+
+        Returns:
+            (rank, count), or None if the user has no count
+        """
+        slot = self.slot(user_id)
+        if slot is None or not self.counts[slot]:
+            return None
+        count = self.counts[slot]
+        return self.block_start[count] + 1, count
+
+    def top(self, n: int = TOP_N) -> list:
+        """Return the top n users as [(user_id, count, rank)], highest first."""
+        entries = []
+        for slot in self.order[:n]:
+            count = self.counts[slot]
+            if not count:
+                break
+            entries.append((self.ids[slot], count, self.block_start[count] + 1))
+        return entries
+
+    def rebuild(self):
+        """Re-sort every user by count (after loading or an unusual change)."""
+        order = sorted(range(len(self.ids)), key=lambda slot: self.counts[slot], reverse=True)
+        self.order = array('I', order)
+        self.pos = array('I', bytes(4 * len(order)))
+        self.block_start = {}
+        for position, slot in enumerate(order):
+            self.pos[slot] = position
+            self.block_start.setdefault(self.counts[slot], position)
+        self.version += 1
+
+
+class Leaderboards:
+    """Leaderboards of every guild."""
+
+    def __init__(self):
+        self.guilds = {}  # {server_id: Leaderboard}
+        self.dirty = False  # Changed since the last snapshot
+
+    def guild(self, server_id: str) -> Leaderboard:
+        board = self.guilds.get(server_id)
+        if board is None:
+            board = self.guilds[server_id] = Leaderboard()
+        return board
+
+    def increment(self, server_id: str, user_id: int, amount: int = 1) -> int:
+        self.dirty = True
+        return self.guild(server_id).increment(user_id, amount)
+
+    def add_counts(self, server_id: str, amounts: dict):
+        """Add to the counts of several users of a guild ({user_id: amount})."""
+        self.dirty = True
+        self.guild(server_id).add_counts(amounts)
+
+    def load_guild(self, server_id: str, stored: dict):
+        """Replace a guild's user counts with the fields of the state store hash nice_users:<server_id>."""
+        self.guilds[server_id] = Leaderboard.from_counts(
+            {int(user_id): int(count) for user_id, count in stored.items()}
+        )
+
+    def to_bytes(self) -> bytes:
+        """Serialize every guild's user IDs and counts into the binary snapshot format."""
+        parts = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(self.guilds))]
+        for server_id, board in self.guilds.items():
+            server_bytes = server_id.encode()
+            parts.append(GUILD_HEADER.pack(len(server_bytes), len(board)))
+            parts.append(server_bytes)
+            parts.append(to_little_endian(board.ids))
+            parts.append(to_little_endian(board.counts))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """
+        Load a binary snapshot.
+
+        Raises:
+            ValueError: If the data isn't a leaderboard snapshot
+        """
+        leaderboards = cls()
+        magic, version, guild_count = SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError('not a leaderboard snapshot')
+
+        offset = SNAPSHOT_HEADER.size
+        for _ in range(guild_count):
+            server_length, user_count = GUILD_HEADER.unpack_from(data, offset)
+            offset += GUILD_HEADER.size
+            server_id = data[offset:offset + server_length].decode()
+            offset += server_length
+            ids = from_little_endian('Q', data[offset:offset + 8 * user_count])
+            offset += 8 * user_count
+            counts = from_little_endian('I', data[offset:offset + 4 * user_count])
+            offset += 4 * user_count
+            leaderboards.guilds[server_id] = Leaderboard.from_counts(dict(zip(ids, counts)))
+        return leaderboards
+
+
+def load_leaderboards(path: str, logger=None) -> Leaderboards:
+    """
+    Load leaderboards from the snapshot file.
+
+    Returns:
+        The saved leaderboards, or empty ones if there are none (or they can't be read)
+    """
+    try:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return Leaderboards.from_bytes(f.read())
+    except Exception as e:
+        if logger:
+            logger.warning(f'Error loading leaderboards: {e}')
+    return Leaderboards()
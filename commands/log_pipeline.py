@@ -0,0 +1,173 @@
+"""Log pipeline - queue-backed logging, JSON lines and sampling of noisy debug logs.
+
+Logging calls on the event loop only put the record on a queue. A
+QueueListener thread formats it and writes it to stdout, so a slow log
+consumer (e.g. a container log pipeline applying backpressure) can no longer
+stall the bot. If the queue fills up anyway, records are dropped and counted
+instead of blocking.
+
+Records carry the guild, channel and command being handled (taken from a
+context variable that the bot sets per event and command), which the JSON
+lines format includes as fields.
+"""
+
+import sys
+import copy
+import json
+import time
+import queue
+import logging
+import contextvars
+import logging.handlers
+from datetime import datetime, timezone
+
+# (guild_id, channel_id, command) for the event or command being handled
+log_context = contextvars.ContextVar('nicebot_log_context', default=(None, None, None))
+
+
+def set_log_context(source):
+    """
+    Tag log records of the current task with a message's or context's guild, channel and command.
+
+    Args:
+        source: Message or Context
+    """
+    guild = getattr(source, 'guild', None)
+    channel = getattr(source, 'channel', None)
+    command = getattr(source, 'command', None)
+    log_context.set((
+        guild.id if guild is not None else None,
+        channel.id if channel is not None else None,
+        command.qualified_name if command is not None else None,
+    ))
+
+
+class ContextFilter(logging.Filter):
+    """Copies the log context onto each record (runs in the logging task, before queueing)."""
+
+    def filter(self, record):
+        record.guild_id, record.channel_id, record.command = log_context.get()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """
+    Rate-limits DEBUG records per call site with a token bucket.
+
+    A hot path logging on every message would otherwise flood the queue. The
+    next record let through from a call site notes how many were suppressed.
+    """
+
+    def __init__(self, rate_per_second: float = 10):
+        super().__init__()
+        self.rate = rate_per_second
+        self.buckets = {}  # {(pathname, lineno): [tokens, last refill time, suppressed]}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate <= 0:
+            return True
+
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [self.rate, now, 0]
+        else:
+            bucket[0] = min(self.rate, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+
+        bucket[0] -= 1
+        if bucket[2] and isinstance(record.msg, str):
+            record.msg = f'{record.msg} ({bucket[2]} similar debug lines suppressed)'
+            bucket[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Merge the arguments now (they may change later), but leave formatting
+        # (including tracebacks) to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.dropped:
+                notice = logging.LogRecord(
+                    __name__, logging.WARNING, __file__, 0,
+                    f'Log queue was full, dropped {self.dropped} log records', None, None
+                )
+                self.queue.put_nowait(notice)
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def __init__(self, worker: str = None):
+        super().__init__()
+        self.worker = worker
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if self.worker is not None:
+            entry['worker'] = self.worker
+        for field in ('guild_id', 'channel_id', 'command'):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def start_queue_logging(formatter: logging.Formatter, level: int, queue_size: int = 10000,
+                        debug_rate_per_second: float = 10):
+    """
+    Route the root logger through a queue to a stdout handler on a background thread.
+
+    Args:
+        formatter: Formatter for the output lines
+        level: Root log level
+        queue_size: Records that may wait for the writer thread before new ones are dropped
+        debug_rate_per_second: DEBUG records allowed per call site per second (0 = unlimited)
+
+    Returns:
+        The started QueueListener (stop() it to flush the queue on exit)
+    """
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(level)
+    console_handler.setFormatter(formatter)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.setLevel(level)
+    queue_handler.addFilter(DebugSampler(debug_rate_per_second))
+    queue_handler.addFilter(ContextFilter())
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    root_logger.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, console_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,160 @@
+"""Loop watchdog - measures event loop lag and captures the stack of blocking calls.
+
+A heartbeat task on the event loop records when it last ran. A sampling
+thread checks that timestamp; when the loop hasn't run the heartbeat for
+longer than the stall threshold, some callback is blocking it, and the thread
+captures the loop thread's current stack to find out which one.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from . import BaseModule
+
+logger = logging.getLogger(__name__)
+
+
+class StallRecord:
+    """Aggregated stalls sharing one blocking location."""
+
+    def __init__(self, module: str, command: str, location: str, stack: str):
+        self.module = module
+        self.command = command
+        self.location = location
+        self.stack = stack
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class LoopWatchdog:
+    """Detects event loop stalls and attributes them to a module, command and source line."""
+
+    def __init__(self, metrics, threshold_seconds: float = 0.25, interval_seconds: float = 0.1):
+        """
+        Initialize the watchdog.
+
+        Args:
+            metrics: Metrics registry (lag histogram and stall counter)
+            threshold_seconds: Loop lag that counts as a stall
+            interval_seconds: How often the heartbeat runs
+        """
+        self.threshold_seconds = threshold_seconds
+        self.interval_seconds = interval_seconds
+        self.records = {}  # {location: StallRecord}
+        self.stall_count = 0
+        self.last_beat = time.monotonic()
+        self.loop_thread_id = None
+        self.pending_sample = None  # (module, command, location, stack) captured during the current stall
+        self.heartbeat_task = None
+        self.sampler_thread = None
+        self.stop_event = threading.Event()
+        self.loop_lag = metrics.histogram(
+            'nicebot_event_loop_lag_seconds',
+            'How late the event loop runs a timer callback'
+        )
+        self.stalls_total = metrics.counter(
+            'nicebot_event_loop_stalls_total',
+            'Event loop stalls longer than the threshold, by module',
+            ('module',)
+        )
+
+    def start(self):
+        """Start the heartbeat on the running loop and the sampling thread."""
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stop_event.clear()
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
+        self.sampler_thread = threading.Thread(target=self.sample, name='nicebot-loop-watchdog', daemon=True)
+        self.sampler_thread.start()
+        logger.info(f'✓ Loop watchdog started (stall threshold: {self.threshold_seconds * 1000:.0f}ms)')
+
+    def stop(self):
+        """Stop the heartbeat and the sampling thread."""
+        self.stop_event.set()
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+
+    async def heartbeat(self):
+        """Wake up every interval and record how late the wake-up was."""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            now = time.monotonic()
+            lag = max(0.0, now - self.last_beat - self.interval_seconds)
+            self.last_beat = now
+            self.loop_lag.observe(lag)
+            if lag >= self.threshold_seconds:
+                self.record_stall(lag)
+            else:
+                self.pending_sample = None
+
+    def sample(self):
+        """Sampling thread: capture the loop thread's stack once per stall."""
+        check_interval = min(self.interval_seconds, self.threshold_seconds) / 2
+        while not self.stop_event.wait(check_interval):
+            blocked_for = time.monotonic() - self.last_beat - self.interval_seconds
+            if blocked_for < self.threshold_seconds or self.pending_sample is not None:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is not None:
+                self.pending_sample = self.describe(frame)
+
+    def describe(self, frame) -> tuple:
+        """
+        Work out who is blocking the loop from its current stack.
+
+        Returns:
+            (module, command, location, formatted stack)
+        """
+        stack = traceback.extract_stack(frame)
+        module = 'unknown'
+        location = f'{os.path.basename(stack[-1].filename)}:{stack[-1].lineno} in {stack[-1].name}'
+        command = None
+
+        current = frame
+        while current is not None:
+            f_locals = current.f_locals
+            # The innermost method of a module is the module's own blocking call
+            owner = f_locals.get('self')
+            if module == 'unknown' and isinstance(owner, BaseModule):
+                module = owner.name
+                code = current.f_code
+                location = f'{os.path.basename(code.co_filename)}:{current.f_lineno} in {code.co_name}'
+            # Commands are invoked with a Context local named ctx somewhere up the stack
+            ctx = f_locals.get('ctx')
+            if command is None and ctx is not None and getattr(ctx, 'command', None) is not None:
+                command = ctx.command.qualified_name
+            current = current.f_back
+
+        return module, command, location, ''.join(traceback.format_list(stack[-12:]))
+
+    def record_stall(self, lag: float):
+        """Count a finished stall against the stack sampled while it was happening."""
+        sample, self.pending_sample = self.pending_sample, None
+        if sample is None:
+            # Too short for the sampler to catch; we know the length but not the culprit
+            sample = ('unknown', None, 'unknown (not sampled)', '')
+        module, command, location, stack = sample
+
+        record = self.records.get(location)
+        if record is None:
+            record = self.records[location] = StallRecord(module, command, location, stack)
+        record.count += 1
+        record.total_seconds += lag
+        record.max_seconds = max(record.max_seconds, lag)
+        self.stall_count += 1
+        self.stalls_total.inc(module)
+
+        command_text = f' (!{command})' if command else ''
+        logger.warning(
+            f'Event loop blocked for {lag * 1000:.0f}ms by {module}{command_text} at {location}'
+            + (f'\n{stack}' if stack else '')
+        )
+
+    def top_records(self, limit: int = 10) -> list:
+        """Return the stall locations with the most total blocked time."""
+        return sorted(self.records.values(), key=lambda record: record.total_seconds, reverse=True)[:limit]
@@ -0,0 +1,226 @@
+"""Memstats - memory profiles for discord.py's caches and an estimate of where memory goes.
+
+discord.py keeps the last messages, guilds, channels and (depending on the
+intents and member cache flags) members in memory, and the modules keep
+their own dicts. A memory profile ('memory_profile') caps the discord.py
+side; the functions below estimate what every cache and module holds, for
+!memstats.
+
+Sizes are approximate: objects are walked with sys.getsizeof, large
+containers through an evenly spaced sample of their items scaled up to the
+full length, and objects shared with another cache are counted once.
+Objects of other libraries (discord.py models inside a module's state, for
+instance) are counted without what they reference.
+"""
+
+import os
+import sys
+import types
+import asyncio
+import logging
+import threading
+import itertools
+import tracemalloc
+from collections import defaultdict, deque
+from array import array
+import discord
+
+# Client options per profile; 'trim_intents' keeps only the intents a module needs
+MEMORY_PROFILES = {
+    'default': {},
+    'small': {
+        'max_messages': 100,
+        'member_cache': False,
+        'chunk_guilds_at_startup': False,
+        'trim_intents': True,
+    },
+    'minimal': {
+        'max_messages': None,
+        'member_cache': False,
+        'chunk_guilds_at_startup': False,
+        'trim_intents': True,
+    },
+}
+
+# Items measured per container before the rest is extrapolated
+SAMPLE_SIZE = 64
+# How deep a walk goes below the object it starts at
+MAX_DEPTH = 8
+
+# Types whose contents are counted
+CONTAINER_MODULES = ('builtins', 'collections', 'array')
+# Never measured: code, loops, threads, loggers and the like
+SKIP_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    asyncio.AbstractEventLoop, asyncio.Future, threading.Thread, logging.Logger, discord.Client,
+)
+ATOMIC_TYPES = (str, bytes, bytearray, int, float, complex, bool, type(None), array)
+
+
+def client_options(config: dict) -> dict:
+    """
+    Return the discord.py client options for the configured memory profile.
+
+    Args:
+        config: Configuration dictionary ('memory_profile', and 'max_messages'
+            to override the profile's message cache size)
+
+    Raises:
+        ValueError: If the profile doesn't exist
+    """
+    name = config.get('memory_profile', 'default')
+    profile = MEMORY_PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"'memory_profile' must be one of {', '.join(MEMORY_PROFILES)}, not {name!r}")
+
+    if profile.get('trim_intents'):
+        # Guilds (channels and permissions), messages and their content; no
+        # module uses reactions, typing, voice states, invites and the rest
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_messages = True
+        intents.dm_messages = True
+    else:
+        intents = discord.Intents.default()
+    intents.message_content = True  # Required to read message content
+
+    options = {'intents': intents}
+    if 'max_messages' in config or 'max_messages' in profile:
+        options['max_messages'] = config.get('max_messages', profile.get('max_messages'))
+    if profile.get('member_cache') is False:
+        options['member_cache_flags'] = discord.MemberCacheFlags.none()
+    if 'chunk_guilds_at_startup' in profile:
+        options['chunk_guilds_at_startup'] = profile['chunk_guilds_at_startup']
+    return options
+
+
+def approximate_size(obj, seen: set, depth: int = 0, foreign_depth: int = 0) -> int:
+    """
+    Estimate the bytes held by obj and what it references.
+
+    Args:
+        obj: Object to measure
+        seen: IDs of objects counted already (shared between calls, so
+            nothing is counted twice)
+        depth: Current depth of the walk
+        foreign_depth: Depth down to which objects of other libraries are walked
+            into too (e.g. 1 for the discord.py objects in a cache)
+    """
+    if id(obj) in seen or isinstance(obj, SKIP_TYPES):
+        return 0
+    size = sys.getsizeof(obj, 0)
+    module = type(obj).__module__
+    if not (module in CONTAINER_MODULES or module.startswith('commands') or depth <= foreign_depth):
+        # Another library's object: its own size only, and it stays unseen so
+        # the cache it belongs to (e.g. a channel's guild) still counts it
+        return size
+    seen.add(id(obj))
+    if isinstance(obj, ATOMIC_TYPES) or depth >= MAX_DEPTH:
+        return size
+
+    if isinstance(obj, dict):
+        children = iter(obj.items())
+        length = len(obj)
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        children = iter(obj)
+        length = len(obj)
+    else:
+        values = list(getattr(obj, '__dict__', {}).values())
+        if hasattr(obj, '__dict__'):
+            size += sys.getsizeof(obj.__dict__, 0)
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, '__slots__', ()):
+                if isinstance(slot, str) and hasattr(obj, slot):
+                    values.append(getattr(obj, slot))
+        children = iter(values)
+        length = len(values)
+
+    def measure(child):
+        if isinstance(obj, dict):
+            # A (key, value) pair; the tuple itself is only made for the walk
+            return sum(approximate_size(item, seen, depth + 1, foreign_depth) for item in child)
+        return approximate_size(child, seen, depth + 1, foreign_depth)
+
+    if length <= SAMPLE_SIZE:
+        return size + sum(measure(child) for child in children)
+    sampled = list(itertools.islice(children, 0, None, length // SAMPLE_SIZE))
+    return size + sum(measure(child) for child in sampled) * length // len(sampled)
+
+
+def discord_cache_sizes(bot, seen: set) -> list:
+    """Return [(cache, items, approximate bytes)] of discord.py's caches."""
+    state = bot._connection
+    guilds = list(state._guilds.values())
+    # Guilds and messages reference the other caches, so they come last and
+    # only count what isn't in those
+    caches = [
+        ('channels', [channel for guild in guilds for channel in guild._channels.values()]),
+        ('threads', [thread for guild in guilds for thread in guild._threads.values()]),
+        ('members', [member for guild in guilds for member in guild._members.values()]),
+        ('roles', [role for guild in guilds for role in guild._roles.values()]),
+        ('users', list(state._users.values())),
+        ('emojis & stickers', list(state._emojis.values()) + list(state._stickers.values())),
+        ('messages', list(state._messages or ())),
+        ('guilds', guilds),
+    ]
+    # The lists are only made for the walk, so their own size is left out
+    return [
+        (name, len(items), approximate_size(items, seen, foreign_depth=1) - sys.getsizeof(items, 0))
+        for name, items in caches
+    ]
+
+
+def module_sizes(modules: dict, shared: list, seen: set) -> list:
+    """
+    Return [(module, approximate bytes)] of the modules' own state.
+
+    Args:
+        modules: {name: module instance}
+        shared: Objects modules hold but don't own (bot services, config)
+        seen: IDs of objects counted already
+    """
+    for service in shared:
+        seen.add(id(service))
+    return [(name, approximate_size(module, seen)) for name, module in modules.items()]
+
+
+def traced_by_origin(limit: int = 10) -> list:
+    """
+    Return [(origin, bytes)] of the memory tracemalloc saw allocated, by
+    module file or library, largest first (empty if tracemalloc is off).
+    """
+    if not tracemalloc.is_tracing():
+        return []
+    totals = defaultdict(int)
+    for stat in tracemalloc.take_snapshot().statistics('filename'):
+        filename = stat.traceback[0].filename
+        parts = filename.replace(os.sep, '/').split('/')
+        if 'commands' in parts:
+            origin = 'commands/' + parts[-1]
+        elif 'site-packages' in parts:
+            origin = parts[parts.index('site-packages') + 1]
+        else:
+            origin = parts[-1]
+        totals[origin] += stat.size
+    return sorted(totals.items(), key=lambda item: -item[1])[:limit]
+
+
+def process_rss() -> int:
+    """Return the process' resident memory in bytes (peak RSS where /proc isn't available)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def format_bytes(size: int) -> str:
+    """Return a size in bytes as B/KiB/MiB/GiB."""
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GiB'
+
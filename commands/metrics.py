@@ -0,0 +1,331 @@
+"""Metrics - in-process counters, gauges and histograms served in Prometheus text format.
+
+Metrics are off by default. When 'metrics_enabled' is false, the bot and every
+module get NULL_REGISTRY, whose metrics are shared no-op objects, so recording
+a metric costs one method call that does nothing.
+"""
+
+import math
+import time
+import logging
+from bisect import bisect_left
+from collections import defaultdict
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from fast listeners up to slow API calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(labelnames: tuple, labelvalues: tuple, extra: str = '') -> str:
+    """Format label pairs as {name="value",...} (empty string if there are none)."""
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(labelnames, labelvalues)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value the way Prometheus expects."""
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base class for a named metric family with optional labels."""
+
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> list:
+        """Return the metric's lines in Prometheus text format."""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        lines.extend(self.render_samples())
+        return lines
+
+    def render_samples(self) -> list:
+        return []
+
+
+class Counter(Metric):
+    """Monotonically increasing count, e.g. command invocations."""
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values = defaultdict(float)  # {label values: count}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        """Add amount to the counter for the given label values."""
+        self.values[labelvalues] += amount
+
+    def render_samples(self) -> list:
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+            for labels, value in list(self.values.items())
+        ]
+
+
+class Gauge(Metric):
+    """Value that can go up and down, either set directly or read at scrape time."""
+
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values = {}  # {label values: value}
+        self.function = None
+
+    def set(self, value: float, *labelvalues):
+        """Set the gauge for the given label values."""
+        self.values[labelvalues] = value
+
+    def set_function(self, function):
+        """Read the gauge from function() at scrape time (unlabeled gauges only)."""
+        self.function = function
+
+    def render_samples(self) -> list:
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception as e:
+                logger.debug(f'Error reading gauge {self.name}: {e}')
+                return []
+            return [f'{self.name} {_format_value(value)}']
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+            for labels, value in list(self.values.items())
+        ]
+
+
+class Histogram(Metric):
+    """Distribution of observed values (latencies) in cumulative buckets."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # {label values: [per-bucket counts (last one is +Inf), sum, count]}
+        self.values = {}
+
+    def observe(self, value: float, *labelvalues):
+        """Record one observation for the given label values."""
+        series = self.values.get(labelvalues)
+        if series is None:
+            series = self.values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def time(self, *labelvalues):
+        """Context manager that observes the duration of its block."""
+        return _HistogramTimer(self, labelvalues)
+
+    def render_samples(self) -> list:
+        lines = []
+        for labels, (bucket_counts, total, count) in list(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), bucket_counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+class _HistogramTimer:
+    """Times a block of code into a histogram."""
+
+    def __init__(self, histogram: Histogram, labelvalues: tuple):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+        return False
+
+
+class OutboundCall:
+    """
+    Times one outbound HTTP/SDK call and counts it as ok or error.
+
+    An exception in the block counts as an error. Set call.error = True to
+    count a call that returned normally (e.g. an HTTP error status) as one.
+    """
+
+    def __init__(self, registry, service: str):
+        self.registry = registry
+        self.service = service
+        self.error = False
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        status = 'error' if exc_type is not None or self.error else 'ok'
+        self.registry.histogram(
+            'nicebot_outbound_request_duration_seconds',
+            'Latency of outbound HTTP/SDK calls',
+            ('service',)
+        ).observe(duration, self.service)
+        self.registry.counter(
+            'nicebot_outbound_requests_total',
+            'Outbound HTTP/SDK calls by result',
+            ('service', 'status')
+        ).inc(self.service, status)
+        return False
+
+
+class MetricsRegistry:
+    """Collection of named metrics. Asking for an existing name returns the same metric."""
+
+    enabled = True
+
+    def __init__(self):
+        self.metrics = {}  # {name: Metric}
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: tuple, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f'Metric {name} is already registered as a {metric.type_name}')
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        """Register (or look up) a counter."""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        """Register (or look up) a gauge."""
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        """Register (or look up) a histogram."""
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def track_call(self, service: str) -> OutboundCall:
+        """Context manager recording latency and result of an outbound call."""
+        return OutboundCall(self, service)
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format."""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class _NullMetric:
+    """Stands in for every metric (and timer) when metrics are disabled."""
+
+    error = False
+
+    def inc(self, *labelvalues, amount: float = 1):
+        pass
+
+    def set(self, value: float, *labelvalues):
+        pass
+
+    def set_function(self, function):
+        pass
+
+    def observe(self, value: float, *labelvalues):
+        pass
+
+    def time(self, *labelvalues):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class NullRegistry:
+    """Registry used when metrics are disabled; every metric is a shared no-op."""
+
+    enabled = False
+
+    def __init__(self):
+        self.null_metric = _NullMetric()
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()):
+        return self.null_metric
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()):
+        return self.null_metric
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        return self.null_metric
+
+    def track_call(self, service: str):
+        return self.null_metric
+
+    def render(self) -> str:
+        return ''
+
+
+NULL_REGISTRY = NullRegistry()
+
+
+def create_metrics(config: dict):
+    """
+    Create the metrics registry selected by 'metrics_enabled' in config.
+
+    Returns:
+        A MetricsRegistry, or NULL_REGISTRY when metrics are disabled
+    """
+    if config.get('metrics_enabled', False):
+        return MetricsRegistry()
+    return NULL_REGISTRY
+
+
+class MetricsServer:
+    """Local aiohttp server exposing the registry at /metrics."""
+
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def start(self):
+        """Start serving /metrics."""
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info(f'✓ Metrics server listening on http://{self.host}:{self.port}/metrics')
+
+    async def stop(self):
+        """Stop the server."""
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def handle_metrics(self, request):
+        return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8')
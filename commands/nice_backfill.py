@@ -0,0 +1,377 @@
+"""Nice backfill module - counts the nice messages from before the bot was counting.
+
+nice_counts.json only holds what the bot saw live, since it joined the guild
+(or since the file was lost). !backfill walks the history of the chosen
+channels up to a cutoff (when the bot joined, or a date given), matches
+messages with the same rule as nice_trigger, and hands what it finds to the
+count module as NiceBackfilled events, one chunk of messages at a time.
+
+Channels are scanned in parallel, at most 'nice_backfill_concurrency' at
+once, each pausing between pages of history so live traffic and Discord's
+rate limits come first; while the bot is shedding load, scanning waits.
+After every chunk the channel's position (the last message scanned) is
+saved, so a scan stopped by a restart or !backfill cancel continues where it
+left off.
+"""
+
+import os
+import json
+import asyncio
+import datetime
+import discord
+from collections import Counter
+from discord.ext import commands
+from . import BaseModule
+from .events import NiceBackfilled
+from .nice_trigger import is_nice
+from .overload import NORMAL
+from .custom_triggers import parse_channels
+
+# discord.py fetches history 100 messages per request
+PAGE_SIZE = 100
+# Seconds between checks while the bot is shedding load
+OVERLOAD_WAIT = 5
+
+
+class CountsUnavailable(Exception):
+    """The count module no longer takes counts (the bot is shutting down, or count was unloaded)."""
+
+
+USAGE = (
+    "**Nice backfill** (admin only):\n"
+    "`!backfill #channel ... [before YYYY-MM-DD]` - Count the nice messages in these channels' history\n"
+    "`!backfill all [before YYYY-MM-DD]` - Every channel the bot can read\n"
+    "`!backfill status` - Progress in this server\n"
+    "`!backfill cancel` - Stop scanning (run `!backfill` again to continue)\n"
+    "Messages from before the bot joined are counted, or from before the given date."
+)
+
+
+class BackfillJob:
+    """One channel's backfill, saved as its checkpoint."""
+
+    __slots__ = ('server_id', 'channel_id', 'before', 'after', 'scanned', 'counted', 'done', 'report_channel_id')
+
+    def __init__(self, server_id: str, channel_id: str, before: int, after: int = 0, scanned: int = 0,
+                 counted: int = 0, done: bool = False, report_channel_id: str = None):
+        self.server_id = server_id
+        self.channel_id = channel_id
+        self.before = before  # Snowflake of the cutoff; newer messages were counted live
+        self.after = after  # ID of the last message scanned (0 = none yet)
+        self.scanned = scanned
+        self.counted = counted
+        self.done = done
+        self.report_channel_id = report_channel_id  # Where !backfill was run, for the result
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class NiceBackfillModule(BaseModule):
+    """
+    Module for !backfill: adds the nice messages in channel history to the
+    nice counts and leaderboards.
+    """
+
+    # Progress survives a reload; scans stopped by the old instance are continued
+    state_attributes = ('jobs',)
+
+    def __init__(self, bot, config: dict, data_dir: str = "data"):
+        super().__init__(bot, config, data_dir)
+        self.checkpoint_file = os.path.join(data_dir, 'nice_backfill.json')
+        self.concurrency = config.get('nice_backfill_concurrency', 2)
+        self.chunk_size = config.get('nice_backfill_chunk_size', 1000)
+        self.page_delay = config.get('nice_backfill_page_delay_seconds', 0.5)
+        self.jobs = {}  # {channel_id: BackfillJob}
+        self.tasks = {}  # {channel_id: asyncio.Task} of scans started (scanning or waiting for a slot)
+        self.scanning = set()  # Channel IDs holding one of the concurrency slots
+        self.slots = asyncio.Semaphore(self.concurrency)
+        self.resume_task = None
+        self.scanned_total = self.metrics.counter(
+            'nicebot_backfill_messages_scanned_total', 'Messages of channel history scanned by !backfill'
+        )
+        self.found_total = self.metrics.counter(
+            'nicebot_backfill_nice_total', 'Nice messages found in channel history by !backfill'
+        )
+        self.metrics.gauge(
+            'nicebot_backfill_channels_scanning', 'Channels whose history is being scanned'
+        ).set_function(lambda: len(self.scanning))
+        self.load_jobs()
+
+    @property
+    def name(self) -> str:
+        return "nice_backfill"
+
+    @property
+    def description(self) -> str:
+        return "Count nice messages from channel history (!backfill, admin only)"
+
+    async def setup(self):
+        """Set up the nice backfill module."""
+
+        @commands.hybrid_command(name='backfill', description='Count nice messages from channel history (admin only)')
+        @commands.has_permissions(administrator=True)
+        async def backfill_cmd(ctx, action: str = None, *, args: str = None):
+            await self.backfill_command(ctx, (action or '').lower(), args or '')
+
+        self.bot.add_command(backfill_cmd)
+        self.resume_task = asyncio.create_task(self.resume())
+        self.logger.info(f"✓ Loaded module: {self.name}")
+
+    async def teardown(self):
+        """Clean up the nice backfill module (checkpoints are kept, so scans continue next time)."""
+        self.bot.remove_command('backfill')
+        if self.resume_task:
+            self.resume_task.cancel()
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def resume(self):
+        """Continue the unfinished scans of channels this bot (or shard range) serves."""
+        await self.bot.wait_until_ready()
+        for job in list(self.jobs.values()):
+            channel = self.bot.get_channel(int(job.channel_id))
+            if not job.done and channel is not None and job.channel_id not in self.tasks:
+                self.logger.info(f'Continuing backfill of #{channel} ({job.scanned:,} messages scanned)')
+                self.start(job, channel)
+
+    # --- Scanning ---------------------------------------------------------
+
+    def start(self, job: BackfillJob, channel):
+        task = self.tasks[job.channel_id] = asyncio.create_task(self.scan(job, channel))
+        task.add_done_callback(lambda _: self.tasks.pop(job.channel_id, None))
+
+    async def scan(self, job: BackfillJob, channel):
+        """Scan a channel's history from its checkpoint to the cutoff, oldest first."""
+        async with self.slots:
+            self.scanning.add(job.channel_id)
+            try:
+                await self.scan_history(job, channel)
+            except discord.HTTPException as e:
+                self.logger.warning(f'Backfill of #{channel} stopped after {job.scanned:,} messages: {e}')
+                await self.report(job, f"❌ Couldn't read the history of <#{job.channel_id}>: {e}")
+                return
+            except CountsUnavailable:
+                self.logger.info(f'Backfill of #{channel} paused after {job.scanned:,} messages: count module gone')
+                return
+            finally:
+                self.scanning.discard(job.channel_id)
+
+        job.done = True
+        self.save_job(job)
+        self.logger.info(f'Backfilled #{channel}: {job.counted:,} nice in {job.scanned:,} messages')
+        await self.report(
+            job, f"✅ Backfilled <#{job.channel_id}>: **{job.counted:,}** nice message"
+                 f"{'s' if job.counted != 1 else ''} in {job.scanned:,} scanned."
+        )
+
+    async def scan_history(self, job: BackfillJob, channel):
+        count = 0
+        user_counts = Counter()
+        scanned = 0
+        last_id = job.after
+        history = channel.history(
+            limit=None,
+            before=discord.Object(job.before),
+            after=discord.Object(job.after) if job.after else None,
+            oldest_first=True,
+        )
+        async for message in history:
+            scanned += 1
+            last_id = message.id
+            # The same rule as nice_trigger
+            if message.author != self.bot.user and is_nice(message.content):
+                count += 1
+                user_counts[message.author.id] += 1
+            if scanned % PAGE_SIZE:
+                continue
+            if scanned >= self.chunk_size:
+                self.checkpoint(job, count, user_counts, scanned, last_id)
+                count, user_counts, scanned = 0, Counter(), 0
+            await self.pace()
+        # Cancelled scans don't get here; their last chunk is scanned again next time
+        self.checkpoint(job, count, user_counts, scanned, last_id)
+
+    def checkpoint(self, job: BackfillJob, count: int, user_counts: Counter, scanned: int, last_id: int):
+        """
+        Hand a chunk's counts to the count module in bulk and save how far the scan got.
+
+        Raises:
+            CountsUnavailable: If nothing takes the counts anymore; the
+                checkpoint stays where it was, so the chunk is scanned again
+        """
+        if count and not self.publish(NiceBackfilled(job.server_id, job.channel_id, count, dict(user_counts))):
+            raise CountsUnavailable()
+        job.after = last_id
+        job.scanned += scanned
+        job.counted += count
+        self.save_job(job)
+        self.scanned_total.inc(amount=scanned)
+        self.found_total.inc(amount=count)
+
+    async def pace(self):
+        """Pause between pages, and for as long as the bot is shedding load."""
+        await asyncio.sleep(self.page_delay)
+        overload = getattr(self.bot, 'overload', None)
+        while overload is not None and overload.level > NORMAL:
+            await asyncio.sleep(OVERLOAD_WAIT)
+
+    async def report(self, job: BackfillJob, text: str):
+        channel = self.bot.get_channel(int(job.report_channel_id)) if job.report_channel_id else None
+        if channel is None:
+            return
+        try:
+            await channel.send(text)
+        except discord.HTTPException as e:
+            self.logger.warning(f'Error reporting backfill result: {e}')
+
+    # --- Storage ----------------------------------------------------------
+
+    def load_jobs(self):
+        """Load the checkpoints from the state store or nice_backfill.json."""
+        try:
+            if self.state_store:
+                stored = self.state_store.hgetall('nice_backfill')
+                self.jobs = {channel_id: BackfillJob.from_dict(json.loads(data)) for channel_id, data in stored.items()}
+            elif os.path.exists(self.checkpoint_file):
+                with open(self.checkpoint_file, 'r') as f:
+                    data = json.load(f)
+                self.jobs = {channel_id: BackfillJob.from_dict(job) for channel_id, job in data.items()}
+        except Exception as e:
+            self.logger.warning(f'Error loading backfill checkpoints: {e}')
+
+    def save_job(self, job: BackfillJob):
+        """Save one channel's checkpoint (the state store is written per channel, the file whole)."""
+        self.jobs[job.channel_id] = job
+        try:
+            if self.state_store:
+                self.store_write('hset', 'nice_backfill', job.channel_id, json.dumps(job.to_dict()))
+            else:
+                self.write_json(
+                    self.checkpoint_file, {channel_id: job.to_dict() for channel_id, job in self.jobs.items()}, indent=2
+                )
+        except Exception as e:
+            self.logger.error(f'Error saving backfill checkpoint: {e}')
+
+    # --- Commands ---------------------------------------------------------
+
+    async def backfill_command(self, ctx, action: str, args: str):
+        """Handle !backfill <channels|all> [before date], status and cancel."""
+        if not ctx.guild:
+            await ctx.send("❌ Backfilling only works in a server.")
+            return
+        server_id = str(ctx.guild.id)
+        if action in ('', 'status'):
+            await self.status_command(ctx, server_id)
+            return
+        if action == 'cancel':
+            running = [task for channel_id, task in self.tasks.items() if self.jobs[channel_id].server_id == server_id]
+            for task in running:
+                task.cancel()
+            await ctx.send(
+                f"⏹️ Stopped {len(running)} scan{'s' if len(running) != 1 else ''}. "
+                "Progress is kept; run `!backfill` with the channels again to continue."
+            )
+            return
+
+        words = f'{action} {args}'.split()
+        cutoff_text = None
+        if 'before' in words:
+            index = words.index('before')
+            cutoff_text = ' '.join(words[index + 1:])
+            words = words[:index]
+        channel_ids = parse_channels(' '.join(words))
+        if channel_ids is None:
+            await ctx.send(USAGE)
+            return
+
+        if not self.events.subscriptions.get(NiceBackfilled):
+            await ctx.send("❌ The `count` module isn't loaded, so there are no counts to add to.")
+            return
+
+        if cutoff_text:
+            try:
+                cutoff = datetime.datetime.strptime(cutoff_text, '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc)
+            except ValueError:
+                await ctx.send("❌ Give the date as `before YYYY-MM-DD`.")
+                return
+        else:
+            cutoff = ctx.guild.me.joined_at if ctx.guild.me else None
+            if cutoff is None:
+                await ctx.send("❌ I don't know when I joined this server; give a date with `before YYYY-MM-DD`.")
+                return
+
+        me = ctx.guild.me
+        if channel_ids:
+            channels = [ctx.guild.get_channel_or_thread(int(channel_id)) for channel_id in channel_ids]
+            if any(channel is None or not hasattr(channel, 'history') for channel in channels):
+                await ctx.send("❌ Those aren't all text channels of this server.")
+                return
+        else:
+            channels = list(ctx.guild.text_channels)
+        readable = [channel for channel in channels if channel.permissions_for(me).read_message_history]
+
+        started, resumed, skipped = [], [], []
+        for channel in readable:
+            channel_id = str(channel.id)
+            job = self.jobs.get(channel_id)
+            if job is not None and (job.done or channel_id in self.tasks):
+                skipped.append(channel_id)
+                continue
+            if job is None:
+                job = BackfillJob(
+                    server_id, channel_id, discord.utils.time_snowflake(cutoff),
+                    report_channel_id=str(ctx.channel.id),
+                )
+                self.save_job(job)
+                started.append(channel_id)
+            else:
+                # Continue from the checkpoint, with the cutoff it started with
+                job.report_channel_id = str(ctx.channel.id)
+                resumed.append(channel_id)
+            self.start(job, channel)
+
+        lines = []
+        if started:
+            lines.append(
+                f"🔎 Counting nice messages from before {discord.utils.format_dt(cutoff, 'D')} in "
+                f"{len(started)} channel{'s' if len(started) != 1 else ''} ({self.concurrency} at a time)."
+            )
+        if resumed:
+            lines.append(f"▶️ Continuing {', '.join(f'<#{channel_id}>' for channel_id in resumed)} where it stopped.")
+        if skipped:
+            lines.append(
+                f"⏭️ Already done or running: {', '.join(f'<#{channel_id}>' for channel_id in skipped)}"
+            )
+        if len(readable) < len(channels):
+            lines.append(f"⚠️ Can't read the history of {len(channels) - len(readable)} channel(s); skipped.")
+        if started or resumed:
+            lines.append("I'll post here as each channel finishes; see `!backfill status`.")
+        await ctx.send('\n'.join(lines) or "Nothing to backfill.")
+
+    async def status_command(self, ctx, server_id: str):
+        """Handle !backfill status."""
+        jobs = [job for job in self.jobs.values() if job.server_id == server_id]
+        if not jobs:
+            await ctx.send("No backfills in this server yet.\n\n" + USAGE)
+            return
+        lines = ["**Nice backfill:**"]
+        for job in sorted(jobs, key=lambda job: (job.done, -job.scanned))[:20]:
+            if job.done:
+                state = '✅ done'
+            elif job.channel_id in self.scanning:
+                state = '🔎 scanning'
+            elif job.channel_id in self.tasks:
+                state = '⏳ waiting'
+            else:
+                state = '⏸️ stopped'
+            lines.append(f"<#{job.channel_id}>: {job.scanned:,} messages, {job.counted:,} nice - {state}")
+        if len(jobs) > 20:
+            lines.append(f"...and {len(jobs) - 20} more")
+        await ctx.send('\n'.join(lines))
@@ -0,0 +1,119 @@
+"""Nice counts - per-channel nice counts with per-guild totals and top channels kept up to date.
+
+!count used to sum and sort every channel of the guild on each call. Here the
+guild total and the guild's top channels are updated as counts change, so
+!count only reads them, however many channels the guild has.
+"""
+
+import heapq
+
+# Channels shown in the !count breakdown
+TOP_K = 10
+
+
+class GuildCounts:
+    """Counts for one guild (or 'DM')."""
+
+    __slots__ = ('channels', 'total', 'top')
+
+    def __init__(self):
+        self.channels = {}  # {channel_id: count}
+        self.total = 0
+        self.top = []  # [(count, channel_id)], highest first, at most TOP_K entries
+
+
+class NiceCounter:
+    """
+    Nice counts by guild and channel.
+
+    Counts only go up, so a channel outside a guild's top list can only enter
+    it by passing the lowest entry, and each change touches at most TOP_K
+    entries instead of the whole guild.
+    """
+
+    def __init__(self, top_k: int = TOP_K):
+        self.top_k = top_k
+        self.guilds = {}  # {server_id: GuildCounts}
+
+    @classmethod
+    def from_dict(cls, data: dict, top_k: int = TOP_K):
+        """Build counts from the nice_counts.json layout {server_id: {channel_id: count}}."""
+        counter = cls(top_k)
+        for server_id, channels in data.items():
+            guild = counter.guild(server_id)
+            guild.channels = {channel_id: int(count) for channel_id, count in channels.items()}
+            counter.rebuild(server_id)
+        return counter
+
+    def to_dict(self) -> dict:
+        """Return counts in the nice_counts.json layout."""
+        return {server_id: dict(guild.channels) for server_id, guild in self.guilds.items()}
+
+    def guild(self, server_id: str) -> GuildCounts:
+        guild = self.guilds.get(server_id)
+        if guild is None:
+            guild = self.guilds[server_id] = GuildCounts()
+        return guild
+
+    def count(self, server_id: str, channel_id: str) -> int:
+        """Return a channel's count."""
+        guild = self.guilds.get(server_id)
+        return guild.channels.get(channel_id, 0) if guild else 0
+
+    def total(self, server_id: str) -> int:
+        """Return a guild's total count."""
+        guild = self.guilds.get(server_id)
+        return guild.total if guild else 0
+
+    def top(self, server_id: str) -> list:
+        """Return the guild's top channels as [(channel_id, count)], highest first."""
+        guild = self.guilds.get(server_id)
+        return [(channel_id, count) for count, channel_id in guild.top] if guild else []
+
+    def channel_count(self, server_id: str) -> int:
+        """Return how many channels of a guild have a count."""
+        guild = self.guilds.get(server_id)
+        return len(guild.channels) if guild else 0
+
+    def increment(self, server_id: str, channel_id: str, amount: int = 1) -> int:
+        """Add to a channel's count and return the new count."""
+        guild = self.guild(server_id)
+        count = guild.channels.get(channel_id, 0) + amount
+        self.set_count(server_id, channel_id, count)
+        return count
+
+    def set_count(self, server_id: str, channel_id: str, count: int):
+        """Set a channel's count (e.g. the value the shared state store returned)."""
+        guild = self.guild(server_id)
+        previous = guild.channels.get(channel_id, 0)
+        if count == previous:
+            return
+        guild.channels[channel_id] = count
+        guild.total += count - previous
+
+        if count < previous:
+            # Not expected (counts only go up), but keep the top list correct
+            self.rebuild(server_id)
+            return
+
+        top = guild.top
+        for i, (_, top_channel_id) in enumerate(top):
+            if top_channel_id == channel_id:
+                top[i] = (count, channel_id)
+                break
+        else:
+            if len(top) < self.top_k:
+                top.append((count, channel_id))
+            elif count > top[-1][0]:
+                top[-1] = (count, channel_id)
+            else:
+                return
+        top.sort(reverse=True)
+
+    def rebuild(self, server_id: str):
+        """Recompute a guild's total and top list from its channel counts."""
+        guild = self.guild(server_id)
+        guild.total = sum(guild.channels.values())
+        guild.top = heapq.nlargest(
+            self.top_k, ((count, channel_id) for channel_id, count in guild.channels.items())
+        )
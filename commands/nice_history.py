@@ -0,0 +1,207 @@
+"""Nice history - hourly and daily nice counts in fixed-size ring buffers.
+
+Every channel (and every guild, under channel ID '') gets one flat array of
+unsigned ints: HOURS hourly buckets, DAYS daily buckets, and the hour and day
+the ring was last advanced to. Memory per channel is the same however busy it
+is, and windows are sums over array slices. The whole history is saved as a
+compact binary snapshot.
+"""
+
+import os
+import time
+import base64
+import struct
+from array import array
+from .byteorder import from_little_endian, to_little_endian
+
+HOURS = 48  # Hourly buckets: today so far plus yesterday, for a 24-hour trend
+DAYS = 35  # Daily buckets: five weeks, for this week vs last week and a 2-week trend
+LAST_HOUR = HOURS + DAYS  # Index of the hour the ring was last advanced to
+LAST_DAY = LAST_HOUR + 1  # Index of the day the ring was last advanced to
+RING_SIZE = LAST_DAY + 1
+
+GUILD = ''  # Channel ID of a guild's own ring (all its channels together)
+
+SNAPSHOT_MAGIC = b'NHST'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sHHHI')  # magic, version, hours, days, ring count
+KEY_HEADER = struct.Struct('<HH')  # length of server ID, length of channel ID
+
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+
+def clock(now: float = None) -> tuple:
+    """
+    Return the (hour, day) bucket numbers for a timestamp.
+
+    Hours count from the epoch; days count local days, so "today" starts at
+    local midnight.
+    """
+    now = time.time() if now is None else now
+    utc_offset = time.localtime(now).tm_gmtoff
+    return int(now // 3600), int((now + utc_offset) // 86400)
+
+
+def new_ring(hour: int, day: int) -> array:
+    ring = array('I', bytes(RING_SIZE * 4))
+    ring[LAST_HOUR] = hour
+    ring[LAST_DAY] = day
+    return ring
+
+
+def advance(ring: array, hour: int, day: int):
+    """Move a ring forward to (hour, day), zeroing the buckets it skipped."""
+    last_hour = ring[LAST_HOUR]
+    if hour > last_hour:
+        for h in range(max(last_hour + 1, hour - HOURS + 1), hour + 1):
+            ring[h % HOURS] = 0
+        ring[LAST_HOUR] = hour
+    last_day = ring[LAST_DAY]
+    if day > last_day:
+        for d in range(max(last_day + 1, day - DAYS + 1), day + 1):
+            ring[HOURS + d % DAYS] = 0
+        ring[LAST_DAY] = day
+
+
+def sparkline(values: list) -> str:
+    """Render values as a row of block characters scaled to the largest one."""
+    peak = max(values, default=0)
+    if not peak:
+        return SPARK_CHARS[0] * len(values)
+    return ''.join(SPARK_CHARS[value * (len(SPARK_CHARS) - 1) // peak] for value in values)
+
+
+class NiceHistory:
+    """Nice counts over time per channel and per guild."""
+
+    def __init__(self):
+        self.rings = {}  # {(server_id, channel_id): array}; channel_id GUILD is the guild total
+        self.dirty = set()  # Keys changed since the last snapshot
+
+    def record(self, server_id: str, channel_id: str, amount: int = 1, now: float = None):
+        """Count nice in a channel (and its guild) in the current hour and day."""
+        hour, day = clock(now)
+        for key in ((server_id, channel_id), (server_id, GUILD)):
+            ring = self.rings.get(key)
+            if ring is None:
+                ring = self.rings[key] = new_ring(hour, day)
+            else:
+                advance(ring, hour, day)
+            # A timestamp older than the ring (e.g. the clock went back) would land in a newer bucket
+            if hour > ring[LAST_HOUR] - HOURS:
+                ring[hour % HOURS] += amount
+            if day > ring[LAST_DAY] - DAYS:
+                ring[HOURS + day % DAYS] += amount
+            self.dirty.add(key)
+
+    def hourly(self, server_id: str, channel_id: str = GUILD, hours: int = 24, now: float = None) -> list:
+        """Return the last `hours` hourly counts, oldest first (the last one is this hour)."""
+        ring = self.rings.get((server_id, channel_id))
+        if ring is None:
+            return [0] * hours
+        hour, day = clock(now)
+        advance(ring, hour, day)
+        start = (hour + 1) % HOURS
+        buckets = ring[start:HOURS] + ring[:start]
+        return buckets[HOURS - hours:].tolist()
+
+    def daily(self, server_id: str, channel_id: str = GUILD, days: int = 7, now: float = None) -> list:
+        """Return the last `days` daily counts, oldest first (the last one is today)."""
+        ring = self.rings.get((server_id, channel_id))
+        if ring is None:
+            return [0] * days
+        hour, day = clock(now)
+        advance(ring, hour, day)
+        start = (day + 1) % DAYS
+        buckets = ring[HOURS + start:HOURS + DAYS] + ring[HOURS:HOURS + start]
+        return buckets[DAYS - days:].tolist()
+
+    def today(self, server_id: str, channel_id: str = GUILD) -> int:
+        """Return the count since local midnight."""
+        return self.daily(server_id, channel_id, days=1)[0]
+
+    def week(self, server_id: str, channel_id: str = GUILD) -> tuple:
+        """Return (the last 7 days, the 7 days before) counts, today included in the first."""
+        days = self.daily(server_id, channel_id, days=14)
+        return sum(days[7:]), sum(days[:7])
+
+    def to_bytes(self) -> bytes:
+        """Serialize every ring into the binary snapshot format."""
+        parts = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, HOURS, DAYS, len(self.rings))]
+        for (server_id, channel_id), ring in self.rings.items():
+            server_bytes = server_id.encode()
+            channel_bytes = channel_id.encode()
+            parts.append(KEY_HEADER.pack(len(server_bytes), len(channel_bytes)))
+            parts.append(server_bytes)
+            parts.append(channel_bytes)
+            parts.append(to_little_endian(ring))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """
+        Load a binary snapshot.
+
+        Raises:
+            ValueError: If the data isn't a snapshot with this bucket layout
+        """
+        history = cls()
+        magic, version, hours, days, count = SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or (hours, days) != (HOURS, DAYS):
+            raise ValueError('not a nice history snapshot with this bucket layout')
+
+        offset = SNAPSHOT_HEADER.size
+        for _ in range(count):
+            server_length, channel_length = KEY_HEADER.unpack_from(data, offset)
+            offset += KEY_HEADER.size
+            server_id = data[offset:offset + server_length].decode()
+            offset += server_length
+            channel_id = data[offset:offset + channel_length].decode()
+            offset += channel_length
+            history.rings[(server_id, channel_id)] = from_little_endian('I', data[offset:offset + RING_SIZE * 4])
+            offset += RING_SIZE * 4
+        return history
+
+    def to_store_fields(self, keys) -> dict:
+        """Encode rings for a state store hash ({'server:channel': base64 ring})."""
+        return {
+            f'{server_id}:{channel_id}': base64.b64encode(to_little_endian(self.rings[(server_id, channel_id)])).decode()
+            for server_id, channel_id in keys
+        }
+
+    @classmethod
+    def from_store_fields(cls, fields: dict):
+        """Load rings saved with to_store_fields()."""
+        history = cls()
+        history.load_store_fields(fields)
+        return history
+
+    def load_store_fields(self, fields: dict):
+        """Replace rings with ones saved with to_store_fields() (a None value drops the ring)."""
+        for field, value in fields.items():
+            server_id, _, channel_id = field.partition(':')
+            if value is None:
+                self.rings.pop((server_id, channel_id), None)
+                continue
+            ring = from_little_endian('I', base64.b64decode(value))
+            if len(ring) == RING_SIZE:
+                self.rings[(server_id, channel_id)] = ring
+
+
+def load_history(path: str, state_store=None, logger=None) -> NiceHistory:
+    """
+    Load the history from the state store or the snapshot file.
+
+    Returns:
+        The saved history, or an empty one if there is none (or it can't be read)
+    """
+    try:
+        if state_store:
+            return NiceHistory.from_store_fields(state_store.hgetall('nice_history'))
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return NiceHistory.from_bytes(f.read())
+    except Exception as e:
+        if logger:
+            logger.warning(f'Error loading nice history: {e}')
+    return NiceHistory()
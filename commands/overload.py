@@ -0,0 +1,176 @@
+"""Overload controller - sheds low-priority work in stages when the bot falls behind.
+
+A task on the event loop wakes up every interval and measures how late it
+woke up (loop lag) and how many sends are waiting in the send queue. Each
+crosses a threshold per stage; the highest stage either one reaches is
+entered at once, and the controller steps back down one stage at a time
+after the pressure has stayed below the current stage for a while, so it
+doesn't flap.
+
+Stages, each including the ones before it:
+
+1. shed_triggers - cosmetic trigger replies (nice, eagles, shut up, custom
+   triggers) are dropped; the triggers still count
+2. defer_writes - data file writes are held back (never dropped: the newest
+   data per file stays queued) until the stage is left or they have waited
+   max_write_delay seconds
+3. shed_commands - new slow commands (a module's slow_commands) get a busy
+   reply instead of running
+"""
+
+import time
+import asyncio
+import logging
+from . import defer_writes, resume_writes
+
+logger = logging.getLogger(__name__)
+
+NORMAL = 0
+SHED_TRIGGERS = 1
+DEFER_WRITES = 2
+SHED_COMMANDS = 3
+
+STAGE_NAMES = ('normal', 'shed_triggers', 'defer_writes', 'shed_commands')
+
+
+class OverloadController:
+    """Watches loop lag and send queue depth and decides what to shed."""
+
+    def __init__(self, metrics, send_queue=None, lag_thresholds: tuple = (0.1, 0.25, 0.5),
+                 queue_thresholds: tuple = (50, 200, 500), interval_seconds: float = 0.25,
+                 recover_seconds: float = 10.0, max_write_delay: float = 60.0):
+        """
+        Initialize the controller.
+
+        Args:
+            metrics: Metrics registry
+            send_queue: The bot's SendScheduler (None: loop lag only)
+            lag_thresholds: Loop lag in seconds that enters stage 1, 2 and 3
+            queue_thresholds: Waiting sends that enter stage 1, 2 and 3
+            interval_seconds: How often lag and queue depth are checked
+            recover_seconds: How long the pressure has to stay below the current
+                stage before stepping down one stage
+            max_write_delay: Longest time data file writes are held back
+        """
+        self.send_queue = send_queue
+        self.lag_thresholds = tuple(lag_thresholds)
+        self.queue_thresholds = tuple(queue_thresholds)
+        self.interval_seconds = interval_seconds
+        self.recover_seconds = recover_seconds
+        self.max_write_delay = max_write_delay
+        self.level = NORMAL
+        self.calm_since = None  # Monotonic time the pressure fell below the current stage
+        self.writes_deferred_at = None  # Monotonic time writes were last held back
+        self.task = None
+        self.shed_counts = {}  # {(stage, name): count}, for logging
+        metrics.gauge(
+            'nicebot_overload_level', 'Current load shedding stage (0 = normal, 3 = shedding slow commands)'
+        ).set_function(lambda: self.level)
+        self.transitions_total = metrics.counter(
+            'nicebot_overload_transitions_total', 'Load shedding stages entered', ('stage',)
+        )
+        # Data file writes held back are counted by write_file() in the same metric
+        self.shed_total = metrics.counter(
+            'nicebot_overload_shed_total', 'Work shed or deferred under load, by stage', ('stage', 'name')
+        )
+
+    def start(self):
+        """Start checking on the running loop."""
+        self.task = asyncio.create_task(self.run())
+        logger.info(
+            f'✓ Overload controller started (loop lag: '
+            f"{', '.join(f'{lag * 1000:.0f}' for lag in self.lag_thresholds)}ms, send queue: "
+            f"{', '.join(str(depth) for depth in self.queue_thresholds)})"
+        )
+
+    def stop(self):
+        """Stop checking and write out everything held back."""
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        if self.writes_deferred_at is not None:
+            resume_writes()
+            self.writes_deferred_at = None
+
+    async def run(self):
+        last_check = time.monotonic()
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            now = time.monotonic()
+            lag = max(0.0, now - last_check - self.interval_seconds)
+            last_check = now
+            self.update(lag, self.send_queue.depth() if self.send_queue else 0, now)
+
+    def pressure(self, lag: float, depth: int) -> int:
+        """Return the stage lag and queue depth call for."""
+        level = NORMAL
+        for stage, (lag_threshold, depth_threshold) in enumerate(zip(self.lag_thresholds, self.queue_thresholds), 1):
+            if lag >= lag_threshold or depth >= depth_threshold:
+                level = stage
+        return level
+
+    def update(self, lag: float, depth: int, now: float):
+        """Move between stages for one measurement."""
+        target = self.pressure(lag, depth)
+        if target > self.level:
+            self.enter(target, lag, depth)
+            self.calm_since = None
+        elif target < self.level:
+            if self.calm_since is None:
+                self.calm_since = now
+            elif now - self.calm_since >= self.recover_seconds:
+                self.enter(self.level - 1, lag, depth)
+                self.calm_since = now
+        else:
+            self.calm_since = None
+
+        if self.level >= DEFER_WRITES:
+            if self.writes_deferred_at is None:
+                defer_writes()
+                self.writes_deferred_at = now
+            elif now - self.writes_deferred_at >= self.max_write_delay:
+                # Still overloaded: write out what waited long enough, then hold back again
+                flushed = resume_writes()
+                if flushed:
+                    logger.warning(f'Writing {flushed} data file(s) held back for {self.max_write_delay:.0f}s')
+                defer_writes()
+                self.writes_deferred_at = now
+        elif self.writes_deferred_at is not None:
+            resume_writes()
+            self.writes_deferred_at = None
+
+    def enter(self, level: int, lag: float, depth: int):
+        previous, self.level = self.level, level
+        self.transitions_total.inc(STAGE_NAMES[level])
+        message = (
+            f'Load shedding {STAGE_NAMES[previous]} -> {STAGE_NAMES[level]} '
+            f'(loop lag {lag * 1000:.0f}ms, {depth} send(s) waiting)'
+        )
+        if level > previous:
+            logger.warning(message)
+        else:
+            shed = ', '.join(f'{stage} {name}: {count}' for (stage, name), count in sorted(self.shed_counts.items()))
+            logger.info(message + (f'; shed so far: {shed}' if shed else ''))
+
+    def shed_trigger(self, module_name: str) -> bool:
+        """Return whether to drop a trigger reply of a module (and count it if so)."""
+        if self.level < SHED_TRIGGERS:
+            return False
+        self.record_shed('trigger', module_name)
+        return True
+
+    def shed_command(self, command_name: str) -> bool:
+        """Return whether to turn a new slow command away (and count it if so)."""
+        if self.level < SHED_COMMANDS:
+            return False
+        self.record_shed('command', command_name)
+        return True
+
+    def record_shed(self, stage: str, name: str):
+        key = (stage, name)
+        self.shed_counts[key] = self.shed_counts.get(key, 0) + 1
+        self.shed_total.inc(stage, name)
+
+    @property
+    def stage_name(self) -> str:
+        return STAGE_NAMES[self.level]
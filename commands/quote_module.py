@@ -3,18 +3,23 @@
 import json
 import random
 import os
+import asyncio
 import discord
 from discord.ext import commands
 from . import BaseModule
+from .events import QuoteAdded
 
 
 class QuoteModule(BaseModule):
     """Module for the !quote command to search and display quotes."""
 
+    state_attributes = ('quotes',)
+
     def __init__(self, bot, config: dict, data_dir: str):
         super().__init__(bot, config, data_dir)
         self.quotes_file = os.path.join(data_dir, "quotes.json")
         self.quotes = []
+        self.quotes_version = None  # State store version the local quotes were read at
         self.load_quotes()
 
     @property
@@ -26,7 +31,12 @@ class QuoteModule(BaseModule):
         return "Search and display quotes (!quote)"
 
     def load_quotes(self):
-        """Load quotes from the JSON file."""
+        """Load quotes from the JSON file (or from the state store in cluster mode)."""
+        if self.state_store:
+            self.migrate_quotes()
+            self.refresh_quotes()
+            return
+
         try:
             if os.path.exists(self.quotes_file):
                 with open(self.quotes_file, 'r', encoding='utf-8') as f:
@@ -36,20 +46,56 @@ class QuoteModule(BaseModule):
                 self.quotes = []
                 self.save_quotes()
         except Exception as e:
-            print(f"Error loading quotes: {e}")
+            self.logger.warning(f"Error loading quotes: {e}")
             self.quotes = []
 
+    def migrate_quotes(self):
+        """Import quotes from the JSON file into the state store (first process to start only)."""
+        if not os.path.exists(self.quotes_file) or not self.claim_migration('quotes'):
+            return
+        try:
+            with open(self.quotes_file, 'r', encoding='utf-8') as f:
+                quotes = json.load(f)
+            for quote in quotes:
+                self.state_store.hset('quotes', str(quote.get('id', 0)), json.dumps(quote, ensure_ascii=False))
+            max_id = max((quote.get('id', 0) for quote in quotes), default=0)
+            self.state_store.hincrby('quote_meta', 'last_id', max_id)
+            self.state_store.hincrby('quote_meta', 'version')
+            self.logger.info(f'Imported {len(quotes)} quotes from {self.quotes_file} into the state store')
+        except Exception as e:
+            self.logger.warning(f'Error importing quotes: {e}')
+
+    def refresh_quotes(self):
+        """Re-read quotes from the state store if another process has added one."""
+        if not self.state_store:
+            return
+
+        version = self.state_store.hget('quote_meta', 'version')
+        if version == self.quotes_version:
+            return
+
+        stored = self.state_store.hgetall('quotes')
+        self.quotes = sorted((json.loads(value) for value in stored.values()), key=lambda quote: quote.get('id', 0))
+        self.quotes_version = version
+
     def save_quotes(self):
         """Save quotes to the JSON file."""
+        if self.state_store:
+            # Quotes are written to the state store as they are added
+            return
+
         try:
             os.makedirs(os.path.dirname(self.quotes_file), exist_ok=True)
-            with open(self.quotes_file, 'w', encoding='utf-8') as f:
-                json.dump(self.quotes, f, indent=2, ensure_ascii=False)
+            self.write_json(self.quotes_file, self.quotes, indent=2, ensure_ascii=False)
         except Exception as e:
-            print(f"Error saving quotes: {e}")
+            self.logger.error(f"Error saving quotes: {e}")
 
-    def get_next_quote_id(self) -> int:
+    async def get_next_quote_id(self) -> int:
         """Get the next available quote ID."""
+        if self.state_store:
+            # Reserve the ID atomically so two workers never hand out the same one
+            return await self.store_call('hincrby', 'quote_meta', 'last_id')
+
         if not self.quotes:
             return 1
 
@@ -81,7 +127,7 @@ class QuoteModule(BaseModule):
         # In DMs, deny by default
         return False
 
-    def create_quote_from_message(self, message, quote_text: str = None, member=None) -> dict:
+    async def create_quote_from_message(self, message, quote_text: str = None, member=None) -> dict:
         """
         Create a quote dictionary from a Discord message.
 
@@ -95,7 +141,7 @@ class QuoteModule(BaseModule):
         """
         import datetime
 
-        quote_id = self.get_next_quote_id()
+        quote_id = await self.get_next_quote_id()
 
         # Get display name from member if available, otherwise from message.author
         if member:
@@ -130,7 +176,7 @@ class QuoteModule(BaseModule):
 
         return quote
 
-    def add_quote(self, quote: dict) -> bool:
+    async def add_quote(self, quote: dict) -> bool:
         """
         Add a quote to the collection and save to file.
 
@@ -141,8 +187,15 @@ class QuoteModule(BaseModule):
             True if successful, False otherwise
         """
         try:
+            if self.state_store:
+                await self.store_call('hset', 'quotes', str(quote['id']), json.dumps(quote, ensure_ascii=False))
+                version = await self.store_call('hincrby', 'quote_meta', 'version')
+                # Only skip the next refresh if nobody else added a quote in between
+                if self.quotes_version is not None and version == int(self.quotes_version) + 1:
+                    self.quotes_version = str(version)
             self.quotes.append(quote)
             self.save_quotes()
+            self.publish(QuoteAdded(quote))
             return True
         except Exception as e:
             self.logger.error(f"Error adding quote: {e}")
@@ -152,12 +205,12 @@ class QuoteModule(BaseModule):
         """Set up the quote module."""
 
         # Create wrapper function for the command
-        @commands.command(name='quote')
+        @commands.hybrid_command(name='quote', description='Random quote, or a quote by ID or keyword')
         async def quote_cmd(ctx, *, search_term: str = None):
             await self.quote_command(ctx, search_term=search_term)
 
         # Create wrapper function for the addquote command
-        @commands.command(name='addquote')
+        @commands.hybrid_command(name='addquote', description='Add a quote to the collection')
         async def addquote_cmd(ctx, *, quote_text: str = None):
             await self.addquote_command(ctx, quote_text=quote_text)
 
@@ -213,6 +266,9 @@ class QuoteModule(BaseModule):
 
     async def quote_command(self, ctx, *, search_term: str = None):
         """Display a quote - random if no search term, by ID if number, or matching search."""
+        if self.state_store:
+            await asyncio.to_thread(self.refresh_quotes)
+
         if not self.quotes:
             await ctx.send("❌ No quotes available. Add some quotes to the `data/quotes.json` file!")
             return
@@ -313,10 +369,10 @@ class QuoteModule(BaseModule):
                         pass
 
                 # Create quote from the replied message, passing member if available
-                quote = self.create_quote_from_message(replied_message, member=member)
+                quote = await self.create_quote_from_message(replied_message, member=member)
 
                 # Add to collection
-                if self.add_quote(quote):
+                if await self.add_quote(quote):
                     # Create success embed
                     embed = discord.Embed(
                         title="✅ Quote Added!",
@@ -339,10 +395,10 @@ class QuoteModule(BaseModule):
         # Method 2: Direct text input
         if quote_text:
             # Create quote from current message context
-            quote = self.create_quote_from_message(ctx.message, quote_text=quote_text)
+            quote = await self.create_quote_from_message(ctx.message, quote_text=quote_text)
 
             # Add to collection
-            if self.add_quote(quote):
+            if await self.add_quote(quote):
                 # Create success embed
                 embed = discord.Embed(
                     title="✅ Quote Added!",
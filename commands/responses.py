@@ -0,0 +1,254 @@
+"""Responses - the shared response catalog the trigger modules draw their replies from.
+
+eagles_responses.json is loaded once for every module and reloaded when the
+file changes on disk (checked at most every 'responses_reload_seconds'). Each
+response has a category; modules declare a named pool of the categories they
+use, with a weight per category, and draw from it:
+
+- 'random' mode draws by weight in constant time with an alias table
+- 'shuffle' mode deals every response once per round from a per-channel
+  shuffled bag, so a channel never gets the same response twice in a row
+
+Pools can be changed under 'responses' in config, e.g.
+{"responses": {"dallas": {"categories": {"anti-dallas": 3, "eagles": 1}}}}.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODES = ('random', 'shuffle')
+
+# Used for a category the file has no responses for (or when there is no file)
+DEFAULT_RESPONSES = {
+    'eagles': [
+        'Go Birds!',
+        'da birds!',
+        'E.A.G.L.E.S',
+        'E-A-G-L-E-S EAGLES!',
+        'Fly Eagles Fly!',
+        'Bleed green!',
+        'Go Birds.',
+        'Bird Gang!',
+        'Gang Green!',
+        'Let\'s go Birds!',
+        'In Jalen we trust!',
+        'Philly Special!',
+        'It\'s a Philly thing!',
+        '🦅🦅🦅',
+    ],
+    'anti-dallas': [
+        'Fuck Dallas!',
+        'Dallas sucks!',
+        'Cowgirls!',
+        'America\'s most overrated team!',
+        'Rent free in Dallas!',
+        'How bout them Cowboys? HAHAHAHA',
+        'Dallas ain\'t shit!',
+        'Poverty franchise!',
+        'BOOOO DALLAS!',
+    ],
+    'nice': [
+        'Nice!',
+        'Nice.',
+        'nice',
+        'Niceee',
+        'Niccceee',
+        'Very nice!',
+        'Noice!',
+        'Noice.',
+        'N🧊',
+        '👌',
+    ],
+}
+
+
+class AliasSampler:
+    """
+    Draws an index with probability proportional to its weight in O(1) (Vose's alias method).
+
+    Every index gets an equal-width column; a column holds its own index with
+    probability prob[i] and the index alias[i] otherwise, so a draw is one
+    random number and one comparison however many weights there are.
+    """
+
+    def __init__(self, weights: list):
+        n = len(weights)
+        total = sum(weights)
+        if not n or total <= 0:
+            raise ValueError('AliasSampler needs at least one positive weight')
+        self.n = n
+        self.prob = [weight * n / total for weight in weights]
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(self.prob) if p < 1]
+        large = [i for i, p in enumerate(self.prob) if p >= 1]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.alias[less] = more
+            self.prob[more] -= 1 - self.prob[less]
+            (small if self.prob[more] < 1 else large).append(more)
+        # Whatever is left is 1 up to rounding
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self) -> int:
+        u = random.random() * self.n
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+
+class ResponsePool:
+    """A module's weighted selection of catalog categories."""
+
+    def __init__(self, catalog, name: str, categories: dict, mode: str):
+        if mode not in MODES:
+            raise ValueError(f"Responses {name}: 'mode' must be one of {', '.join(MODES)}, not {mode!r}")
+        self.catalog = catalog
+        self.name = name
+        self.categories = categories  # {category: weight}
+        self.mode = mode
+        self.version = None  # Catalog version the pool was built from
+        self.texts = []
+        self.sampler = None
+        self.bags = {}  # {channel key: [indices still to deal, next one last]}
+        self.last = {}  # {channel key: index dealt last}
+
+    def build(self):
+        """Collect the pool's responses from the catalog (again after it reloads)."""
+        texts = []
+        weights = []
+        for category, category_weight in self.categories.items():
+            for text, weight in self.catalog.entries(category):
+                if category_weight * weight > 0:
+                    texts.append(text)
+                    weights.append(category_weight * weight)
+        self.texts = texts
+        self.sampler = AliasSampler(weights) if texts else None
+        self.bags = {}
+        self.last = {}
+        self.version = self.catalog.version
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def pick(self, key=None):
+        """
+        Draw a response.
+
+        Args:
+            key: Channel (or channel ID) to deal from in shuffle mode
+
+        Returns:
+            The response text, or None if the pool is empty
+        """
+        self.catalog.check_reload()
+        if self.version != self.catalog.version:
+            self.build()
+        if not self.texts:
+            return None
+
+        if self.mode == 'shuffle' and key is not None:
+            key = getattr(key, 'id', key)
+            bag = self.bags.get(key)
+            if not bag:
+                bag = self.bags[key] = list(range(len(self.texts)))
+                random.shuffle(bag)
+                # Don't start the new round with the response that ended the last one
+                if len(bag) > 1 and bag[-1] == self.last.get(key):
+                    bag[0], bag[-1] = bag[-1], bag[0]
+            index = self.last[key] = bag.pop()
+            return self.texts[index]
+
+        return self.texts[self.sampler.sample()]
+
+
+class ResponseCatalog:
+    """Every response from the catalog file, by category, reloaded when the file changes."""
+
+    def __init__(self, config: dict):
+        """
+        Initialize the catalog and load the file.
+
+        Args:
+            config: Configuration dictionary ('responses_file', 'responses_reload_seconds', 'responses')
+        """
+        self.path = config.get('responses_file', 'eagles_responses.json')
+        self.reload_interval = config.get('responses_reload_seconds', 5)
+        self.overrides = config.get('responses', {})
+        self.by_category = {}  # {category: [(text, weight)]}
+        self.pools = {}  # {name: ResponsePool}
+        self.version = 0
+        self.mtime = None
+        self.next_check = 0.0
+        self.load()
+
+    def entries(self, category: str) -> list:
+        """Return a category's [(text, weight)], falling back to the built-in defaults."""
+        entries = self.by_category.get(category)
+        if entries:
+            return entries
+        return [(text, 1) for text in DEFAULT_RESPONSES.get(category, ())]
+
+    def declare(self, name: str, categories: dict, mode: str = 'random') -> ResponsePool:
+        """
+        Declare a response pool (or get the existing one when a reloaded module declares it again).
+
+        Settings under 'responses' -> name in config take precedence over the
+        defaults given here.
+        """
+        settings = self.overrides.get(name, {})
+        categories = dict(settings.get('categories', categories))
+        mode = settings.get('mode', mode)
+        pool = self.pools.get(name)
+        if pool is None or pool.categories != categories or pool.mode != mode:
+            pool = self.pools[name] = ResponsePool(self, name, categories, mode)
+        return pool
+
+    def check_reload(self):
+        """Reload the file if it changed (looking at most every reload_interval seconds)."""
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        self.next_check = now + self.reload_interval
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self.mtime:
+            self.load()
+
+    def load(self):
+        """Load the catalog file, keeping the current responses if it can't be read."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        self.mtime = mtime
+        if mtime is None:
+            if self.by_category:
+                logger.warning(f'{self.path} is gone, keeping the responses loaded before')
+            else:
+                logger.info(f'{self.path} not found, using default responses')
+            return
+
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            by_category = {}
+            for item in data.get('responses', []):
+                weight = float(item.get('weight', 1))
+                by_category.setdefault(item.get('category', ''), []).append((item['text'], weight))
+        except Exception as e:
+            logger.warning(f'Error loading responses from {self.path}: {e}')
+            return
+
+        self.by_category = by_category
+        self.version += 1
+        total = sum(len(entries) for entries in by_category.values())
+        logger.info(f'Loaded {total} responses in {len(by_category)} categories from {self.path}')
@@ -0,0 +1,214 @@
+"""Routing - which modules are enabled in which guild and channel.
+
+'enabled_modules' decides which modules are loaded at all. Within that, a
+guild can turn modules off for the whole server or single channels (!modules),
+and 'module_channels' in config limits a module to channels by name or ID.
+
+Instead of every listener receiving every message and checking for itself,
+modules register their message listeners here and the bot's on_message only
+runs the ones enabled in the message's channel. What is enabled where is
+compiled into a Route per channel on its first message and kept in a dict
+keyed by channel ID until the settings or listeners change, so routing a
+message is one dict lookup. With a state store, settings changed by another
+process are picked up through its version (see state_versions).
+"""
+
+import os
+import json
+import asyncio
+import logging
+from . import queue_store_write, write_json_file
+from .state_versions import StateVersions
+
+logger = logging.getLogger(__name__)
+
+# Settings key that stands for every module
+ALL_MODULES = '*'
+
+
+class Route:
+    """The message listeners to run and the modules turned off in one channel."""
+
+    __slots__ = ('listeners', 'disabled')
+
+    def __init__(self, listeners: tuple, disabled: frozenset):
+        self.listeners = listeners
+        self.disabled = disabled
+
+
+class ModuleRouter:
+    """Per-guild/per-channel module settings, compiled into a route per channel."""
+
+    def __init__(self, config: dict, modules=(), data_dir: str = None, state_store=None):
+        """
+        Initialize the router and load the guild settings.
+
+        Args:
+            config: Configuration dictionary ('module_channels', 'chatgpt_channels', 'state_refresh_seconds')
+            modules: Names of every module that can be turned on and off
+            data_dir: Directory for module_routing.json (None keeps settings in memory only)
+            state_store: Shared state store to keep the settings in instead of a file
+        """
+        self.modules = set(modules)
+        # {module: {channel name or ID}}: the only channels the module works in
+        self.module_channels = {
+            module: {str(channel) for channel in channels}
+            for module, channels in config.get('module_channels', {}).items()
+        }
+        if config.get('chatgpt_channels') and 'chatgpt' not in self.module_channels:
+            # Older setting, by channel name
+            self.module_channels['chatgpt'] = set(config['chatgpt_channels'])
+        self.settings_file = os.path.join(data_dir, 'module_routing.json') if data_dir else None
+        self.state_store = state_store
+        # {server_id: {'modules': {module: enabled}, 'channels': {channel_id: {module: enabled}}}}
+        self.guild_settings = {}
+        self.listeners = {}  # {module: [listener]}
+        self.routes = {}  # {channel ID: Route}
+        self.versions = StateVersions(state_store, config)
+        self.refresh_task = None
+        self.load()
+
+    def add_listener(self, module: str, listener):
+        """Run listener for messages in the channels where module is enabled."""
+        self.listeners.setdefault(module, []).append(listener)
+        self.routes = {}
+
+    def remove_listener(self, module: str, listener):
+        listeners = self.listeners.get(module, [])
+        if listener in listeners:
+            listeners.remove(listener)
+        if not listeners:
+            self.listeners.pop(module, None)
+        self.routes = {}
+
+    def route(self, channel) -> Route:
+        """Return the route of a channel (compiled on its first message)."""
+        route = self.routes.get(channel.id)
+        if route is None:
+            route = self.routes[channel.id] = self.compile(channel)
+        return route
+
+    def allows(self, module: str, channel) -> bool:
+        """Return whether a module is enabled in a channel."""
+        return module not in self.route(channel).disabled
+
+    def forget(self, channel_id: int):
+        """Drop a channel's route (e.g. after it was renamed or deleted)."""
+        self.routes.pop(channel_id, None)
+
+    def compile(self, channel) -> Route:
+        guild = getattr(channel, 'guild', None)
+        settings = self.guild_settings.get(str(guild.id), {}) if guild is not None else {}
+        # Most specific first: the channel, its parent (for threads), the guild
+        channel_settings = settings.get('channels', {})
+        scopes = [channel_settings.get(str(channel.id), {})]
+        parent_id = getattr(channel, 'parent_id', None)
+        if parent_id is not None:
+            scopes.append(channel_settings.get(str(parent_id), {}))
+        scopes.append(settings.get('modules', {}))
+
+        names = {str(channel.id)}
+        if getattr(channel, 'name', None):
+            names.add(channel.name)
+
+        disabled = frozenset(
+            module for module in self.modules | set(self.listeners)
+            if not self.enabled_in(module, names, scopes)
+        )
+        listeners = tuple(
+            listener
+            for module, module_listeners in self.listeners.items() if module not in disabled
+            for listener in module_listeners
+        )
+        return Route(listeners, disabled)
+
+    def enabled_in(self, module: str, names: set, scopes: list) -> bool:
+        allowed = self.module_channels.get(module)
+        if allowed is not None and not names & allowed:
+            return False
+        for scope in scopes:
+            if module in scope:
+                return scope[module]
+            if ALL_MODULES in scope:
+                return scope[ALL_MODULES]
+        return True
+
+    # --- Settings ----------------------------------------------------------
+
+    def set_module(self, server_id: str, module: str, enabled, channel_ids: list = None):
+        """
+        Turn a module (or ALL_MODULES) on or off for a guild or some of its channels.
+
+        Args:
+            server_id: Guild ID
+            module: Module name, or ALL_MODULES
+            enabled: True, False, or None to remove the setting (back to the default)
+            channel_ids: Channels to change (None = the whole guild)
+        """
+        settings = self.guild_settings.setdefault(server_id, {'modules': {}, 'channels': {}})
+        scopes = (
+            [settings['modules']] if channel_ids is None
+            else [settings['channels'].setdefault(str(channel_id), {}) for channel_id in channel_ids]
+        )
+        for scope in scopes:
+            if module == ALL_MODULES and enabled is None:
+                scope.clear()
+            elif enabled is None:
+                scope.pop(module, None)
+            else:
+                if module == ALL_MODULES:
+                    # 'all' replaces the per-module settings of the scope
+                    scope.clear()
+                scope[module] = enabled
+        settings['channels'] = {channel_id: scope for channel_id, scope in settings['channels'].items() if scope}
+        if not settings['modules'] and not settings['channels']:
+            del self.guild_settings[server_id]
+        self.routes = {}
+        self.save(server_id)
+
+    def load(self):
+        """Load the guild settings from the state store or module_routing.json."""
+        try:
+            if self.state_store:
+                self.guild_settings = {
+                    server_id: json.loads(value)
+                    for server_id, value in self.state_store.hgetall('module_routing').items()
+                }
+            elif self.settings_file and os.path.exists(self.settings_file):
+                with open(self.settings_file, 'r') as f:
+                    self.guild_settings = json.load(f)
+        except Exception as e:
+            logger.warning(f'Error loading module routing settings: {e}')
+
+    async def refresh(self):
+        """Read the guild settings from the state store again once another process changed them."""
+        if not self.versions.due('module_routing'):
+            return
+        try:
+            if await self.versions.changed('module_routing'):
+                stored = await asyncio.to_thread(self.state_store.hgetall, 'module_routing')
+                self.guild_settings = {server_id: json.loads(value) for server_id, value in stored.items()}
+                self.routes = {}
+        except Exception as e:
+            logger.warning(f'Error loading module routing settings: {e}')
+
+    def refresh_soon(self):
+        """Start refresh() in the background when it is due (messages shouldn't wait on the store)."""
+        if self.versions.due('module_routing') and (self.refresh_task is None or self.refresh_task.done()):
+            self.refresh_task = asyncio.create_task(self.refresh())
+
+    def save(self, server_id: str):
+        """Save a guild's settings (the state store is written per guild, the file whole)."""
+        try:
+            if self.state_store:
+                settings = self.guild_settings.get(server_id)
+                if settings:
+                    queue_store_write(self.state_store.hset, 'module_routing', server_id, json.dumps(settings), logger=logger)
+                else:
+                    queue_store_write(self.state_store.hdel, 'module_routing', server_id, logger=logger)
+                self.versions.bump('module_routing')
+            elif self.settings_file:
+                write_json_file(self.settings_file, self.guild_settings, logger, indent=2)
+        except Exception as e:
+            logger.error(f'Error saving module routing settings: {e}')
+
@@ -1,14 +1,16 @@
 """Search command module - DuckDuckGo search integration."""
 
+import asyncio
 import discord
 from discord.ext import commands
-import ddgs
 from . import BaseModule
 
 
 class SearchModule(BaseModule):
     """Module for the !search command using DuckDuckGo."""
 
+    slow_commands = ('search',)
+
     @property
     def name(self) -> str:
         return "search"
@@ -21,7 +23,7 @@ class SearchModule(BaseModule):
         """Set up the search module."""
 
         # Create wrapper function for the command
-        @commands.command(name='search')
+        @commands.hybrid_command(name='search', description='Search the web with DuckDuckGo')
         async def search_cmd(ctx, *, query: str = None):
             await self.search_command(ctx, query=query)
 
@@ -34,6 +36,13 @@ class SearchModule(BaseModule):
         """Clean up the search module."""
         self.bot.remove_command('search')
 
+    def search(self, query: str) -> list:
+        """Perform a DuckDuckGo search (blocking, runs in a worker thread)."""
+        # Imported on first use, it's a heavy dependency
+        import ddgs
+
+        return list(ddgs.DDGS().text(query, max_results=5))
+
     async def search_command(self, ctx, *, query: str = None):
         """Search DuckDuckGo for a query and return results."""
         if not query:
@@ -41,12 +50,12 @@ class SearchModule(BaseModule):
             return
 
         # Send a "searching" message
-        searching_msg = await ctx.send(f"🔍 Searching for: **{query}**...")
+        searching_msg = await self.send_placeholder(ctx, f"🔍 Searching for: **{query}**...")
 
         try:
-            # Perform DuckDuckGo search
-            search = ddgs.DDGS()
-            results = list(search.text(query, max_results=5))
+            # ddgs is synchronous, so search in a thread
+            with self.track_call('duckduckgo'):
+                results = await asyncio.get_running_loop().run_in_executor(None, self.search, query)
 
             if not results:
                 await searching_msg.edit(content=f"No results found for: **{query}**")
@@ -0,0 +1,254 @@
+"""Send queue - per-channel outbound message scheduling with priorities and burst coalescing.
+
+Discord rate limits sends per channel (about 5 per 5 seconds). Without a
+queue, a burst of trigger hits fires one send per message, every one of them
+waits in discord.py's rate limiter, and command replies queue up behind them.
+
+Here every channel gets its own queue with two priorities. Command replies
+(HIGH) always go first. Trigger responses (LOW) are sent at most once per
+coalesce window per channel; responses that pile up meanwhile with the same
+coalesce key become a single message ("Nice! ×12").
+"""
+
+import re
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from discord.ext import commands
+
+logger = logging.getLogger(__name__)
+
+HIGH = 0  # Command replies
+LOW = 1  # Trigger responses
+
+# discord.py logs this (at WARNING) whenever Discord answers 429 Too Many Requests
+RATE_LIMIT_LOG_PREFIX = 'We are being rate limited.'
+CHANNEL_URL_PATTERN = re.compile(r'/channels/(\d+)/')
+
+
+class QueuedSend:
+    """One pending send (a trigger response may stand for several coalesced ones)."""
+
+    __slots__ = ('priority', 'deliver', 'content', 'coalesce_key', 'count', 'future')
+
+    def __init__(self, priority: int, deliver, content, coalesce_key: str = None, future=None):
+        self.priority = priority
+        self.deliver = deliver  # async function(content) -> Message
+        self.content = content
+        self.coalesce_key = coalesce_key
+        self.count = 1
+        self.future = future
+
+
+class ChannelSendQueue:
+    """Pending sends for one channel, delivered one at a time by a worker task."""
+
+    def __init__(self, scheduler, channel_id: int):
+        self.scheduler = scheduler
+        self.channel_id = channel_id
+        self.heap = []  # [(priority, sequence, QueuedSend)]
+        self.coalescable = {}  # {coalesce_key: pending QueuedSend}
+        self.low_ready_at = 0.0  # Monotonic time the next trigger response may go out
+        self.wakeup = asyncio.Event()
+        self.worker = None
+
+    def add(self, item: QueuedSend):
+        heapq.heappush(self.heap, (item.priority, next(self.scheduler.sequence), item))
+        if item.coalesce_key:
+            self.coalescable[item.coalesce_key] = item
+        self.wakeup.set()
+        if self.worker is None:
+            self.worker = asyncio.create_task(self.run())
+
+    async def run(self):
+        """Deliver queued sends, holding trigger responses back for the coalesce window."""
+        try:
+            # Stay around for the rest of the window after the last trigger response,
+            # so a trigger arriving right after it is still coalesced
+            while self.heap or time.monotonic() < self.low_ready_at:
+                delay = self.low_ready_at - time.monotonic()
+                if not self.heap or (self.heap[0][0] == LOW and delay > 0):
+                    # Wait out the window, but wake up early for a command reply
+                    self.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), timeout=max(delay, 0))
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                _, _, item = heapq.heappop(self.heap)
+                if item.coalesce_key:
+                    self.coalescable.pop(item.coalesce_key, None)
+                await self.scheduler.deliver(item)
+                if item.priority == LOW:
+                    self.low_ready_at = time.monotonic() + self.scheduler.coalesce_window
+        finally:
+            self.scheduler.queues.pop(self.channel_id, None)
+            # Cancelled (shutdown): don't leave command replies waiting forever
+            for _, _, item in self.heap:
+                if item.future is not None and not item.future.done():
+                    item.future.cancel()
+
+
+class SendScheduler:
+    """Routes outbound sends through per-channel queues and tracks queue depth and 429s."""
+
+    def __init__(self, metrics, coalesce_window: float = 2.0):
+        """
+        Initialize the scheduler.
+
+        Args:
+            metrics: Metrics registry
+            coalesce_window: Minimum seconds between trigger responses in one channel
+        """
+        self.coalesce_window = coalesce_window
+        self.queues = {}  # {channel_id: ChannelSendQueue}, only while busy
+        self.sequence = itertools.count()
+        self.sent = {HIGH: 0, LOW: 0}
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.rate_limited_channels = {}  # {channel_id: 429 count}
+        self.sends_total = metrics.counter(
+            'nicebot_sends_total', 'Messages sent through the send queue', ('priority',)
+        )
+        self.coalesced_total = metrics.counter(
+            'nicebot_sends_coalesced_total', 'Trigger responses merged into another send'
+        )
+        self.rate_limited_total = metrics.counter(
+            'nicebot_rate_limited_total', 'Requests Discord answered with 429 Too Many Requests'
+        )
+        metrics.gauge(
+            'nicebot_send_queue_depth', 'Sends waiting in all channel queues'
+        ).set_function(self.depth)
+
+    def queue_for(self, channel_id: int) -> ChannelSendQueue:
+        queue = self.queues.get(channel_id)
+        if queue is None:
+            queue = self.queues[channel_id] = ChannelSendQueue(self, channel_id)
+        return queue
+
+    def depth(self) -> int:
+        """Return the number of sends waiting in all channel queues."""
+        return sum(len(queue.heap) for queue in list(self.queues.values()))
+
+    def send_trigger(self, channel, content: str, coalesce_key: str = None, **kwargs):
+        """
+        Queue a low-priority trigger response (returns without waiting for it).
+
+        Args:
+            channel: Channel to send to
+            content: Message text
+            coalesce_key: Responses with the same key that are waiting in the
+                same channel are merged into one, with a ×count suffix
+            **kwargs: Passed to channel.send
+        """
+        queue = self.queue_for(channel.id)
+        pending = queue.coalescable.get(coalesce_key) if coalesce_key else None
+        if pending is not None:
+            pending.count += 1
+            self.coalesced += 1
+            self.coalesced_total.inc()
+            return
+
+        async def deliver(text):
+            return await channel.send(text, **kwargs)
+
+        queue.add(QueuedSend(LOW, deliver, content, coalesce_key))
+
+    async def send_reply(self, channel_id: int, deliver, content=None):
+        """
+        Queue a high-priority command reply and wait until it's sent.
+
+        Args:
+            channel_id: Channel the reply goes to
+            deliver: Async function(content) that actually sends it
+            content: Message text (may be None for embed-only replies)
+
+        Returns:
+            The sent message
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.queue_for(channel_id).add(QueuedSend(HIGH, deliver, content, future=future))
+        return await future
+
+    async def deliver(self, item: QueuedSend):
+        """Send one queued item and resolve its future."""
+        content = item.content
+        if item.count > 1:
+            content = f"{content} ×{item.count}"
+
+        try:
+            message = await item.deliver(content)
+        except Exception as e:
+            if item.future is not None:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            else:
+                logger.error(f'Error sending trigger response: {e}')
+            return
+
+        priority = 'high' if item.priority == HIGH else 'low'
+        self.sent[item.priority] += 1
+        self.sends_total.inc(priority)
+        if item.future is not None and not item.future.done():
+            item.future.set_result(message)
+
+    async def drain(self):
+        """Wait until every channel queue is empty (e.g. before shutdown)."""
+        while self.queues:
+            await asyncio.gather(*(queue.worker for queue in list(self.queues.values()) if queue.worker))
+
+    def cancel(self):
+        """Drop all pending sends (on shutdown)."""
+        for queue in list(self.queues.values()):
+            if queue.worker:
+                queue.worker.cancel()
+
+    def record_rate_limit(self, channel_id: int = None):
+        """Count a 429 response, per channel when the request was for one."""
+        self.rate_limited += 1
+        self.rate_limited_total.inc()
+        if channel_id is not None:
+            self.rate_limited_channels[channel_id] = self.rate_limited_channels.get(channel_id, 0) + 1
+
+
+class RateLimitCounter(logging.Handler):
+    """Logging handler on discord.http that counts 429 responses into a SendScheduler."""
+
+    def __init__(self, scheduler: SendScheduler):
+        super().__init__(level=logging.WARNING)
+        self.scheduler = scheduler
+
+    def emit(self, record):
+        if not isinstance(record.msg, str) or not record.msg.startswith(RATE_LIMIT_LOG_PREFIX):
+            return
+        # Logged as (fmt, method, url, retry_after)
+        url = str(record.args[1]) if isinstance(record.args, tuple) and len(record.args) > 1 else ''
+        match = CHANNEL_URL_PATTERN.search(url)
+        self.scheduler.record_rate_limit(int(match.group(1)) if match else None)
+
+
+class QueuedContext(commands.Context):
+    """Command context whose replies go through the bot's send queue at high priority."""
+
+    async def send(self, content=None, **kwargs):
+        scheduler = getattr(self.bot, 'send_queue', None)
+        if scheduler is None or self.interaction is not None:
+            return await self.deliver(content, **kwargs)
+
+        async def deliver(text):
+            return await self.deliver(text, **kwargs)
+
+        return await scheduler.send_reply(self.channel.id, deliver, content)
+
+    async def deliver(self, content=None, **kwargs):
+        """Actually send a reply (bypassing the queue)."""
+        return await super().send(content, **kwargs)
+
+    async def defer(self, *, ephemeral: bool = False):
+        # The HTTP interactions endpoint defers every command in its response already
+        if self.interaction is not None and self.interaction.response.is_done():
+            return
+        await super().defer(ephemeral=ephemeral)
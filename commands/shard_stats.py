@@ -0,0 +1,40 @@
+"""Shard stats - per-shard event counters with a rolling rate window."""
+
+import time
+from collections import defaultdict, deque
+
+
+def shard_id_for(guild) -> int:
+    """Return the shard a guild is served by (DMs always arrive on shard 0)."""
+    if guild is None or guild.shard_id is None:
+        return 0
+    return guild.shard_id
+
+
+class ShardStats:
+    """Counts events per shard and reports their rate over the last window_seconds."""
+
+    def __init__(self, window_seconds: int = 60):
+        self.window_seconds = window_seconds
+        self.totals = defaultdict(int)  # {shard_id: event count since start}
+        self.buckets = defaultdict(deque)  # {shard_id: deque of [second, count]}
+
+    def record(self, shard_id: int):
+        """Count one event for a shard (O(1) amortized)."""
+        now = int(time.monotonic())
+        self.totals[shard_id] += 1
+
+        buckets = self.buckets[shard_id]
+        if buckets and buckets[-1][0] == now:
+            buckets[-1][1] += 1
+        else:
+            buckets.append([now, 1])
+            # Drop buckets that fell out of the window
+            while buckets[0][0] <= now - self.window_seconds:
+                buckets.popleft()
+
+    def rate(self, shard_id: int) -> float:
+        """Return events per second for a shard, averaged over the window."""
+        cutoff = int(time.monotonic()) - self.window_seconds
+        recent = sum(count for second, count in self.buckets.get(shard_id, ()) if second > cutoff)
+        return recent / self.window_seconds
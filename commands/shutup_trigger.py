@@ -16,12 +16,12 @@ class ShutUpTriggerModule(BaseModule):
 
     async def setup(self):
         """Set up the shut up trigger module."""
-        self.bot.add_listener(self.on_message, 'on_message')
+        self.add_message_listener(self.on_message)
         self.logger.info(f"✓ Loaded module: {self.name}")
 
     async def teardown(self):
         """Clean up the shut up trigger module."""
-        self.bot.remove_listener(self.on_message, 'on_message')
+        self.remove_message_listener(self.on_message)
 
     async def on_message(self, message):
         """Handle messages containing 'shut up'."""
@@ -33,4 +33,4 @@ class ShutUpTriggerModule(BaseModule):
 
         # Check if the message contains "shut up"
         if 'shut up' in message_lower:
-            await message.channel.send('No, u!')
+            await self.send_trigger_response(message.channel, 'No, u!', coalesce_key='shut_up')
@@ -0,0 +1,414 @@
+"""State store - shared state backend for running several bot processes at once.
+
+By default each module keeps its state in JSON files under data/. That only
+works with a single process. In cluster mode, every worker process uses a
+common StateStore instead. It offers Redis-style hashes (string fields and
+values) and time-limited leases, which are used to elect the one worker that
+runs scheduled singleton jobs.
+
+Store calls block (Redis is a network round trip), so code on the event loop
+runs them in a worker thread (BaseModule.store_call), and code that makes
+many at once uses the *_many batch calls, one round trip each.
+"""
+
+import os
+import time
+import socket
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+class StateStore(ABC):
+    """Base class for shared state backends."""
+
+    def __init__(self):
+        # Identifies this process as a lease owner
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    @abstractmethod
+    def hget(self, name: str, field: str):
+        """Return the value of a hash field, or None if it doesn't exist."""
+        pass
+
+    @abstractmethod
+    def hset(self, name: str, field: str, value: str):
+        """Set a hash field."""
+        pass
+
+    @abstractmethod
+    def hsetnx(self, name: str, field: str, value: str) -> bool:
+        """Set a hash field only if it doesn't exist yet. Returns True if it was set."""
+        pass
+
+    @abstractmethod
+    def hdel(self, name: str, *fields: str):
+        """Delete hash fields."""
+        pass
+
+    @abstractmethod
+    def hgetall(self, name: str) -> dict:
+        """Return all fields of a hash as a {field: value} dict."""
+        pass
+
+    @abstractmethod
+    def hincrby(self, name: str, field: str, amount: int = 1) -> int:
+        """Atomically add to an integer hash field and return the new value."""
+        pass
+
+    def hmget(self, name: str, fields: list) -> list:
+        """Return the values of some fields of a hash (None for missing ones), in the order of fields."""
+        return [self.hget(name, field) for field in fields]
+
+    @abstractmethod
+    def hset_if_expired(self, name: str, field: str, expires_at: float, now: float) -> bool:
+        """
+        Atomically set a field holding an expiry timestamp, unless it holds one later than now.
+
+        Returns:
+            True if it was set (the field was missing or had expired)
+        """
+        pass
+
+    def hset_if_expired_many(self, name: str, fields: list, expires_at: float, now: float) -> list:
+        """hset_if_expired() for several fields of a hash; returns the results in the order of fields."""
+        return [self.hset_if_expired(name, field, expires_at, now) for field in fields]
+
+    def hset_many(self, name: str, mapping: dict):
+        """Set several fields of a hash."""
+        for field, value in mapping.items():
+            self.hset(name, field, value)
+
+    def hgetall_many(self, names: list) -> list:
+        """Return all fields of several hashes, as a list of {field: value} dicts in the order of names."""
+        return [self.hgetall(name) for name in names]
+
+    def hincrby_many(self, increments: list) -> list:
+        """
+        Atomically add to several integer hash fields.
+
+        Args:
+            increments: [(name, field, amount)]
+
+        Returns:
+            The new values, in the order of increments
+        """
+        return [self.hincrby(name, field, amount) for name, field, amount in increments]
+
+    @abstractmethod
+    def acquire_lease(self, lease_name: str, ttl_seconds: float) -> bool:
+        """
+        Acquire or renew a named lease for this process.
+
+        Returns:
+            True if this process holds the lease for the next ttl_seconds
+        """
+        pass
+
+    def close(self):
+        """Release any connections held by the store."""
+        pass
+
+
+class SQLiteStateStore(StateStore):
+    """
+    State store in a local SQLite database file.
+
+    Several processes on the same host can share the file safely (WAL mode).
+    This is the default cluster backend and a local stand-in for Redis.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        # Modules are constructed in worker threads, so the connection is shared
+        # across threads and guarded by a lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS hashes ('
+            'name TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, '
+            'PRIMARY KEY (name, field)) WITHOUT ROWID'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS leases ('
+            'name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)'
+        )
+
+    def hget(self, name: str, field: str):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT value FROM hashes WHERE name = ? AND field = ?', (name, field)
+            ).fetchone()
+        return row[0] if row else None
+
+    def hset(self, name: str, field: str, value: str):
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO hashes (name, field, value) VALUES (?, ?, ?)',
+                (name, field, str(value))
+            )
+
+    def hsetnx(self, name: str, field: str, value: str) -> bool:
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT OR IGNORE INTO hashes (name, field, value) VALUES (?, ?, ?)',
+                (name, field, str(value))
+            )
+        return cursor.rowcount == 1
+
+    def hdel(self, name: str, *fields: str):
+        if not fields:
+            return
+        with self.lock:
+            self.conn.executemany(
+                'DELETE FROM hashes WHERE name = ? AND field = ?',
+                [(name, field) for field in fields]
+            )
+
+    def hgetall(self, name: str) -> dict:
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT field, value FROM hashes WHERE name = ?', (name,)
+            ).fetchall()
+        return dict(rows)
+
+    def hincrby(self, name: str, field: str, amount: int = 1) -> int:
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.execute(
+                    'INSERT INTO hashes (name, field, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name, field) DO UPDATE SET value = CAST(value AS INTEGER) + ?',
+                    (name, field, str(amount), amount)
+                )
+                row = self.conn.execute(
+                    'SELECT value FROM hashes WHERE name = ? AND field = ?', (name, field)
+                ).fetchone()
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return int(row[0])
+
+    def hmget(self, name: str, fields: list) -> list:
+        if not fields:
+            return []
+        with self.lock:
+            rows = self.conn.execute(
+                f'SELECT field, value FROM hashes WHERE name = ? AND field IN ({", ".join("?" * len(fields))})',
+                (name, *fields)
+            ).fetchall()
+        values = dict(rows)
+        return [values.get(field) for field in fields]
+
+    def hset_if_expired(self, name: str, field: str, expires_at: float, now: float) -> bool:
+        return self.hset_if_expired_many(name, [field], expires_at, now)[0]
+
+    def hset_if_expired_many(self, name: str, fields: list, expires_at: float, now: float) -> list:
+        results = []
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                for field in fields:
+                    cursor = self.conn.execute(
+                        'INSERT INTO hashes (name, field, value) VALUES (?, ?, ?) '
+                        'ON CONFLICT (name, field) DO UPDATE SET value = excluded.value '
+                        'WHERE CAST(hashes.value AS REAL) <= ?',
+                        (name, field, str(expires_at), now)
+                    )
+                    results.append(cursor.rowcount == 1)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return results
+
+    def hset_many(self, name: str, mapping: dict):
+        if not mapping:
+            return
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO hashes (name, field, value) VALUES (?, ?, ?)',
+                [(name, field, str(value)) for field, value in mapping.items()]
+            )
+
+    def hincrby_many(self, increments: list) -> list:
+        values = []
+        with self.lock:
+            # One transaction (and one fsync) for the whole batch
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                for name, field, amount in increments:
+                    row = self.conn.execute(
+                        'INSERT INTO hashes (name, field, value) VALUES (?, ?, ?) '
+                        'ON CONFLICT (name, field) DO UPDATE SET value = CAST(value AS INTEGER) + ? '
+                        'RETURNING value',
+                        (name, field, str(amount), amount)
+                    ).fetchone()
+                    values.append(int(row[0]))
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return values
+
+    def acquire_lease(self, lease_name: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        with self.lock:
+            # Take the lease if it is free, expired, or already ours
+            self.conn.execute(
+                'INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires '
+                'WHERE leases.owner = excluded.owner OR leases.expires < ?',
+                (lease_name, self.owner, now + ttl_seconds, now)
+            )
+            row = self.conn.execute('SELECT owner FROM leases WHERE name = ?', (lease_name,)).fetchone()
+        return row is not None and row[0] == self.owner
+
+    def backup_to(self, dest_path: str):
+        """
+        Write a consistent copy of the database to dest_path.
+
+        The database file can't simply be copied while workers write to it
+        (recent writes live in the -wal file), so this uses SQLite's online
+        backup, which copies one point-in-time snapshot.
+        """
+        source = sqlite3.connect(self.path, timeout=10)
+        dest = sqlite3.connect(dest_path)
+        try:
+            source.backup(dest)
+        finally:
+            dest.close()
+            source.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# Take the lease if it is free, or renew it if it is already ours, in one step
+# (KEYS[1]: lease key, ARGV[1]: owner, ARGV[2]: TTL in milliseconds)
+LEASE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# Set a hash field to an expiry timestamp unless it holds one later than now
+# (KEYS[1]: hash key, ARGV[1]: field, ARGV[2]: expiry, ARGV[3]: now)
+SET_IF_EXPIRED_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if current and tonumber(current) > tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+
+
+class RedisStateStore(StateStore):
+    """State store on a Redis-compatible server, for workers spread over several hosts."""
+
+    def __init__(self, url: str, prefix: str = 'nicebot:'):
+        super().__init__()
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.lease_script = self.client.register_script(LEASE_SCRIPT)
+        self.set_if_expired_script = self.client.register_script(SET_IF_EXPIRED_SCRIPT)
+
+    def hget(self, name: str, field: str):
+        return self.client.hget(self.prefix + name, field)
+
+    def hset(self, name: str, field: str, value: str):
+        self.client.hset(self.prefix + name, field, str(value))
+
+    def hsetnx(self, name: str, field: str, value: str) -> bool:
+        return bool(self.client.hsetnx(self.prefix + name, field, str(value)))
+
+    def hdel(self, name: str, *fields: str):
+        if fields:
+            self.client.hdel(self.prefix + name, *fields)
+
+    def hgetall(self, name: str) -> dict:
+        return self.client.hgetall(self.prefix + name)
+
+    def hincrby(self, name: str, field: str, amount: int = 1) -> int:
+        return int(self.client.hincrby(self.prefix + name, field, amount))
+
+    def hmget(self, name: str, fields: list) -> list:
+        return self.client.hmget(self.prefix + name, fields) if fields else []
+
+    def hset_if_expired(self, name: str, field: str, expires_at: float, now: float) -> bool:
+        return self.set_if_expired_script(keys=[self.prefix + name], args=[field, str(expires_at), now]) == 1
+
+    def hset_if_expired_many(self, name: str, fields: list, expires_at: float, now: float) -> list:
+        pipe = self.client.pipeline(transaction=False)
+        for field in fields:
+            self.set_if_expired_script(keys=[self.prefix + name], args=[field, str(expires_at), now], client=pipe)
+        return [result == 1 for result in pipe.execute()]
+
+    def hset_many(self, name: str, mapping: dict):
+        if mapping:
+            self.client.hset(self.prefix + name, mapping={field: str(value) for field, value in mapping.items()})
+
+    def hgetall_many(self, names: list) -> list:
+        pipe = self.client.pipeline(transaction=False)
+        for name in names:
+            pipe.hgetall(self.prefix + name)
+        return pipe.execute()
+
+    def hincrby_many(self, increments: list) -> list:
+        pipe = self.client.pipeline(transaction=False)
+        for name, field, amount in increments:
+            pipe.hincrby(self.prefix + name, field, amount)
+        return [int(value) for value in pipe.execute()]
+
+    def acquire_lease(self, lease_name: str, ttl_seconds: float) -> bool:
+        key = f"{self.prefix}lease:{lease_name}"
+        return self.lease_script(keys=[key], args=[self.owner, int(ttl_seconds * 1000)]) == 1
+
+    def close(self):
+        self.client.close()
+
+
+def create_state_store(config: dict, data_dir: str = "data"):
+    """
+    Create the state store selected by 'state_backend' in config.
+
+    Args:
+        config: Configuration dictionary
+        data_dir: Directory for persistent data storage
+
+    Returns:
+        A StateStore, or None for the default per-process JSON files ('json')
+    """
+    backend = config.get('state_backend', 'json')
+
+    if backend == 'sqlite':
+        return SQLiteStateStore(config.get('state_sqlite_path', os.path.join(data_dir, 'state.db')))
+
+    if backend == 'redis':
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package not installed. Run: pip install redis")
+        return RedisStateStore(config.get('state_redis_url', 'redis://localhost:6379/0'))
+
+    if backend != 'json':
+        raise ValueError(f"Unknown state_backend: {backend}")
+
+    return None
@@ -0,0 +1,65 @@
+"""State versions - tells a process when another one changed shared settings.
+
+Settings kept in the state store (custom triggers, Friday subscriptions,
+module routing) are read into memory once and then used from there. With
+several processes on one store, such as gateway workers next to slash
+command endpoint processes, a change made in one process has to reach the
+others. After writing, the writer bumps a version field in the
+'state_versions' hash; readers compare that version with the one they last
+read, at most every 'state_refresh_seconds', and read the settings again when
+it moved. Endpoint processes check on every command, since any of them may
+have served the change.
+"""
+
+import time
+import asyncio
+from . import flush_store_writes, queue_store_write
+
+VERSIONS_HASH = 'state_versions'
+
+
+class StateVersions:
+    """Versions of settings a process has read from the state store."""
+
+    def __init__(self, state_store, config: dict):
+        """
+        Args:
+            state_store: Shared state store (None: nothing to check)
+            config: Configuration dictionary ('state_refresh_seconds', 'interactions_endpoint')
+        """
+        self.state_store = state_store
+        self.refresh_seconds = 0 if config.get('interactions_endpoint') else config.get('state_refresh_seconds', 30)
+        self.checked = {}  # {key: time.monotonic() of the last check}
+        self.versions = {}  # {key: version last read}
+
+    def due(self, key: str) -> bool:
+        """Return whether key should be checked again (it never was, or refresh_seconds passed)."""
+        if self.state_store is None:
+            return False
+        checked = self.checked.get(key)
+        return checked is None or time.monotonic() - checked >= self.refresh_seconds
+
+    async def changed(self, key: str) -> bool:
+        """
+        Check key's version in the store.
+
+        Returns:
+            True if it moved since the last check (or was never checked), so
+            the settings must be read again
+        """
+        self.checked[key] = time.monotonic()
+        # This process's queued writes land first, so reading again can't undo them
+        await asyncio.to_thread(flush_store_writes)
+        version = await asyncio.to_thread(self.state_store.hget, VERSIONS_HASH, key)
+        if key in self.versions and self.versions[key] == version:
+            return False
+        self.versions[key] = version
+        return True
+
+    async def refresh_due(self, key: str) -> bool:
+        """Return whether key's settings must be read again now (due() and changed())."""
+        return self.due(key) and await self.changed(key)
+
+    def bump(self, key: str):
+        """Tell other processes key's settings changed (queued after this process's writes)."""
+        queue_store_write(self.state_store.hincrby, VERSIONS_HASH, key, 1)
@@ -1,6 +1,7 @@
 """Stock command module - fetch stock prices using Yahoo Finance."""
 
 import time
+import asyncio
 import discord
 from discord.ext import commands
 from . import BaseModule
@@ -9,6 +10,9 @@ from . import BaseModule
 class StockModule(BaseModule):
     """Module for the !stock command to fetch stock prices."""
 
+    state_attributes = ('cache',)
+    slow_commands = ('stock',)
+
     def __init__(self, bot, config: dict, data_dir: str = "data"):
         super().__init__(bot, config, data_dir)
         self.cache = {}  # {ticker: {'data': {...}, 'expires': timestamp}}
@@ -26,7 +30,7 @@ class StockModule(BaseModule):
         """Set up the stock module."""
 
         # Create wrapper function for the command
-        @commands.command(name='stock')
+        @commands.hybrid_command(name='stock', description='Stock price and market data for a ticker')
         async def stock_cmd(ctx, ticker: str = None):
             await self.stock_command(ctx, ticker)
 
@@ -70,7 +74,9 @@ class StockModule(BaseModule):
         if ticker in self.cache:
             cached = self.cache[ticker]
             if time.time() < cached['expires']:
+                self.record_cache('stock', hit=True)
                 return cached['data']
+        self.record_cache('stock', hit=False)
         return None
 
     def cache_data(self, ticker: str, data: dict):
@@ -80,6 +86,13 @@ class StockModule(BaseModule):
             'expires': time.time() + self.cache_duration
         }
 
+    def fetch_ticker_info(self, ticker: str) -> dict:
+        """Fetch raw ticker info from Yahoo Finance (blocking, runs in a worker thread)."""
+        import yfinance as yf
+
+        # Create ticker object and get info (this makes the API call)
+        return yf.Ticker(ticker).info
+
     async def fetch_stock_data(self, ticker: str) -> tuple:
         """
         Fetch stock data using yfinance.
@@ -91,13 +104,9 @@ class StockModule(BaseModule):
             (data_dict, error_message)
         """
         try:
-            import yfinance as yf
-
-            # Create ticker object
-            stock = yf.Ticker(ticker)
-
-            # Get info (this makes the API call)
-            info = stock.info
+            # yfinance is synchronous (and slow to import), so run it in a thread
+            with self.track_call('yahoo_finance'):
+                info = await asyncio.get_running_loop().run_in_executor(None, self.fetch_ticker_info, ticker)
 
             # Check if we got valid data
             if not info or 'symbol' not in info:
@@ -278,7 +287,7 @@ class StockModule(BaseModule):
             return
 
         # Send "fetching" message
-        fetching_msg = await ctx.send(f"🔍 Fetching stock data for **{ticker}**...")
+        fetching_msg = await self.send_placeholder(ctx, f"🔍 Fetching stock data for **{ticker}**...")
 
         # Fetch data
         data, error = await self.fetch_stock_data(ticker)
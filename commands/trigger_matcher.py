@@ -0,0 +1,158 @@
+"""Trigger matcher - finds which of a guild's custom trigger rules a message hits.
+
+Checking thousands of patterns one by one would cost thousands of substring
+searches per message. Instead all of a guild's patterns are compiled into one
+Aho-Corasick automaton: a trie of the patterns whose nodes also link to the
+longest suffix that is itself a trie prefix, so a single left-to-right pass
+over the message finds every pattern it contains, however many rules there
+are.
+
+A TriggerMatcher is immutable once built. When a guild gets a new pattern,
+the custom triggers module builds a new one in a worker thread and then
+replaces the guild's matcher in one assignment, so messages are always
+matched against a complete rule set. Changing a rule's responses, cooldown
+or channels, or removing a rule, leaves the automaton as it is: with_rule()
+and without_rule() return a copy sharing it, with only the rules changed
+(a removed rule's pattern stays in the automaton, unmatched, until the next
+build).
+"""
+
+import copy
+from collections import deque
+
+
+class TriggerRule:
+    """One custom trigger of a guild."""
+
+    __slots__ = ('rule_id', 'pattern', 'responses', 'cooldown', 'channels')
+
+    def __init__(self, rule_id: int, pattern: str, responses: list, cooldown: float = 0, channels: list = None):
+        self.rule_id = rule_id
+        self.pattern = pattern.lower()
+        self.responses = responses
+        self.cooldown = cooldown  # Seconds per channel
+        self.channels = frozenset(channels or ())  # Channel IDs (str) it fires in; empty = everywhere
+
+    @classmethod
+    def from_dict(cls, rule_id: int, data: dict):
+        return cls(rule_id, data['pattern'], data['responses'], data.get('cooldown', 0), data.get('channels'))
+
+    def to_dict(self) -> dict:
+        return {
+            'pattern': self.pattern,
+            'responses': self.responses,
+            'cooldown': self.cooldown,
+            'channels': sorted(self.channels),
+        }
+
+    def applies_in(self, channel_id: str) -> bool:
+        return not self.channels or channel_id in self.channels
+
+
+class TriggerMatcher:
+    """Aho-Corasick automaton over the patterns of a set of rules."""
+
+    def __init__(self, rules: list):
+        """Build the automaton (can take a moment for thousands of rules, so run it off the loop)."""
+        self.rules = {rule.rule_id: rule for rule in rules}
+        # Node 0 is the root; goto[node] maps a character to the next node
+        self.goto = [{}]
+        self.fail = [0]
+        # Patterns ending at a node (its own and those of its suffix links): [(pattern length, rule ID)]
+        self.out = [()]
+        # Rules whose pattern is in the automaton (the compiled ones, minus removed ones)
+        self.compiled_patterns = {rule.rule_id: rule.pattern for rule in rules}
+
+        for rule in sorted(rules, key=lambda rule: rule.rule_id):
+            node = 0
+            for char in rule.pattern:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                node = next_node
+            self.out[node] += ((len(rule.pattern), rule.rule_id),)
+
+        # Breadth-first, so a node's suffix link target is finished before the node
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                link = self.fail[node]
+                while link and char not in self.goto[link]:
+                    link = self.fail[link]
+                target = self.goto[link].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.out[child] += self.out[self.fail[child]]
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @property
+    def dead_patterns(self) -> int:
+        """Patterns of removed rules still in the automaton."""
+        return len(self.compiled_patterns) - len(self.rules)
+
+    def with_rule(self, rule: TriggerRule):
+        """
+        Return a matcher with a rule's settings replaced, sharing this automaton.
+
+        Raises:
+            ValueError: If the rule's pattern isn't compiled in (a new rule or
+                pattern needs a new TriggerMatcher)
+        """
+        if self.compiled_patterns.get(rule.rule_id) != rule.pattern:
+            raise ValueError(f'Pattern of rule {rule.rule_id} is not in the automaton')
+        matcher = copy.copy(self)
+        matcher.rules = {**self.rules, rule.rule_id: rule}
+        return matcher
+
+    def without_rule(self, rule_id: int):
+        """Return a matcher that no longer matches a rule, sharing this automaton."""
+        matcher = copy.copy(self)
+        matcher.rules = {other_id: rule for other_id, rule in self.rules.items() if other_id != rule_id}
+        return matcher
+
+    def matches(self, text: str) -> list:
+        """
+        Return the rules whose pattern appears in text as whole words, in the order they end.
+
+        Args:
+            text: Message content, lowercased
+        """
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        rules = self.rules
+        found = []
+        seen = set()
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if not out[node]:
+                continue
+            for length, rule_id in out[node]:
+                if rule_id in seen or not is_whole_word(text, end + 1 - length, end + 1):
+                    continue
+                rule = rules.get(rule_id)
+                if rule is None:
+                    # Removed since the automaton was built
+                    continue
+                seen.add(rule_id)
+                found.append(rule)
+        return found
+
+
+def is_whole_word(text: str, start: int, end: int) -> bool:
+    """Return whether text[start:end] isn't part of a longer word (punctuation edges always count)."""
+    if start > 0 and text[start].isalnum() and text[start - 1].isalnum():
+        return False
+    if end < len(text) and text[end - 1].isalnum() and text[end].isalnum():
+        return False
+    return True
@@ -18,7 +18,7 @@ class TriggersModule(BaseModule):
 
     async def setup(self):
         """Set up the triggers module."""
-        @commands.command(name='triggers')
+        @commands.hybrid_command(name='triggers', description='Bot help: triggers and commands')
         async def triggers_cmd(ctx):
             await self.triggers_command(ctx)
 
@@ -49,12 +49,13 @@ class TriggersModule(BaseModule):
             "**!chat** `<prompt>` - Chat with AI (remembers context) 🤖\n"
             "  • `!chat reset` - Clear your conversation\n"
             "  • `!chat history` - Show conversation stats\n"
-            "**!friday** - Friday celebration (Fridays only!)\n"
+            "**!friday** [subscribe|unsubscribe|time] - Friday celebration (Fridays only!)\n"
             "**!bartender** - Link to Bartender song 🍹\n"
-            "**!count** - Nice count statistics\n"
+            "**!count** [today|week|trend|top] - Nice count statistics\n"
             "**!search** `<query>` - DuckDuckGo search\n"
-            "**!backup** - Manual backup to Dropbox (admin only) ☁️\n"
-            "**!triggers** - Show this help message"
+            "**!shards** - Shard latency and message rates 🧩\n"
+            "**!triggers** - Show this help message\n"
+            "_Module commands also work as slash commands, e.g. `/weather`_"
         )
         embed.add_field(
             name="📋 Commands",
@@ -62,6 +63,22 @@ class TriggersModule(BaseModule):
             inline=False
         )
 
+        # Server management and admin commands (a field holds at most 1024 characters)
+        admin_text = (
+            "**!trigger** add|remove|cooldown|channels|list - Custom triggers (Manage Server) ✨\n"
+            "**!modules** - Turn modules on/off per server or channel (Manage Server) 🎛️\n"
+            "**!backfill** `<#channels|all>` [before date] - Count nice in old messages ⏪\n"
+            "**!backup** - Manual backup ☁️\n"
+            "**!reload** `<module>` - Reload a module 🔄\n"
+            "**!stalls** - Event loop stalls 🐢\n"
+            "**!memstats** - Memory per cache and module 🧠"
+        )
+        embed.add_field(
+            name="🛠️ Server & Admin Commands",
+            value=admin_text,
+            inline=False
+        )
+
         # Automatic triggers section
         triggers_text = (
             "**nice** → Responds \"Nice!\" 🎉\n"
@@ -69,7 +86,8 @@ class TriggersModule(BaseModule):
             "**eagles** → Random Eagles chant 🦅\n"
             "  _(10-minute cooldown per channel)_\n"
             "**fuck dallas** → Random Eagles chant 🦅\n"
-            "  _(no cooldown, always responds)_"
+            "  _(no cooldown, always responds)_\n"
+            "Plus this server's own triggers, see `!trigger list`"
         )
         embed.add_field(
             name="⚡ Automatic Triggers",
@@ -13,11 +13,15 @@ from . import BaseModule
 class WeatherModule(BaseModule):
     """Module for weather commands (!weather and !setlocation)."""
 
+    state_attributes = ('user_locations',)
+    slow_commands = ('weather', 'forecast')
+
     def __init__(self, bot: commands.Bot, config: dict, data_dir: str = "data"):
         super().__init__(bot, config, data_dir)
         self.user_locations = {}
         self.locations_file = os.path.join(data_dir, 'user_locations.json')
         self.weather_api_key = config.get('weather_api_key')
+        self.load_locations()
 
     @property
     def name(self) -> str:
@@ -29,18 +33,16 @@ class WeatherModule(BaseModule):
 
     async def setup(self):
         """Set up the weather module."""
-        self.load_locations()
-
         # Create wrapper functions for the commands
-        @commands.command(name='weather')
+        @commands.hybrid_command(name='weather', description='Current weather for a US zip code')
         async def weather_cmd(ctx, zip_code: str = None):
             await self.weather_command(ctx, zip_code)
 
-        @commands.command(name='setlocation')
+        @commands.hybrid_command(name='setlocation', description='Save your zip code for weather and forecast')
         async def setlocation_cmd(ctx, zip_code: str):
             await self.setlocation_command(ctx, zip_code)
 
-        @commands.command(name='forecast')
+        @commands.hybrid_command(name='forecast', description='5-day forecast for a US zip code')
         async def forecast_cmd(ctx, zip_code: str = None):
             await self.forecast_command(ctx, zip_code)
 
@@ -59,20 +61,45 @@ class WeatherModule(BaseModule):
         self.bot.remove_command('setlocation')
 
     def load_locations(self):
-        """Load user locations from file if it exists."""
+        """Load user locations from file if it exists (or import it into the state store once)."""
         try:
             if os.path.exists(self.locations_file):
+                if self.state_store:
+                    if self.claim_migration('user_locations'):
+                        with open(self.locations_file, 'r') as f:
+                            for user_id, zip_code in json.load(f).items():
+                                self.state_store.hsetnx('user_locations', user_id, zip_code)
+                        self.logger.info(f'Imported user locations from {self.locations_file} into the state store')
+                    return
+
                 with open(self.locations_file, 'r') as f:
                     self.user_locations = json.load(f)
                 self.logger.info(f'Loaded user locations from {self.locations_file}')
         except Exception as e:
             self.logger.warning(f'Error loading locations: {e}')
 
+    async def get_location(self, user_id: str):
+        """Return a user's saved zip code, or None."""
+        if self.state_store:
+            return await self.store_call('hget', 'user_locations', user_id)
+        return self.user_locations.get(user_id)
+
+    async def set_location(self, user_id: str, zip_code: str):
+        """Save a user's zip code."""
+        if self.state_store:
+            await self.store_call('hset', 'user_locations', user_id, zip_code)
+            return
+        self.user_locations[user_id] = zip_code
+        self.save_locations()
+
     def save_locations(self):
         """Save user locations to file."""
+        if self.state_store:
+            # Locations are written to the state store as they are set
+            return
+
         try:
-            with open(self.locations_file, 'w') as f:
-                json.dump(self.user_locations, f, indent=2)
+            self.write_json(self.locations_file, self.user_locations, indent=2)
         except Exception as e:
             self.logger.error(f'Error saving locations: {e}')
 
@@ -89,17 +116,19 @@ class WeatherModule(BaseModule):
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data, None
-                    elif response.status == 404:
-                        return None, "Invalid zip code. Please check and try again."
-                    elif response.status == 401:
-                        return None, "Invalid API key. Please check your OpenWeatherMap API key."
-                    else:
-                        return None, f"Weather service error (status {response.status})"
+            with self.track_call('openweathermap') as call:
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(url, params=params) as response:
+                        call.error = response.status != 200
+                        if response.status == 200:
+                            data = await response.json()
+                            return data, None
+                        elif response.status == 404:
+                            return None, "Invalid zip code. Please check and try again."
+                        elif response.status == 401:
+                            return None, "Invalid API key. Please check your OpenWeatherMap API key."
+                        else:
+                            return None, f"Weather service error (status {response.status})"
         except Exception as e:
             return None, f"Error fetching weather: {str(e)}"
 
@@ -116,17 +145,19 @@ class WeatherModule(BaseModule):
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data, None
-                    elif response.status == 404:
-                        return None, "Invalid zip code. Please check and try again."
-                    elif response.status == 401:
-                        return None, "Invalid API key. Please check your OpenWeatherMap API key."
-                    else:
-                        return None, f"Forecast service error (status {response.status})"
+            with self.track_call('openweathermap') as call:
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(url, params=params) as response:
+                        call.error = response.status != 200
+                        if response.status == 200:
+                            data = await response.json()
+                            return data, None
+                        elif response.status == 404:
+                            return None, "Invalid zip code. Please check and try again."
+                        elif response.status == 401:
+                            return None, "Invalid API key. Please check your OpenWeatherMap API key."
+                        else:
+                            return None, f"Forecast service error (status {response.status})"
         except Exception as e:
             return None, f"Error fetching forecast: {str(e)}"
 
@@ -190,9 +221,8 @@ class WeatherModule(BaseModule):
 
         # If no zip code provided, try to use saved location
         if not zip_code:
-            if user_id in self.user_locations:
-                zip_code = self.user_locations[user_id]
-            else:
+            zip_code = await self.get_location(user_id)
+            if not zip_code:
                 await ctx.send("Please provide a zip code or save your location with `!setlocation <zipcode>`")
                 return
 
@@ -201,7 +231,8 @@ class WeatherModule(BaseModule):
             await ctx.send("Please provide a valid 5-digit US zip code")
             return
 
-        # Fetch weather data
+        # Fetch weather data (a slash command is deferred while it loads)
+        await ctx.defer()
         data, error = await self.fetch_weather(zip_code)
 
         if error:
@@ -314,6 +345,7 @@ class WeatherModule(BaseModule):
             return
 
         # Verify the zip code is valid by fetching weather
+        await ctx.defer()
         data, error = await self.fetch_weather(zip_code)
 
         if error:
@@ -322,8 +354,7 @@ class WeatherModule(BaseModule):
 
         # Save the location
         user_id = str(ctx.author.id)
-        self.user_locations[user_id] = zip_code
-        self.save_locations()
+        await self.set_location(user_id, zip_code)
 
         location = data['name']
         await ctx.send(f"Your location has been saved as {location} ({zip_code}). Use `!weather` without a zip code to get weather for your saved location.")
@@ -334,9 +365,8 @@ class WeatherModule(BaseModule):
 
         # If no zip code provided, try to use saved location
         if not zip_code:
-            if user_id in self.user_locations:
-                zip_code = self.user_locations[user_id]
-            else:
+            zip_code = await self.get_location(user_id)
+            if not zip_code:
                 await ctx.send("Please provide a zip code or save your location with `!setlocation <zipcode>`")
                 return
 
@@ -346,6 +376,7 @@ class WeatherModule(BaseModule):
             return
 
         # Fetch forecast data
+        await ctx.defer()
         data, error = await self.fetch_forecast(zip_code)
 
         if error:
@@ -1,35 +1,107 @@
+import sys
+import time
+import builtins
+
+# Process start time, used to report time-to-ready and the startup profile
+PROCESS_START = time.perf_counter()
+
+# Time spent on the first import of each top-level package (--profile-startup)
+import_times = {}
+
+
+def install_import_profiler():
+    """
+    Record how long the first import of each top-level package takes.
+
+    Installed before anything else is imported when running with
+    --profile-startup. Times are cumulative: a package's time includes the
+    dependencies it imports itself.
+    """
+    original_import = builtins.__import__
+    in_progress = set()
+
+    def profiled_import(name, globals=None, locals=None, fromlist=(), level=0):
+        package = name.partition('.')[0]
+        if level or package in sys.modules or package in in_progress:
+            return original_import(name, globals, locals, fromlist, level)
+
+        in_progress.add(package)
+        start = time.perf_counter()
+        try:
+            return original_import(name, globals, locals, fromlist, level)
+        finally:
+            import_times[package] = time.perf_counter() - start
+            in_progress.discard(package)
+
+    builtins.__import__ = profiled_import
+
+
+if '--profile-startup' in sys.argv:
+    install_import_profiler()
+
 import discord
 from discord.ext import commands
+from commands import flush_store_writes, queue_store_write, write_json_file
+from commands.shard_stats import ShardStats, shard_id_for
+from commands.state_store import create_state_store
+from commands.metrics import NULL_REGISTRY, MetricsServer, create_metrics
+from commands.loop_watchdog import LoopWatchdog
+from commands.overload import OverloadController
+from commands.send_queue import QueuedContext, RateLimitCounter, SendScheduler
+from commands.cooldowns import CooldownService
+from commands.events import EventBus
+from commands.responses import ResponseCatalog
+from commands.interactions import NACL_AVAILABLE, InteractionsServer
+from commands.routing import ALL_MODULES, ModuleRouter
+from commands import memstats
+from commands.log_pipeline import JsonFormatter, set_log_context, start_queue_logging
 import os
+import atexit
 import json
+import math
+import hashlib
+import signal
+import argparse
 import importlib
-import sys
+import subprocess
+import asyncio
 import logging
+import tracemalloc
 
 
 def setup_logging():
-    """Configure logging for the bot."""
+    """
+    Configure logging for the bot.
+
+    Log lines are queued and written by a background thread, so a slow stdout
+    never blocks the event loop. LOG_FORMAT=json switches to JSON lines with
+    guild/channel/command fields; LOG_DEBUG_RATE limits each DEBUG call site
+    to that many lines per second (default 10, 0 for no limit).
+    """
     # Get log level from environment variable (default: INFO)
     log_level_str = os.getenv('LOG_LEVEL', 'INFO').upper()
     log_level = getattr(logging, log_level_str, logging.INFO)
 
-    # Create formatter with timestamp
-    formatter = logging.Formatter(
-        fmt='%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-
-    # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(log_level)
+    # Label lines with the worker number when running as a cluster worker
+    worker = os.getenv('NICEBOT_WORKER')
+    worker_label = f'worker {worker} | ' if worker is not None else ''
 
-    # Create console handler (stdout)
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(log_level)
-    console_handler.setFormatter(formatter)
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        formatter = JsonFormatter(worker=worker)
+    else:
+        # Create formatter with timestamp
+        formatter = logging.Formatter(
+            fmt=f'%(asctime)s | %(levelname)-8s | {worker_label}%(name)s | %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
 
-    # Add handler to root logger
-    root_logger.addHandler(console_handler)
+    # Write log lines from a background thread; flush what's queued on exit
+    listener = start_queue_logging(
+        formatter,
+        log_level,
+        debug_rate_per_second=float(os.getenv('LOG_DEBUG_RATE', '10')),
+    )
+    atexit.register(listener.stop)
 
     # Reduce discord.py logging noise
     logging.getLogger('discord').setLevel(logging.WARNING)
@@ -38,12 +110,189 @@ def setup_logging():
     return logging.getLogger(__name__)
 
 
-# Set up bot with necessary intents
-intents = discord.Intents.default()
-intents.message_content = True  # Required to read message content
+class NiceBotMixin:
+    """
+    Loads modules once at startup, can hold events during a module swap,
+    counts events per shard, times commands and listeners for metrics and
+    tags their log lines with the guild, channel and command.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # While not None, dispatched events are queued here instead of delivered
+        self.held_events = None
+        self.hold_depth = 0
+        # Message events per shard, reported by !shards
+        self.shard_stats = ShardStats()
+        # Metrics registry, replaced by enable_metrics() when metrics are on
+        self.metrics = NULL_REGISTRY
+        self.metrics_server = None
+        # Reports blocking calls, see !stalls
+        self.loop_watchdog = None
+        # Sheds low-priority work when the bot falls behind ('overload_enabled')
+        self.overload = None
+        # Per-channel outbound queue ('send_queue_enabled'), set by create_bot()
+        self.send_queue = None
+        self.rate_limit_counter = None
+        # Shared trigger/command cooldowns, set by create_bot()
+        self.cooldowns = None
+        # Typed event bus modules publish to and subscribe on, set by create_bot()
+        self.events = None
+        # Trigger responses from eagles_responses.json, set by create_bot()
+        self.response_catalog = None
+        # Which modules are enabled in which channel, set by create_bot()
+        self.router = None
+
+    def enable_metrics(self, registry):
+        """Use a metrics registry and register the bot-level metrics in it."""
+        self.metrics = registry
+        self.command_invocations = registry.counter(
+            'nicebot_command_invocations_total', 'Command invocations by result', ('command', 'status')
+        )
+        self.command_duration = registry.histogram(
+            'nicebot_command_duration_seconds', 'Time to run a command', ('command',)
+        )
+        self.listener_duration = registry.histogram(
+            'nicebot_listener_duration_seconds', 'Time to run an event listener', ('listener',)
+        )
+        registry.gauge(
+            'nicebot_gateway_latency_seconds', 'Gateway heartbeat latency (average over shards)'
+        ).set_function(lambda: self.latency)
+
+    async def get_context(self, origin, /, *, cls=QueuedContext):
+        # Command replies go through the send queue at high priority
+        return await super().get_context(origin, cls=cls)
+
+    async def invoke(self, ctx):
+        # Log lines of this command carry its guild, channel and name
+        set_log_context(ctx)
+        if not self.metrics.enabled or ctx.command is None:
+            return await super().invoke(ctx)
+
+        command_name = ctx.command.qualified_name
+        start = time.perf_counter()
+        try:
+            await super().invoke(ctx)
+        finally:
+            self.command_duration.observe(time.perf_counter() - start, command_name)
+            # Command errors are handled inside invoke(), so check the context
+            self.command_invocations.inc(command_name, 'error' if ctx.command_failed else 'ok')
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        # Each listener runs in its own task, so this only tags its own log lines
+        if args and isinstance(args[0], discord.Message):
+            set_log_context(args[0])
+        if not self.metrics.enabled:
+            return await super()._run_event(coro, event_name, *args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+        finally:
+            listener_name = getattr(coro, '__qualname__', event_name)
+            self.listener_duration.observe(time.perf_counter() - start, listener_name)
+
+    def dispatch(self, event_name: str, /, *args, **kwargs):
+        if self.held_events is not None:
+            self.held_events.append((event_name, args, kwargs))
+            return
+        if event_name == 'message':
+            self.shard_stats.record(shard_id_for(args[0].guild))
+        super().dispatch(event_name, *args, **kwargs)
+
+    def hold_events(self):
+        """Start queueing dispatched events instead of delivering them (nestable)."""
+        self.hold_depth += 1
+        if self.held_events is None:
+            self.held_events = []
 
-# Create bot instance
-bot = commands.Bot(command_prefix='!', intents=intents)
+    def release_events(self) -> int:
+        """Deliver queued events in order once the outermost hold is released."""
+        self.hold_depth -= 1
+        if self.hold_depth > 0:
+            return 0
+        held, self.held_events = self.held_events or [], None
+        for event_name, args, kwargs in held:
+            self.dispatch(event_name, *args, **kwargs)
+        return len(held)
+
+    async def setup_hook(self):
+        """
+        Load modules once, before the bot connects to the gateway.
+
+        discord.py calls this a single time per start(). on_ready, by contrast,
+        fires again on every gateway reconnect, so loading modules there would
+        register duplicate listeners and commands.
+        """
+        if self.metrics.enabled:
+            self.metrics_server = MetricsServer(
+                self.metrics,
+                host=self.config.get('metrics_host', '127.0.0.1'),
+                port=self.config.get('metrics_port', 9100),
+            )
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                logger.error(f'✗ Could not start metrics server: {e}')
+                self.metrics_server = None
+
+        if self.send_queue:
+            # discord.py retries 429s itself; count them from its log
+            self.rate_limit_counter = RateLimitCounter(self.send_queue)
+            logging.getLogger('discord.http').addHandler(self.rate_limit_counter)
+
+        if self.config.get('loop_watchdog_enabled', True):
+            self.loop_watchdog = LoopWatchdog(
+                self.metrics,
+                threshold_seconds=self.config.get('loop_stall_threshold_ms', 250) / 1000,
+            )
+            self.loop_watchdog.start()
+
+        if self.config.get('overload_enabled', True):
+            self.start_overload_controller()
+
+        if self.cooldowns:
+            self.cooldowns.start()
+        await setup_modules(self.config)
+
+    def start_overload_controller(self):
+        """Start shedding low-priority work when loop lag or the send queue pass the 'overload_*' thresholds."""
+        self.overload = OverloadController(
+            self.metrics,
+            self.send_queue,
+            lag_thresholds=[ms / 1000 for ms in self.config.get('overload_lag_thresholds_ms', [100, 250, 500])],
+            queue_thresholds=self.config.get('overload_queue_thresholds', [50, 200, 500]),
+            recover_seconds=self.config.get('overload_recover_seconds', 10),
+            max_write_delay=self.config.get('overload_max_write_delay_seconds', 60),
+        )
+        self.overload.start()
+
+    async def close(self):
+        # Subscribers get the events already published while everything they use still runs
+        if self.events:
+            await self.events.close()
+        if self.loop_watchdog:
+            self.loop_watchdog.stop()
+        if self.overload:
+            # Writes held back are written out before the modules save on teardown
+            self.overload.stop()
+        if self.send_queue:
+            self.send_queue.cancel()
+        if self.rate_limit_counter:
+            logging.getLogger('discord.http').removeHandler(self.rate_limit_counter)
+            self.rate_limit_counter = None
+        if self.metrics_server:
+            await self.metrics_server.stop()
+            self.metrics_server = None
+        await super().close()
+
+
+class NiceBot(NiceBotMixin, commands.Bot):
+    """Bot with a single gateway connection (the default)."""
+
+
+class NiceShardedBot(NiceBotMixin, commands.AutoShardedBot):
+    """Bot that spreads its guilds over several gateway shards ('sharding_enabled')."""
 
 # Data directory for persistent storage
 DATA_DIR = 'data'
@@ -51,77 +300,109 @@ DATA_DIR = 'data'
 # Ensure data directory exists
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Map module names to their import paths, class names and the commands they
+# register (used for placeholder commands when modules are loaded lazily)
+MODULE_MAP = {
+    'weather': ('commands.weather_module', 'WeatherModule', ('weather', 'forecast', 'setlocation')),
+    'count': ('commands.count_module', 'CountModule', ('count',)),
+    'search': ('commands.search_module', 'SearchModule', ('search',)),
+    'quote': ('commands.quote_module', 'QuoteModule', ('quote', 'addquote')),
+    'friday': ('commands.friday_module', 'FridayModule', ('friday',)),
+    'stock': ('commands.stock_module', 'StockModule', ('stock',)),
+    'triggers': ('commands.triggers_module', 'TriggersModule', ('triggers',)),
+    'bartender': ('commands.bartender_module', 'BartenderModule', ('bartender',)),
+    'chatgpt': ('commands.chatgpt_module', 'ChatGPTModule', ('chat',)),
+    'nice_trigger': ('commands.nice_trigger', 'NiceTriggerModule', ()),
+    'shutup_trigger': ('commands.shutup_trigger', 'ShutUpTriggerModule', ()),
+    'eagles_trigger': ('commands.eagles_trigger', 'EaglesTriggerModule', ()),
+    'dallas_trigger': ('commands.dallas_trigger', 'DallasTriggerModule', ()),
+    'custom_triggers': ('commands.custom_triggers', 'CustomTriggersModule', ('trigger',)),
+    'nice_backfill': ('commands.nice_backfill', 'NiceBackfillModule', ('backfill',)),
+    'backup': ('commands.backup_module', 'BackupModule', ('backup',)),
+}
+
+# Module of each command, for turning commands off with their module
+COMMAND_MODULES = {
+    command_name: module_name
+    for module_name, (_, _, command_names) in MODULE_MAP.items()
+    for command_name in command_names
+}
+
+# Modules that own state fed by bus events (count keeps the nice counts from
+# NiceDetected), so they are loaded at startup even with lazy loading
+EVENT_SUBSCRIBER_MODULES = {'count'}
+
 # Dictionary to store loaded modules
 loaded_modules = {}
 
+# Loading tasks for lazily loaded modules: {module_name: asyncio.Task}
+deferred_loads = {}
+
+# Placeholder commands registered for lazily loaded modules: {module_name: [command_name]}
+stub_commands = {}
+
+# Per-module startup timings in seconds: {module_name: {'import': s, 'init': s, 'setup': s}}
+module_timings = {}
+
 # Module-level logger (will be configured in main)
 logger = logging.getLogger(__name__)
 
 
 def load_module(module_name: str, config: dict):
     """
-    Load a command module by name.
+    Import and instantiate a command module by name.
+
+    This does blocking work (imports, loading data files in __init__) and is
+    run in a worker thread by setup_modules so modules load concurrently.
 
     Args:
         module_name: Name of the module to load (e.g., 'weather', 'count')
         config: Configuration dictionary
 
     Returns:
-        True if module loaded successfully, False otherwise
+        The module instance, or None if loading failed
     """
     try:
-        # Map module names to their class names and files
-        module_map = {
-            'weather': ('commands.weather_module', 'WeatherModule'),
-            'count': ('commands.count_module', 'CountModule'),
-            'search': ('commands.search_module', 'SearchModule'),
-            'quote': ('commands.quote_module', 'QuoteModule'),
-            'friday': ('commands.friday_module', 'FridayModule'),
-            'stock': ('commands.stock_module', 'StockModule'),
-            'triggers': ('commands.triggers_module', 'TriggersModule'),
-            'bartender': ('commands.bartender_module', 'BartenderModule'),
-            'chatgpt': ('commands.chatgpt_module', 'ChatGPTModule'),
-            'nice_trigger': ('commands.nice_trigger', 'NiceTriggerModule'),
-            'shutup_trigger': ('commands.shutup_trigger', 'ShutUpTriggerModule'),
-            'eagles_trigger': ('commands.eagles_trigger', 'EaglesTriggerModule'),
-            'dallas_trigger': ('commands.dallas_trigger', 'DallasTriggerModule'),
-            'backup': ('commands.backup_module', 'BackupModule'),
-        }
-
-        if module_name not in module_map:
+        if module_name not in MODULE_MAP:
             logger.error(f'✗ Unknown module: {module_name}')
-            return False
+            return None
 
-        module_path, class_name = module_map[module_name]
+        module_path, class_name, _ = MODULE_MAP[module_name]
 
         # Import the module
+        start = time.perf_counter()
         module = importlib.import_module(module_path)
+        imported = time.perf_counter()
 
-        # Reload if already imported (useful for development)
-        if module_path in sys.modules:
-            module = importlib.reload(module)
-
-        # Get the module class
+        # Get the module class and instantiate it
         module_class = getattr(module, class_name)
-
-        # Instantiate the module
         module_instance = module_class(bot, config, DATA_DIR)
 
-        # Store the module instance
-        loaded_modules[module_name] = module_instance
+        module_timings[module_name] = {
+            'import': imported - start,
+            'init': time.perf_counter() - imported,
+        }
 
-        return True
+        return module_instance
 
     except Exception as e:
         logger.error(f'✗ Error loading module {module_name}: {e}')
         logger.exception('Exception details:')
-        return False
+        return None
 
 
 async def setup_modules(config: dict):
     """
     Set up all enabled modules from config.
 
+    Modules are imported and instantiated concurrently in worker threads, then
+    set up one at a time on the event loop in the order they are listed.
+    Modules that are already loaded are skipped, so calling this again is a no-op.
+
+    With 'lazy_module_loading' enabled, only modules without commands (the
+    message triggers) and modules in EVENT_SUBSCRIBER_MODULES are loaded here. Command modules get placeholder commands
+    right away and are imported in the background, or on first use.
+
     Args:
         config: Configuration dictionary with 'enabled_modules' list
     """
@@ -132,27 +413,275 @@ async def setup_modules(config: dict):
         logger.warning('Add "enabled_modules" to your config.json to enable features')
         return
 
-    logger.info(f'Loading {len(enabled_modules)} module(s)...')
+    pending = [
+        name for name in dict.fromkeys(enabled_modules)
+        if name not in loaded_modules and name not in deferred_loads and name not in stub_commands
+    ]
+    if not pending:
+        return
+
+    deferred = []
+    if config.get('lazy_module_loading', False):
+        deferred = [
+            name for name in pending
+            if name in MODULE_MAP and MODULE_MAP[name][2] and name not in EVENT_SUBSCRIBER_MODULES
+        ]
+        pending = [name for name in pending if name not in deferred]
+        for module_name in deferred:
+            register_stub_commands(module_name, config)
 
-    for module_name in enabled_modules:
-        if load_module(module_name, config):
-            # Call the module's setup method
-            module_instance = loaded_modules[module_name]
-            await module_instance.setup()
+    logger.info(f'Loading {len(pending)} module(s)...')
+    start = time.perf_counter()
 
-    # Special handling: share data between nice_trigger and count modules
-    if 'nice_trigger' in loaded_modules and 'count' in loaded_modules:
-        nice_module = loaded_modules['nice_trigger']
-        count_module = loaded_modules['count']
-        # Share the same counts dictionary
-        nice_module.count_module = count_module
-        count_module.nice_counts = nice_module.nice_counts
+    loop = asyncio.get_running_loop()
+    instances = await asyncio.gather(*(
+        loop.run_in_executor(None, load_module, module_name, config)
+        for module_name in pending
+    ))
+
+    for module_name, module_instance in zip(pending, instances):
+        if module_instance is not None:
+            await start_module(module_name, module_instance)
 
     logger.info(f'✓ Successfully loaded {len(loaded_modules)} module(s)')
+    log_startup_report(time.perf_counter() - start, pending)
+
+    if deferred:
+        logger.info(f'Deferred {len(deferred)} module(s) to background loading: {", ".join(deferred)}')
+        bot.deferred_load_task = asyncio.create_task(load_deferred_modules(deferred, config))
+    else:
+        await sync_app_commands(config)
+
+
+async def start_module(module_name: str, module_instance) -> bool:
+    """
+    Call a loaded module's setup method and register it as loaded.
+
+    Returns:
+        True if setup succeeded, False otherwise
+    """
+    setup_start = time.perf_counter()
+    try:
+        await module_instance.setup()
+    except Exception as e:
+        logger.error(f'✗ Error setting up module {module_name}: {e}')
+        logger.exception('Exception details:')
+        return False
+    module_timings[module_name]['setup'] = time.perf_counter() - setup_start
+
+    loaded_modules[module_name] = module_instance
+    return True
+
+
+def register_stub_commands(module_name: str, config: dict):
+    """Register placeholder commands that load a deferred module on first use."""
+    stub_commands[module_name] = []
+
+    for command_name in MODULE_MAP[module_name][2]:
+        async def stub(ctx, *, args: str = None):
+            module_instance = await ensure_module_loaded(module_name, config)
+            if module_instance is None:
+                await ctx.send(f"❌ The `{module_name}` module failed to load. Check bot logs for details.")
+                return
+            # The real command has replaced this placeholder, so run the message again
+            await bot.process_commands(ctx.message)
+
+        bot.add_command(commands.Command(stub, name=command_name, help=f'Loads the {module_name} module on first use'))
+        stub_commands[module_name].append(command_name)
+
+
+def ensure_module_loaded(module_name: str, config: dict) -> asyncio.Task:
+    """
+    Start loading a deferred module, or return the load already in progress.
+
+    Returns:
+        Task resolving to the module instance, or None if loading failed
+    """
+    task = deferred_loads.get(module_name)
+    if task is None:
+        task = asyncio.create_task(load_deferred_module(module_name, config))
+        deferred_loads[module_name] = task
+    return task
+
+
+async def load_deferred_module(module_name: str, config: dict):
+    """Import a deferred module off-loop and swap its placeholder commands for the real ones."""
+    loop = asyncio.get_running_loop()
+    module_instance = await loop.run_in_executor(None, load_module, module_name, config)
+
+    # Hold events so no command arrives between removing the placeholders and setup
+    bot.hold_events()
+    try:
+        for command_name in stub_commands.pop(module_name, []):
+            bot.remove_command(command_name)
+        if module_instance is not None:
+            await start_module(module_name, module_instance)
+    finally:
+        bot.release_events()
+
+    return loaded_modules.get(module_name)
+
+
+async def load_deferred_modules(module_names: list, config: dict):
+    """Load deferred modules one at a time in the background."""
+    start = time.perf_counter()
+    for module_name in module_names:
+        await ensure_module_loaded(module_name, config)
+
+    logger.info(f'✓ Background loading finished ({len(loaded_modules)} module(s) loaded)')
+    log_startup_report(time.perf_counter() - start, module_names)
+    # Only now does the tree hold every module's slash commands
+    await sync_app_commands(config)
+
+
+async def sync_app_commands(config: dict):
+    """
+    Register the loaded modules' slash commands with Discord, if they changed.
+
+    Module commands are hybrid commands, so loading a module adds its slash
+    commands to bot.tree. Syncing is rate limited by Discord, so a digest of
+    the synced tree is kept (in the state store in cluster mode, so only one
+    worker syncs) and the sync is skipped while the commands stay the same.
+    """
+    if not config.get('slash_commands_enabled', True) or bot.application_id is None:
+        # Disabled, or not logged in (e.g. --profile-startup, benchmark)
+        return
+
+    payload = sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands()), key=lambda c: c['name'])
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    digest_file = os.path.join(DATA_DIR, 'app_commands.json')
+    try:
+        if bot.state_store:
+            synced_digest = await asyncio.to_thread(bot.state_store.hget, 'app_commands', 'digest')
+        elif os.path.exists(digest_file):
+            with open(digest_file, 'r') as f:
+                synced_digest = json.load(f).get('digest')
+        else:
+            synced_digest = None
+    except Exception as e:
+        logger.warning(f'Error reading the last slash command sync: {e}')
+        synced_digest = None
+
+    if synced_digest == digest:
+        logger.info(f'Slash commands up to date ({len(payload)} command(s))')
+        return
+
+    try:
+        synced = await bot.tree.sync()
+    except discord.HTTPException as e:
+        logger.error(f'✗ Could not sync slash commands: {e}')
+        return
+    if bot.state_store:
+        queue_store_write(bot.state_store.hset, 'app_commands', 'digest', digest, logger=logger)
+    else:
+        write_json_file(digest_file, {'digest': digest}, logger)
+    logger.info(f'✓ Synced {len(synced)} slash command(s) with Discord')
+
+
+def build_reloaded_module(module_name: str, config: dict):
+    """
+    Re-import a module's code and instantiate the new class (runs in a worker thread).
+
+    Args:
+        module_name: Name of a loaded module
+        config: Configuration dictionary
+
+    Returns:
+        The new, not yet set up, module instance
+    """
+    module_path, class_name, _ = MODULE_MAP[module_name]
+    module = importlib.reload(importlib.import_module(module_path))
+    module_class = getattr(module, class_name)
+    return module_class(bot, config, DATA_DIR)
+
+
+async def reload_module(module_name: str, config: dict) -> dict:
+    """
+    Hot-swap a loaded module for a freshly imported copy, keeping its state.
+
+    The new code is imported and instantiated off-loop while the old instance
+    keeps serving. Then, with gateway events held, the old instance's state is
+    handed to the new one, the old listeners/commands are torn down and the new
+    ones set up. Held events are delivered afterwards, so no message is missed.
+    If the old module fails to tear down or the new one fails to set up, the
+    old instance is set up again.
+
+    Args:
+        module_name: Name of a loaded module (e.g., 'count')
+        config: Configuration dictionary
+
+    Returns:
+        Dict with 'total' and 'swap' durations in seconds and 'held' event count
+    """
+    old_instance = loaded_modules[module_name]
+    start = time.perf_counter()
+
+    loop = asyncio.get_running_loop()
+    new_instance = await loop.run_in_executor(None, build_reloaded_module, module_name, config)
+
+    swap_start = time.perf_counter()
+    bot.hold_events()
+    try:
+        new_instance.import_state(old_instance.export_state())
+        new_started = False
+        try:
+            await old_instance.teardown()
+            new_started = True
+            await new_instance.setup()
+        except Exception:
+            # Put the old instance back so the module keeps working
+            await restore_module(module_name, old_instance, new_instance if new_started else None)
+            raise
+        loaded_modules[module_name] = new_instance
+    finally:
+        swap_time = time.perf_counter() - swap_start
+        held = bot.release_events()
+
+    return {'total': time.perf_counter() - start, 'swap': swap_time, 'held': held}
+
+
+async def restore_module(module_name: str, old_instance, new_instance=None):
+    """
+    Set the old instance of a module up again after a failed reload.
+
+    Args:
+        module_name: Name of the module
+        old_instance: Instance to restore (it stays in loaded_modules)
+        new_instance: Instance whose setup was started, to tear down first (None if it never started)
+    """
+    if new_instance is not None:
+        try:
+            await new_instance.teardown()
+        except Exception as e:
+            logger.error(f'✗ Error tearing down the new {module_name} module: {e}')
+    try:
+        await old_instance.setup()
+    except Exception as e:
+        logger.error(f'✗ Could not restore module {module_name}, it may not be working until the next reload: {e}')
+
+
+def log_startup_report(total: float, module_names: list):
+    """Log how long each of the given modules took to import, initialize and set up."""
+    lines = [f'Module startup timing (total {total * 1000:.0f}ms, import/init run concurrently):']
+    timings = {name: module_timings[name] for name in module_names if name in module_timings}
+    ordered = sorted(timings.items(), key=lambda item: sum(item[1].values()), reverse=True)
+    for module_name, timings in ordered:
+        lines.append(
+            f'  {module_name:<16} {sum(timings.values()) * 1000:7.1f}ms  '
+            f'(import {timings.get("import", 0) * 1000:.1f}ms, '
+            f'init {timings.get("init", 0) * 1000:.1f}ms, '
+            f'setup {timings.get("setup", 0) * 1000:.1f}ms)'
+        )
+    logger.info('\n'.join(lines))
 
 
 async def teardown_modules():
     """Tear down all loaded modules."""
+    # Let subscribers handle the events already published before they go away
+    events = getattr(bot, 'events', None)
+    if events:
+        await events.drain()
+
     for module_name, module_instance in loaded_modules.items():
         try:
             await module_instance.teardown()
@@ -160,35 +689,548 @@ async def teardown_modules():
         except Exception as e:
             logger.error(f'✗ Error unloading module {module_name}: {e}')
 
+    # Save the cooldowns before the state store they may live in is closed
+    cooldowns = getattr(bot, 'cooldowns', None)
+    if cooldowns:
+        cooldowns.stop()
+
+    state_store = getattr(bot, 'state_store', None)
+    if state_store:
+        flush_store_writes()
+        state_store.close()
+
+
+@commands.command(name='reload')
+@commands.has_permissions(administrator=True)
+async def reload_cmd(ctx, module_name: str = None):
+    """Reload a module's code without restarting the bot (admin only)."""
+    if not module_name or module_name not in loaded_modules:
+        available = ', '.join(f'`{name}`' for name in loaded_modules) or 'none'
+        await ctx.send(f"Usage: `!reload <module>`\nLoaded modules: {available}")
+        return
+
+    try:
+        result = await reload_module(module_name, bot.config)
+    except Exception as e:
+        logger.error(f'✗ Error reloading module {module_name}: {e}')
+        logger.exception('Exception details:')
+        await ctx.send(f"❌ Reload of `{module_name}` failed, kept the running version: {e}")
+        return
+
+    logger.info(f'✓ Reloaded module: {module_name} ({result["total"] * 1000:.1f}ms)')
+    await sync_app_commands(bot.config)
+    await ctx.send(
+        f"✅ Reloaded `{module_name}` in {result['total'] * 1000:.1f}ms "
+        f"(swap {result['swap'] * 1000:.2f}ms, {result['held']} event(s) held)"
+    )
+
+
+def print_startup_profile():
+    """Print the import-time breakdown collected with --profile-startup."""
+    print(f'\nStartup profile ({(time.perf_counter() - PROCESS_START) * 1000:.0f}ms since process start)')
+    print('\nFirst import of top-level packages, excluding the standard library (cumulative):')
+    for package, seconds in sorted(import_times.items(), key=lambda item: item[1], reverse=True):
+        if package not in sys.stdlib_module_names and seconds >= 0.001:
+            print(f'  {package:<24} {seconds * 1000:8.1f}ms')
+
+    print('\nModules:')
+    for module_name, timings in sorted(module_timings.items(), key=lambda item: sum(item[1].values()), reverse=True):
+        print(
+            f'  {module_name:<24} {sum(timings.values()) * 1000:8.1f}ms  '
+            f'(import {timings.get("import", 0) * 1000:.1f}ms, '
+            f'init {timings.get("init", 0) * 1000:.1f}ms, '
+            f'setup {timings.get("setup", 0) * 1000:.1f}ms)'
+        )
+
+
+async def profile_startup(config: dict):
+    """Load all enabled modules without connecting to Discord, then print the profile."""
+    await setup_modules(config)
+    print(f'\nReady to serve after {(time.perf_counter() - PROCESS_START) * 1000:.0f}ms')
+
+    deferred_load_task = getattr(bot, 'deferred_load_task', None)
+    if deferred_load_task:
+        await deferred_load_task
+        print(f'Background loading finished after {(time.perf_counter() - PROCESS_START) * 1000:.0f}ms')
+
+    print_startup_profile()
+    await teardown_modules()
+
 
-@bot.event
 async def on_ready():
-    """Called when the bot is ready and connected to Discord."""
+    """Called when the bot is ready and connected to Discord (also after reconnects)."""
     logger.info(f'{bot.user} has connected to Discord!')
     logger.info(f'Bot is in {len(bot.guilds)} guild(s)')
+    if bot.shard_count and bot.shard_count > 1:
+        logger.info(f'Running {bot.shard_count} shard(s)')
 
-    # Load modules after bot is ready
-    await setup_modules(bot.config)
+    if not getattr(bot, 'ready_at', None):
+        bot.ready_at = time.perf_counter()
+        logger.info(f'Time to ready: {bot.ready_at - PROCESS_START:.2f}s')
 
 
-@bot.event
 async def on_message(message):
     """
     Handle incoming messages.
 
     This event is needed to process both message triggers and commands.
-    Message trigger modules will handle their own logic via listeners.
+    Message trigger modules register their listeners with bot.router, which
+    knows the ones enabled in the message's channel.
     """
     # Don't respond to the bot's own messages
     if message.author == bot.user:
         return
 
-    # Process commands (this will trigger command modules)
-    await bot.process_commands(message)
+    # Pick up routing changes made by other processes (in the background)
+    bot.router.refresh_soon()
+
+    # Run the message listeners of the modules enabled in this channel (each
+    # in its own task, as discord.py runs listeners)
+    for listener in bot.router.route(message.channel).listeners:
+        bot._schedule_event(listener, 'on_message', message)
+
+    # Process commands (this will trigger command modules). Only messages
+    # starting with the prefix can be commands, so the rest skip the parser;
+    # with 'prefix_commands_enabled' off, commands are slash commands only
+    if message.content.startswith(bot.command_prefix) and bot.config.get('prefix_commands_enabled', True):
+        await bot.process_commands(message)
+
+
+class ModuleDisabled(commands.CheckFailure):
+    """A command of a module that is turned off in the channel was used."""
+
+
+class Overloaded(commands.CheckFailure):
+    """A slow command was used while the overload controller sheds new slow commands."""
+
+
+async def module_enabled(ctx) -> bool:
+    """Global command check: refuse commands of modules turned off in the channel."""
+    await bot.router.refresh()
+    command = ctx.command.root_parent or ctx.command
+    module_name = COMMAND_MODULES.get(command.name)
+    if module_name is None or bot.router.allows(module_name, ctx.channel):
+        return True
+    raise ModuleDisabled(f'{module_name} is turned off in this channel')
+
+
+async def not_overloaded(ctx) -> bool:
+    """Global command check: turn new slow commands away while the bot sheds load."""
+    if bot.overload is None:
+        return True
+    command = ctx.command.root_parent or ctx.command
+    module = loaded_modules.get(COMMAND_MODULES.get(command.name))
+    if module is None or command.name not in module.slow_commands:
+        return True
+    if bot.overload.shed_command(command.name):
+        raise Overloaded(f'{command.name} turned away under load')
+    return True
+
+
+async def on_command_error(ctx, error):
+    """
+    Say nothing about commands that are turned off, answer busy for commands
+    turned away under load, and log everything else as discord.py does.
+    """
+    if isinstance(error, ModuleDisabled):
+        if ctx.interaction is not None:
+            # A slash command has to be answered
+            await ctx.send(f"❌ `/{ctx.command.qualified_name}` is turned off in this channel.", ephemeral=True)
+        return
+    if isinstance(error, Overloaded):
+        await ctx.send("⏳ I'm too busy for that right now, try again in a minute.", ephemeral=True)
+        return
+    await commands.Bot.on_command_error(bot, ctx, error)
+
+
+async def on_guild_channel_update(before, after):
+    # 'module_channels' can name channels, so a renamed channel is routed again
+    if before.name != after.name:
+        bot.router.forget(after.id)
+
+
+async def on_guild_channel_delete(channel):
+    bot.router.forget(channel.id)
+
+
+async def on_shard_ready(shard_id: int):
+    """Called when a shard has finished connecting (sharded mode only)."""
+    shard_guilds = sum(1 for guild in bot.guilds if guild.shard_id == shard_id)
+    logger.info(f'Shard {shard_id} ready ({shard_guilds} guild(s))')
+
+
+async def on_shard_disconnect(shard_id: int):
+    """Called when a shard loses its gateway connection (sharded mode only)."""
+    logger.warning(f'Shard {shard_id} disconnected')
+
+
+async def on_shard_resumed(shard_id: int):
+    """Called when a shard resumes its gateway session (sharded mode only)."""
+    logger.info(f'Shard {shard_id} resumed')
+
+
+@commands.command(name='shards')
+async def shards_cmd(ctx):
+    """Show per-shard latency, guild count and message rate."""
+    if isinstance(bot, commands.AutoShardedBot):
+        latencies = dict(bot.latencies)
+    else:
+        latencies = {0: bot.latency}
+
+    guild_counts = {}
+    for guild in bot.guilds:
+        shard_id = shard_id_for(guild)
+        guild_counts[shard_id] = guild_counts.get(shard_id, 0) + 1
+
+    embed = discord.Embed(
+        title=f"🧩 Shards ({len(latencies)})",
+        color=discord.Color.blue()
+    )
+    for shard_id, latency in sorted(latencies.items()):
+        # Latency is NaN/inf until the shard's first heartbeat is acknowledged
+        latency_text = f"{latency * 1000:.0f}ms" if math.isfinite(latency) else "n/a"
+        embed.add_field(
+            name=f"Shard {shard_id}",
+            value=(
+                f"Latency: **{latency_text}**\n"
+                f"Guilds: **{guild_counts.get(shard_id, 0)}**\n"
+                f"Messages: **{bot.shard_stats.rate(shard_id):.2f}/s** "
+                f"({bot.shard_stats.totals.get(shard_id, 0)} total)"
+            ),
+            inline=True
+        )
+
+    footer = []
+    send_queue = bot.send_queue
+    if send_queue:
+        footer.append(
+            f"Send queue: {send_queue.depth()} waiting • {send_queue.coalesced} coalesced • "
+            f"{send_queue.rate_limited} rate limited (429)"
+        )
+    if bot.overload:
+        footer.append(f"Load shedding: {bot.overload.stage_name}")
+    if footer:
+        embed.set_footer(text='\n'.join(footer))
+
+    await ctx.send(embed=embed)
+
+
+@commands.command(name='stalls')
+@commands.has_permissions(administrator=True)
+async def stalls_cmd(ctx):
+    """Show where the event loop was blocked and for how long (admin only)."""
+    watchdog = bot.loop_watchdog
+    if not watchdog:
+        await ctx.send("❌ Loop watchdog is disabled (`loop_watchdog_enabled`).")
+        return
+
+    embed = discord.Embed(
+        title=f"🐢 Event Loop Stalls ({watchdog.stall_count})",
+        description=f"Stalls longer than {watchdog.threshold_seconds * 1000:.0f}ms since startup",
+        color=discord.Color.orange() if watchdog.stall_count else discord.Color.green()
+    )
+    for record in watchdog.top_records(limit=10):
+        command_text = f" (!{record.command})" if record.command else ""
+        embed.add_field(
+            name=f"{record.module}{command_text}",
+            value=(
+                f"`{record.location}`\n"
+                f"{record.count}x, {record.total_seconds * 1000:.0f}ms total, "
+                f"{record.max_seconds * 1000:.0f}ms max"
+            ),
+            inline=False
+        )
+    if not watchdog.stall_count:
+        embed.add_field(name="No stalls", value="The event loop hasn't been blocked. 🎉", inline=False)
+
+    await ctx.send(embed=embed)
+
+
+@commands.command(name='memstats')
+@commands.has_permissions(administrator=True)
+async def memstats_cmd(ctx):
+    """Show roughly how much memory discord.py's caches and each module hold (admin only)."""
+    config = bot.config or {}
+    shared = [
+        bot.config, bot.state_store, bot.metrics, bot.cooldowns, bot.send_queue,
+        bot.events, bot.response_catalog, bot.router, bot.loop_watchdog,
+    ]
+    seen = set()
+    # The walks are sampled, so they stay short enough to run on the loop (a
+    # worker thread would see the caches change while walking them)
+    cache_sizes = memstats.discord_cache_sizes(bot, seen)
+    module_sizes = memstats.module_sizes(loaded_modules, shared, seen)
+    # A tracemalloc snapshot copies every traced block; that one can take a while
+    traced = await asyncio.to_thread(memstats.traced_by_origin)
+
+    embed = discord.Embed(
+        title="🧠 Memory",
+        description=(
+            f"Resident: **{memstats.format_bytes(memstats.process_rss())}** • "
+            f"profile `{config.get('memory_profile', 'default')}` • "
+            f"message cache {bot._connection.max_messages or 'off'}"
+        ),
+        color=discord.Color.blue()
+    )
+    embed.add_field(
+        name="discord.py caches",
+        value='\n'.join(
+            f"{name}: {count} • ~{memstats.format_bytes(size)}" for name, count, size in cache_sizes
+        ),
+        inline=False
+    )
+    module_sizes.sort(key=lambda item: -item[1])
+    embed.add_field(
+        name="Modules",
+        value='\n'.join(
+            f"`{name}`: ~{memstats.format_bytes(size)}" for name, size in module_sizes[:15]
+        ) or "No modules loaded",
+        inline=False
+    )
+    if traced:
+        embed.add_field(
+            name="Allocated since startup (tracemalloc)",
+            value='\n'.join(f"`{origin}`: {memstats.format_bytes(size)}" for origin, size in traced),
+            inline=False
+        )
+    embed.set_footer(text="Estimates from sampled object walks; shared objects are counted once")
+
+    await ctx.send(embed=embed)
+
+
+@commands.command(name='modules')
+async def modules_cmd(ctx, action: str = None, module_name: str = None, *, where: str = None):
+    """Show or change which modules are enabled in this server and its channels."""
+    if action is None:
+        lines = [
+            f"{'✅' if bot.router.allows(name, ctx.channel) else '❌'} `{name}`"
+            for name in sorted(loaded_modules)
+        ]
+        await ctx.send("**Modules in this channel:**\n" + '\n'.join(lines) + "\n\n" + MODULES_USAGE)
+        return
+
+    action = action.lower()
+    if action not in ('enable', 'disable', 'reset') or module_name is None:
+        await ctx.send(MODULES_USAGE)
+        return
+    if not ctx.guild:
+        await ctx.send("❌ Modules can only be turned on and off in a server.")
+        return
+    if not ctx.channel.permissions_for(ctx.author).manage_guild:
+        await ctx.send("❌ You need the Manage Server permission to turn modules on and off.")
+        return
+
+    module_name = module_name.lower()
+    if module_name not in MODULE_MAP and module_name != 'all':
+        await ctx.send(f"❌ Unknown module `{module_name}`. Available: {', '.join(f'`{name}`' for name in MODULE_MAP)}")
+        return
+
+    # Channels by mention or ID, or the whole server
+    if where and where.strip().lower() != 'server':
+        channel_ids = [word.removeprefix('<#').removesuffix('>') for word in where.split()]
+        if not all(channel_id.isdigit() for channel_id in channel_ids):
+            await ctx.send(MODULES_USAGE)
+            return
+        scope_text = ', '.join(f'<#{channel_id}>' for channel_id in channel_ids)
+    else:
+        channel_ids = None
+        scope_text = 'this server'
+
+    enabled = {'enable': True, 'disable': False, 'reset': None}[action]
+    bot.router.set_module(
+        str(ctx.guild.id), ALL_MODULES if module_name == 'all' else module_name, enabled, channel_ids
+    )
+    target = 'All modules' if module_name == 'all' else f'`{module_name}`'
+    if enabled is None:
+        await ctx.send(f"✅ {target} back to the default in {scope_text}.")
+    else:
+        await ctx.send(f"✅ {target} turned {'on' if enabled else 'off'} in {scope_text}.")
+
+
+MODULES_USAGE = (
+    "`!modules enable|disable|reset <module|all> [#channel ...|server]` "
+    "(Manage Server; without channels, the whole server)"
+)
+
+
+def create_bot(config: dict = None) -> commands.Bot:
+    """
+    Create the bot instance and register the core events and commands.
+
+    With 'sharding_enabled' the bot is an AutoShardedBot, using 'shard_count'
+    shards (or Discord's recommended count when it is not set). A cluster
+    worker also sets 'shard_ids' to run only its own range of those shards.
+    The shared state store selected by 'state_backend' is attached as
+    bot.state_store, the metrics registry ('metrics_enabled') as
+    bot.metrics, the shared cooldowns as bot.cooldowns, the event bus as
+    bot.events, the response catalog as bot.response_catalog and the
+    per-channel module routing as bot.router, for modules to use.
+    'memory_profile' sets the intents, message cache size, member cache and
+    guild chunking (see commands/memstats.py).
+
+    Args:
+        config: Configuration dictionary
+
+    Returns:
+        The new bot instance
+    """
+    config = config or {}
+    client_options = memstats.client_options(config)
+    if config.get('memory_tracemalloc', False) and not tracemalloc.is_tracing():
+        # One frame per allocation keeps tracemalloc's own overhead small
+        tracemalloc.start(1)
+
+    if config.get('sharding_enabled', False):
+        new_bot = NiceShardedBot(
+            command_prefix='!',
+            shard_count=config.get('shard_count'),
+            shard_ids=config.get('shard_ids'),
+            **client_options,
+        )
+        new_bot.event(on_shard_ready)
+        new_bot.event(on_shard_disconnect)
+        new_bot.event(on_shard_resumed)
+    else:
+        new_bot = NiceBot(command_prefix='!', **client_options)
+
+    new_bot.config = config
+    new_bot.state_store = create_state_store(config, DATA_DIR)
+    new_bot.enable_metrics(create_metrics(config))
+    if config.get('send_queue_enabled', True):
+        new_bot.send_queue = SendScheduler(
+            new_bot.metrics,
+            coalesce_window=config.get('send_coalesce_window_seconds', 2.0),
+        )
+    new_bot.cooldowns = CooldownService(config, DATA_DIR, new_bot.state_store, new_bot.metrics)
+    new_bot.events = EventBus(new_bot.metrics)
+    new_bot.response_catalog = ResponseCatalog(config)
+    new_bot.router = ModuleRouter(config, MODULE_MAP, DATA_DIR, new_bot.state_store)
+    new_bot.event(on_ready)
+    new_bot.event(on_message)
+    new_bot.event(on_command_error)
+    new_bot.event(on_guild_channel_update)
+    new_bot.event(on_guild_channel_delete)
+    new_bot.add_check(module_enabled)
+    new_bot.add_check(not_overloaded)
+    new_bot.add_command(reload_cmd)
+    new_bot.add_command(shards_cmd)
+    new_bot.add_command(stalls_cmd)
+    new_bot.add_command(memstats_cmd)
+    new_bot.add_command(modules_cmd)
+    return new_bot
+
+
+# Create bot instance (recreated from config.json when run as a script)
+bot = create_bot()
+
+# Seconds to wait per shard between starting cluster workers, so their
+# gateway identifies don't exceed Discord's rate limit (1 per 5 seconds)
+IDENTIFY_INTERVAL = 5
+
+
+def run_cluster(config: dict):
+    """
+    Run the bot as several worker processes, each owning a range of shards.
+
+    Every worker runs the normal module set for its shards and shares state
+    through the 'state_backend' store. Workers that exit are restarted. Stops
+    all workers on Ctrl+C or SIGTERM.
+
+    Args:
+        config: Configuration dictionary ('cluster_workers', 'shard_count')
+    """
+    workers = config.get('cluster_workers') or os.cpu_count() or 1
+    shard_count = config.get('shard_count') or workers
+    workers = min(workers, shard_count)
+    shard_ranges = [
+        list(range(i * shard_count // workers, (i + 1) * shard_count // workers))
+        for i in range(workers)
+    ]
+
+    def start_worker(index: int) -> subprocess.Popen:
+        shard_ids = shard_ranges[index]
+        logger.info(f'Starting worker {index} (shards {shard_ids[0]}-{shard_ids[-1]} of {shard_count})')
+        return subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--shard-ids', ','.join(map(str, shard_ids))],
+            env={**os.environ, 'NICEBOT_WORKER': str(index)},
+        )
+
+    # Turn SIGTERM (docker stop) into a normal exit so workers are stopped too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    logger.info(f'Starting cluster: {workers} worker(s), {shard_count} shard(s)')
+    processes = {}
+    try:
+        for index in range(workers):
+            if processes:
+                time.sleep(IDENTIFY_INTERVAL * len(shard_ranges[index - 1]))
+            processes[index] = start_worker(index)
+
+        while True:
+            time.sleep(1)
+            for index, process in processes.items():
+                if process.poll() is not None:
+                    logger.warning(f'Worker {index} exited with code {process.returncode}, restarting')
+                    time.sleep(IDENTIFY_INTERVAL)
+                    processes[index] = start_worker(index)
+    except KeyboardInterrupt:
+        logger.info('Shutting down cluster...')
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for index, process in processes.items():
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                logger.warning(f'Worker {index} did not stop, killing it')
+                process.kill()
+
+
+async def run_interactions_endpoint(config: dict, token: str):
+    """
+    Serve slash commands from Discord's HTTP interactions endpoint, without a gateway.
+
+    Logs in over REST only (which loads the modules through setup_hook), then
+    answers signed interaction requests until cancelled. Message triggers
+    need the gateway, so they don't run in this mode; several endpoint
+    processes can share state through the 'state_backend' store, where they
+    see each other's and the gateway's changes (see state_versions).
+
+    Args:
+        config: Configuration dictionary ('interactions_public_key', 'interactions_host', ...)
+        token: Bot token, for the follow-up replies and slash command sync
+    """
+    server = InteractionsServer(
+        bot,
+        config['interactions_public_key'],
+        host=config.get('interactions_host', '127.0.0.1'),
+        port=config.get('interactions_port', 8080),
+        path=config.get('interactions_path', '/interactions'),
+        max_age=config.get('interactions_max_age_seconds', 300),
+        metrics=bot.metrics,
+    )
+    async with bot:
+        await bot.login(token)
+        await server.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
 
 
 # Run the bot
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='NiceBot Discord bot')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='load modules without connecting, print an import-time breakdown and exit')
+    parser.add_argument('--cluster', action='store_true',
+                        help='run several worker processes, each owning a range of shards')
+    parser.add_argument('--interactions', action='store_true',
+                        help='serve slash commands from the HTTP interactions endpoint instead of the gateway')
+    # Set by --cluster when starting a worker process
+    parser.add_argument('--shard-ids', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
     # Set up logging first
     logger = setup_logging()
 
@@ -213,6 +1255,12 @@ if __name__ == '__main__':
         except Exception as e:
             logger.error(f'Error loading config file: {e}')
 
+    # Load modules without connecting and print where startup time goes
+    if args.profile_startup:
+        bot = create_bot(config)
+        asyncio.run(profile_startup(config))
+        sys.exit(0)
+
     # Fall back to environment variable if config file didn't work
     if not TOKEN:
         TOKEN = os.getenv('DISCORD_BOT_TOKEN')
@@ -245,8 +1293,47 @@ Example config.json:
         logger.error(error_msg)
         sys.exit(1)
 
-    # Store config in bot instance for access in setup_modules
-    bot.config = config
+    if args.cluster:
+        run_cluster(config)
+        sys.exit(0)
+
+    if args.interactions:
+        if not NACL_AVAILABLE:
+            logger.error('PyNaCl is required for --interactions (pip install PyNaCl)')
+            sys.exit(1)
+        if not config.get('interactions_public_key'):
+            logger.error("--interactions needs 'interactions_public_key' (the application's public key)")
+            sys.exit(1)
+        # The gateway process sees the messages and keeps the counts; the
+        # endpoint reads them (and shares settings) through the state store
+        if config.get('state_backend', 'json') == 'json':
+            logger.error("--interactions needs a shared 'state_backend' (sqlite or redis), the same as the gateway process")
+            sys.exit(1)
+        # Tells modules that another process sees the messages and keeps the counts
+        config['interactions_endpoint'] = True
+        bot = create_bot(config)
+        try:
+            asyncio.run(run_interactions_endpoint(config, TOKEN))
+        except KeyboardInterrupt:
+            logger.info('Shutting down...')
+        finally:
+            asyncio.run(teardown_modules())
+        sys.exit(0)
+
+    # Cluster worker: run only our shards, and share state with the other workers
+    if args.shard_ids:
+        config['sharding_enabled'] = True
+        config['shard_ids'] = [int(shard_id) for shard_id in args.shard_ids.split(',')]
+        config['shard_count'] = config.get('shard_count') or config.get('cluster_workers') or os.cpu_count() or 1
+        if config.get('state_backend', 'json') == 'json':
+            config['state_backend'] = 'sqlite'
+        # Each worker serves metrics on its own port
+        config['metrics_port'] = config.get('metrics_port', 9100) + int(os.getenv('NICEBOT_WORKER', '0'))
+
+    # Create the bot from config (sharded or not) for access in setup_modules
+    bot = create_bot(config)
+    if config.get('sharding_enabled', False):
+        logger.info(f"Sharding enabled ({config.get('shard_count') or 'recommended'} shard(s))")
 
     # Run the bot
     try:
@@ -255,5 +1342,4 @@ Example config.json:
         logger.info('Shutting down...')
     finally:
         # Cleanup
-        import asyncio
         asyncio.run(teardown_modules())
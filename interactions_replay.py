@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Offline replay of recorded interaction requests against the interactions endpoint.
+
+Each fixture in fixtures/interactions/ is one request as Discord sends it to
+the HTTP interactions endpoint (raw body and signature headers) plus what the
+endpoint should answer. The requests are posted to an in-process
+InteractionsServer backed by the real modules; command replies (the
+follow-ups) are captured in memory instead of being sent, and checked too.
+A fixture can first set state store fields ("store": {hash: {field: value}}),
+standing in for what the gateway process writes between two requests.
+
+The fixtures are signed with a fixed test key (TEST_SEED) and replayed
+against its public key. Requests recorded from a real application can be
+replayed with that application's --public-key instead.
+
+Runs in a temporary directory, so data/ and config.json are not touched.
+
+Usage:
+    python interactions_replay.py
+    python interactions_replay.py fixtures/interactions/ping.json --verbose
+    python interactions_replay.py --record  # re-sign the fixtures after editing a body
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import argparse
+import logging
+import tempfile
+import functools
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+# Loaded before the commands package, which annotates with discord.ext.commands
+import discord
+import discord.ext.commands
+from aiohttp.test_utils import TestClient, TestServer
+from commands.send_queue import QueuedContext
+from commands.interactions import NACL_AVAILABLE
+
+FIXTURE_DIR = os.path.join(REPO_DIR, 'fixtures', 'interactions')
+
+# Private half of the fixtures' test key (never a real application's key)
+TEST_SEED = hashlib.sha256(b'nicebot interactions replay').digest()
+
+# User ID the bot logs in as during replay
+BOT_USER_ID = '1290000000000000002'
+
+# Seconds to wait for a command's follow-up
+REPLY_TIMEOUT = 5
+
+
+def test_signing_key():
+    from nacl.signing import SigningKey
+    return SigningKey(TEST_SEED)
+
+
+def sign(fixture: dict):
+    """Sign a fixture's body with the test key, as of now."""
+    timestamp = str(int(time.time()))
+    signature = test_signing_key().sign(timestamp.encode() + fixture['body'].encode()).signature
+    fixture['headers'] = {'X-Signature-Ed25519': signature.hex(), 'X-Signature-Timestamp': timestamp}
+
+
+def record(paths: list):
+    """Re-sign fixtures, except the ones that are meant to fail verification."""
+    for path in paths:
+        with open(path, 'r') as f:
+            fixture = json.load(f)
+        if fixture['expect'].get('status') == 401:
+            print(f'  {os.path.basename(path)}: left as is (expects a bad signature)')
+            continue
+        sign(fixture)
+        with open(path, 'w') as f:
+            json.dump(fixture, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'  {os.path.basename(path)}: signed')
+
+
+class ReplayContext(QueuedContext):
+    """Context that captures replies instead of sending follow-ups through the HTTP API."""
+
+    replies = {}  # {interaction ID: [reply text]}
+
+    async def deliver(self, content=None, **kwargs):
+        text = [content or '']
+        embed = kwargs.get('embed')
+        if embed:
+            text += [embed.title or '', embed.description or '']
+            text += [f'{field.name} {field.value}' for field in embed.fields]
+        self.replies.setdefault(self.interaction.id, []).append('\n'.join(text))
+        return CapturedMessage(self, self.interaction.id)
+
+
+class CapturedMessage:
+    """Stands in for a sent follow-up, so replies that are edited later are captured too."""
+
+    def __init__(self, ctx: ReplayContext, interaction_id: int):
+        self.ctx = ctx
+        self.interaction_id = interaction_id
+
+    async def edit(self, content=None, **kwargs):
+        await self.ctx.deliver(content, **kwargs)
+
+
+def check(fixture: dict, status: int, answer, replies: list) -> list:
+    """Return what didn't match the fixture's expectations."""
+    expect = fixture['expect']
+    problems = []
+    if status != expect.get('status', 200):
+        problems.append(f'status {status}, expected {expect.get("status", 200)}')
+    if 'type' in expect and (not isinstance(answer, dict) or answer.get('type') != expect['type']):
+        problems.append(f'answered {answer!r}, expected type {expect["type"]}')
+    if 'reply' in expect and not any(expect['reply'] in reply for reply in replies):
+        problems.append(f'no reply containing {expect["reply"]!r} (got {replies!r})')
+    return problems
+
+
+async def run(args, paths: list):
+    import discord_bot
+    from commands.interactions import InteractionsServer
+
+    config = {
+        'enabled_modules': ['count', 'triggers'],
+        'lazy_module_loading': False,
+        # As with --interactions: the counting happens in another process, through a shared store
+        'interactions_endpoint': True,
+        'state_backend': 'sqlite',
+    }
+    if args.config:
+        with open(args.config, 'r') as f:
+            config.update(json.load(f))
+
+    bot = discord_bot.bot = discord_bot.create_bot(config)
+    bot.loop = asyncio.get_running_loop()
+    bot.get_context = functools.partial(bot.get_context, cls=ReplayContext)
+    # What login() would have set
+    bot._connection.user = discord.ClientUser(state=bot._connection, data={
+        'id': BOT_USER_ID, 'username': 'NiceBot', 'discriminator': '0', 'avatar': None, 'bot': True,
+    })
+    await discord_bot.setup_modules(config)
+    deferred_load_task = getattr(bot, 'deferred_load_task', None)
+    if deferred_load_task:
+        await deferred_load_task
+
+    public_key = args.public_key or test_signing_key().verify_key.encode().hex()
+    # Recorded requests are older than any replay window
+    server = InteractionsServer(bot, public_key, max_age=0)
+    failures = 0
+    async with TestClient(TestServer(server.app())) as client:
+        for path in paths:
+            with open(path, 'r') as f:
+                fixture = json.load(f)
+            if fixture.get('store') and not bot.state_store:
+                failures += 1
+                print(f'✗ {os.path.basename(path)}: sets state store fields, but state_backend is json')
+                continue
+            for name, fields in fixture.get('store', {}).items():
+                bot.state_store.hset_many(name, fields)
+            response = await client.post(server.path, data=fixture['body'].encode(), headers=fixture['headers'])
+            try:
+                answer = await response.json()
+            except Exception:
+                answer = await response.text()
+
+            replies = []
+            if 'reply' in fixture['expect']:
+                interaction_id = int(json.loads(fixture['body'])['id'])
+                deadline = time.monotonic() + REPLY_TIMEOUT
+                while interaction_id not in ReplayContext.replies and time.monotonic() < deadline:
+                    await asyncio.sleep(0.01)
+                replies = ReplayContext.replies.get(interaction_id, [])
+
+            problems = check(fixture, response.status, answer, replies)
+            failures += bool(problems)
+            mark = '✗' if problems else '✓'
+            print(f'{mark} {os.path.basename(path)}: {fixture.get("description", "")}')
+            for problem in problems:
+                print(f'    {problem}')
+            if args.verbose:
+                print(f'    {response.status} {answer!r}')
+                for reply in replies:
+                    print('    ' + reply.replace('\n', '\n    '))
+
+    await discord_bot.teardown_modules()
+    await bot.close()
+    print(f'\n{len(paths) - failures}/{len(paths)} fixture(s) passed')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded interaction requests (offline)')
+    parser.add_argument('fixtures', nargs='*', help='fixture files (default: all in fixtures/interactions/)')
+    parser.add_argument('--public-key', help='public key the fixtures are signed with (default: the test key)')
+    parser.add_argument('--record', action='store_true', help='re-sign the fixtures with the test key and exit')
+    parser.add_argument('--config', help='JSON file with config overrides (e.g. state_backend)')
+    parser.add_argument('--verbose', action='store_true', help='show responses, replies and module log output')
+    args = parser.parse_args()
+    if not NACL_AVAILABLE:
+        print('PyNaCl is required (pip install PyNaCl)')
+        sys.exit(1)
+
+    paths = [os.path.abspath(path) for path in args.fixtures] or sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.json')))
+    if args.config:
+        args.config = os.path.abspath(args.config)
+    if args.record:
+        record(paths)
+        return
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(levelname)-8s | %(name)s | %(message)s')
+    if not args.verbose:
+        # Skip discord.py's "voice will NOT be supported" warnings
+        logging.getLogger('discord.client').setLevel(logging.ERROR)
+
+    # Work in a scratch directory so the real data/ and config.json are never touched
+    work_dir = tempfile.mkdtemp(prefix='nicebot-replay-')
+    original_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        failures = asyncio.run(run(args, paths))
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
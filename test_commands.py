@@ -8,10 +8,12 @@ sys.path.insert(0, '.')
 import os
 os.environ['DISCORD_BOT_TOKEN'] = 'test-token'
 
-# Create a dummy config to prevent file loading issues
-with open('config.json', 'w') as f:
-    import json
-    json.dump({'bot_token': 'test', 'weather_api_key': 'test'}, f)
+# Create a dummy config to prevent file loading issues (never replace a real one)
+created_config = not os.path.exists('config.json')
+if created_config:
+    with open('config.json', 'w') as f:
+        import json
+        json.dump({'bot_token': 'test', 'weather_api_key': 'test'}, f)
 
 try:
     # Import the discord_bot module (but don't run it)
@@ -51,5 +53,5 @@ except Exception as e:
 
 finally:
     # Clean up test config
-    if os.path.exists('config.json'):
+    if created_config and os.path.exists('config.json'):
         os.remove('config.json')